@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Offline benchmark and evaluation of the classification pipeline.
+
+Replays a labeled JSON Lines corpus (the format read by
+train_local_classifier.py) through /classify, in process and with the
+real ChatOpenAI client talking to the deterministic stub LLM. Routed
+emails go to a local stub router. Reports throughput, latency
+percentiles, LLM tokens per email, per-class precision and recall against
+the labels (after the confidence threshold), and the hit rate of every
+tier. Without --data a synthetic corpus is generated.
+
+Pipeline settings are read from the environment as in the service, so a
+variant is measured by passing e.g. --env CLASSIFICATION_CACHE_ENABLED=false.
+The result is JSON (--output or --json); --baseline compares with an
+earlier result file.
+
+    python benchmark_classifier.py --data history.jsonl --output results/baseline.json
+    python benchmark_classifier.py --data history.jsonl --env NEAR_DUPLICATE_ENABLED=false \\
+        --baseline results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from load_test import QuietRouterHandler, QuietRouterServer
+from local_classifier import LABELS
+from stub_llm import StubLLMServer
+from shared.models import NormalizedEmail
+from train_local_classifier import load_examples
+
+# Metrics compared by --baseline, with the direction that is an improvement
+HEADLINE_METRICS = (
+    ("emails_per_second", "higher"),
+    ("latency_ms.p50", "lower"),
+    ("latency_ms.p99", "lower"),
+    ("tokens_per_email", "lower"),
+    ("llm_requests", "lower"),
+    ("accuracy", "higher"),
+    ("macro_f1", "higher"),
+)
+
+SYNTHETIC_TEMPLATES = [
+    ("InvoiceRequest", "Invoice {n} for {month}",
+     "Hi,\n\nplease find attached invoice {n} for {month}. The amount due is ${amount}, "
+     "payment within 30 days.\n\nBest regards,\nAccounts\n\n> On Monday you wrote:\n> Any update on billing?"),
+    ("AppointmentBooking", "Meeting on {day}?",
+     "Hello,\n\ncould we schedule a meeting on {day} at {hour}:00? Let me know if you are available.\n\nThanks"),
+    ("NewClientInquiry", "Question about your services",
+     "Good afternoon,\n\nwe are interested in your services for a team of {amount} people. "
+     "Could you send pricing information?\n\nKind regards"),
+    ("HumanReview", "Re: the thing from {day}",
+     "Hi,\n\njust following up on what we talked about on {day}. Let me know what you think.\n\nCheers"),
+    # Cases that keyword matching gets wrong
+    ("NewClientInquiry", "New project",
+     "Hello,\n\nwe would like to hire you for a project of {amount} hours. "
+     "Are you available for a call on {day}?\n\nBest"),
+    ("HumanReview", "Complaint",
+     "I was charged twice for the same payment in {month} and nobody answers my calls. Fix this now."),
+]
+
+
+def synthetic_corpus(count: int, seed: int = 0, repeat_share: float = 0.2) -> List[Tuple[NormalizedEmail, str]]:
+    """Labeled emails from a few templates; repeat_share of them repeat an earlier email exactly."""
+    rng = random.Random(seed)
+    months = ["January", "February", "March", "April", "May", "June"]
+    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+    corpus: List[Tuple[NormalizedEmail, str]] = []
+    for i in range(count):
+        if corpus and rng.random() < repeat_share:
+            corpus.append(rng.choice(corpus))
+            continue
+        label, subject, body = SYNTHETIC_TEMPLATES[rng.randrange(len(SYNTHETIC_TEMPLATES))]
+        values = {"n": rng.randint(1000, 99999), "month": rng.choice(months), "day": rng.choice(days),
+                  "hour": rng.randint(8, 17), "amount": rng.randint(5, 5000)}
+        corpus.append((NormalizedEmail(
+            sender=f"person{rng.randint(1, 500)}@company{rng.randint(1, 50)}.com",
+            subject=subject.format(**values),
+            body=body.format(**values),
+            received_time=datetime(2024, 1, 1).isoformat()
+        ), label))
+    return corpus
+
+
+def classification_report(pairs: List[Tuple[str, str]]) -> dict:
+    """Accuracy, per-class precision/recall/F1 and the confusion matrix of (expected, predicted) pairs."""
+    confusion = {expected: {predicted: 0 for predicted in LABELS} for expected in LABELS}
+    for expected, predicted in pairs:
+        confusion[expected][predicted] += 1
+    per_class = {}
+    for label in LABELS:
+        true_positives = confusion[label][label]
+        predicted = sum(confusion[expected][label] for expected in LABELS)
+        support = sum(confusion[label].values())
+        precision = true_positives / predicted if predicted else None
+        recall = true_positives / support if support else None
+        f1 = (2 * precision * recall / (precision + recall)
+              if precision and recall else (0.0 if support else None))
+        per_class[label] = {
+            "precision": round(precision, 4) if precision is not None else None,
+            "recall": round(recall, 4) if recall is not None else None,
+            "f1": round(f1, 4) if f1 is not None else None,
+            "support": support,
+        }
+    f1_scores = [row["f1"] for row in per_class.values() if row["f1"] is not None]
+    return {
+        "accuracy": round(sum(confusion[label][label] for label in LABELS) / len(pairs), 4) if pairs else None,
+        "macro_f1": round(sum(f1_scores) / len(f1_scores), 4) if f1_scores else None,
+        "per_class": per_class,
+        "confusion": confusion,
+    }
+
+
+async def replay(main, corpus: List[Tuple[NormalizedEmail, str]], concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=main.app)
+    latencies: List[float] = []
+    pairs: List[Tuple[str, str]] = []
+    statuses: Dict[str, int] = {}
+    remaining = iter(corpus)
+
+    async with main.lifespan(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://classifier") as client:
+
+        async def worker():
+            for email, label in remaining:
+                started = time.perf_counter()
+                response = await client.post("/classify", json=email.model_dump(), timeout=300)
+                latencies.append(time.perf_counter() - started)
+                body = response.json()
+                status = str(response.status_code)
+                statuses[status] = statuses.get(status, 0) + 1
+                if response.status_code in (200, 202):
+                    pairs.append((label, body["classification"]["workflow_type"]))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        metrics = (await client.get("/metrics")).json()
+
+    values = np.array(latencies) * 1000
+    tiers = metrics["tiers"]
+    input_tokens = sum(tier.get("input_tokens", 0) for tier in tiers.values())
+    output_tokens = sum(tier.get("output_tokens", 0) for tier in tiers.values())
+    return dict(
+        {
+            "emails": len(corpus),
+            "statuses": statuses,
+            "elapsed_seconds": round(elapsed, 3),
+            "emails_per_second": round(len(corpus) / elapsed, 2),
+            "latency_ms": {name: round(float(np.percentile(values, q)), 2)
+                           for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+            "tokens_per_email": round((input_tokens + output_tokens) / len(corpus), 1),
+            "input_tokens_per_email": round(input_tokens / len(corpus), 1),
+            "output_tokens_per_email": round(output_tokens / len(corpus), 1),
+            "body_tokens_saved_per_email": metrics["preprocessing"]["avg_tokens_saved"],
+            "tier_hit_rates": {name: tier["hit_rate"] for name, tier in tiers.items()},
+        },
+        **classification_report(pairs),
+        tiers=tiers,
+        cache=metrics["cache"],
+        near_duplicate=metrics["near_duplicate"],
+    )
+
+
+def lookup(result: dict, path: str):
+    for part in path.split("."):
+        result = result.get(part) if isinstance(result, dict) else None
+    return result
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    """Change of the headline metrics relative to a baseline result."""
+    comparison = {}
+    for path, better in HEADLINE_METRICS:
+        current, previous = lookup(result, path), lookup(baseline, path)
+        if current is None or previous is None:
+            continue
+        change = current - previous
+        comparison[path] = {
+            "baseline": previous,
+            "current": current,
+            "change": round(change, 4),
+            "relative": round(change / previous, 4) if previous else None,
+            "improved": change > 0 if better == "higher" else change < 0,
+        }
+    return comparison
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="Labeled emails as JSON Lines (default: synthetic corpus)")
+    parser.add_argument("--synthetic", type=int, default=500, help="Size of the synthetic corpus")
+    parser.add_argument("--limit", type=int, help="Replay only the first N emails")
+    parser.add_argument("--concurrency", type=int, default=8, help="Emails classified at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub LLM latency in seconds")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Service setting for the run (repeatable)")
+    parser.add_argument("--name", default="run", help="Name recorded in the result")
+    parser.add_argument("--output", help="Write the result as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier result file to compare with")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    corpus = load_examples(args.data) if args.data else synthetic_corpus(args.synthetic, args.seed)
+    corpus = corpus[:args.limit] if args.limit else corpus
+    overrides = dict(setting.split("=", 1) for setting in args.env)
+
+    stub = StubLLMServer(latency=args.latency).start()
+    router = QuietRouterServer(("127.0.0.1", 0), QuietRouterHandler)
+    threading.Thread(target=router.serve_forever, daemon=True).start()
+
+    # main reads its configuration at import time
+    os.environ["OPENAI_BASE_URL"] = stub.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+    os.environ["ROUTER_AGENT_URL"] = f"http://127.0.0.1:{router.server_address[1]}/route"
+    # A persistent cache or rate-limit store would carry state between runs
+    os.environ["CLASSIFICATION_CACHE_PATH"] = ""
+    os.environ["LLM_RATE_LIMIT_PATH"] = ""
+    os.environ.update(overrides)
+    logging.disable(logging.INFO)
+    import main
+    for name in ("main", "routing_queue", "hedging", "rate_limiter", "httpx"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    try:
+        run = asyncio.run(replay(main, corpus, args.concurrency))
+    finally:
+        stub.stop()
+        router.shutdown()
+        router.server_close()
+
+    result = dict({
+        "name": args.name,
+        "timestamp": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "corpus": args.data or f"synthetic:{args.synthetic}:seed={args.seed}",
+        "settings": {"concurrency": args.concurrency, "stub_latency": args.latency, "env": overrides},
+        "llm_requests": stub.request_count,
+    }, **run)
+    if args.baseline:
+        with open(args.baseline) as f:
+            result["comparison"] = compare(result, json.load(f))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print("=== Classifier Benchmark ===")
+    print(f"{result['emails']} emails from {result['corpus']}, {args.concurrency} at once, "
+          f"stub latency {args.latency}s, statuses {result['statuses']}\n")
+    latency = result["latency_ms"]
+    print(f"Throughput:        {result['emails_per_second']} emails/s")
+    print(f"Latency:           p50 {latency['p50']} / p95 {latency['p95']} / p99 {latency['p99']} ms")
+    print(f"LLM requests:      {result['llm_requests']}, {result['tokens_per_email']} tokens per email")
+    print(f"Accuracy:          {result['accuracy']:.1%} (macro F1 {result['macro_f1']})")
+    print(f"\n{'class':20} {'precision':>9} {'recall':>7} {'f1':>6} {'support':>8}")
+    for label, row in result["per_class"].items():
+        cells = [f"{row[name]:.3f}" if row[name] is not None else "-" for name in ("precision", "recall", "f1")]
+        print(f"{label:20} {cells[0]:>9} {cells[1]:>7} {cells[2]:>6} {row['support']:>8}")
+    print(f"\n{'tier':20} {'attempts':>8} {'hit rate':>9}")
+    for name, tier in result["tiers"].items():
+        print(f"{name:20} {tier['attempts']:>8} {tier['hit_rate'] if tier['hit_rate'] is not None else '-':>9}")
+    if "comparison" in result:
+        print(f"\nCompared with {args.baseline}:")
+        for path, row in result["comparison"].items():
+            relative = f" ({row['relative']:+.1%})" if row["relative"] is not None else ""
+            print(f"  {path:20} {row['baseline']} -> {row['current']}{relative} "
+                  f"{'better' if row['improved'] else 'worse' if row['change'] else 'same'}")
+    if args.output:
+        print(f"\nResult written to {args.output}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
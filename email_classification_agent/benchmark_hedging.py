@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark: classification latency percentiles with and without request hedging.
+
+Runs classify_with_llm against the stub LLM, of which a share of requests
+is very slow, first without hedging and then with a Hedger on the first
+cascade tier. Reports p50/p95/p99/max latency, hedges fired and won, and
+how many extra LLM requests hedging cost.
+
+    python benchmark_hedging.py --calls 400 --slow-fraction 0.03 --slow-latency 2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_llm import StubLLMServer
+from hedging import Hedger
+from shared.models import NormalizedEmail
+
+
+async def run_calls(main, calls: int, clients: int) -> list:
+    email = NormalizedEmail(
+        sender="billing@supplier.com",
+        subject="Invoice for March",
+        body="Please find attached the invoice for March, payment is due in 30 days.",
+        received_time=datetime.utcnow().isoformat()
+    )
+    latencies = []
+    remaining = iter(range(calls))
+
+    async def client():
+        for _ in remaining:
+            started = time.perf_counter()
+            await main.classify_with_llm(email)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies
+
+
+def summarize(latencies: list) -> dict:
+    values = np.array(latencies) * 1000
+    return {name: round(float(np.percentile(values, q)), 1)
+            for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))}
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent callers")
+    parser.add_argument("--latency", type=float, default=0.05, help="Normal stub latency in seconds")
+    parser.add_argument("--slow-fraction", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--quantile", type=float, default=0.95)
+    parser.add_argument("--initial-delay", type=float, default=0.5,
+                        help="Hedge delay until enough latencies were seen")
+    parser.add_argument("--max-rate", type=float, default=0.1, help="Largest share of calls hedged")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    stub = StubLLMServer(latency=args.latency, slow_fraction=args.slow_fraction,
+                         slow_latency=args.slow_latency).start()
+    os.environ["OPENAI_BASE_URL"] = stub.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+    os.environ["LLM_HEDGING_ENABLED"] = "false"
+    import main
+    logging.getLogger("main").setLevel(logging.ERROR)
+    logging.getLogger("hedging").setLevel(logging.ERROR)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    result = {}
+    try:
+        for name in ("baseline", "hedged"):
+            hedger = None
+            if name == "hedged":
+                hedger = Hedger(quantile=args.quantile, initial_delay=args.initial_delay, max_rate=args.max_rate)
+                main.llm_hedgers[main.llm_tiers[0].name] = hedger
+            requests_before = stub.request_count
+            latencies = asyncio.run(run_calls(main, args.calls, args.clients))
+            result[name] = dict(summarize(latencies), llm_requests=stub.request_count - requests_before)
+            if hedger is not None:
+                result[name]["hedging"] = hedger.stats()
+    finally:
+        stub.stop()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print("=== Hedging Benchmark ===")
+    print(f"Calls: {args.calls} from {args.clients} clients, stub latency {args.latency}s, "
+          f"{args.slow_fraction:.0%} of requests take {args.slow_latency}s\n")
+    print(f"{'':10} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'LLM requests':>13}")
+    for name, row in result.items():
+        print(f"{name:10} {row['p50']:>6}ms {row['p95']:>6}ms {row['p99']:>6}ms {row['max']:>6}ms "
+              f"{row['llm_requests']:>13}")
+    hedging = result["hedged"]["hedging"]
+    print(f"\nHedges fired: {hedging['hedges_fired']} ({hedging['hedge_rate']:.1%} of calls), "
+          f"won: {hedging['hedges_won']}, delay: {hedging['delay_ms']} ms")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Benchmark: kNN index query latency and IVF recall at growing index sizes.
+
+For each size a memory-mapped VectorIndex is filled with synthetic
+clustered unit vectors. Queries are noisy copies of indexed vectors, like
+a new email that resembles an earlier one. The benchmark reports build
+time, size on disk, exact and IVF query latency (p50/p99), and the IVF
+recall@k against exact search.
+
+    python benchmark_knn.py --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from knn_index import VectorIndex
+from local_classifier import LABELS
+
+
+def clustered_vectors(rng: np.random.Generator, centres: np.ndarray, count: int, noise: float) -> np.ndarray:
+    vectors = centres[rng.integers(0, len(centres), count)]
+    vectors = vectors + rng.normal(scale=noise, size=vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed_queries(index: VectorIndex, queries: np.ndarray, k: int, exact: bool):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(index.search(query, k, exact=exact))
+        latencies.append(time.perf_counter() - started)
+    return np.array(latencies) * 1000, results
+
+
+def run_size(size: int, args, directory: str) -> dict:
+    rng = np.random.default_rng(args.seed)
+    centres = rng.normal(size=(args.clusters, args.dimensions)).astype(np.float32)
+    path = os.path.join(directory, f"index_{size}")
+    index = VectorIndex(args.dimensions, path=path, ivf_threshold=size + 1, nprobe=args.nprobe)
+
+    started = time.perf_counter()
+    for start in range(0, size, args.chunk):
+        count = min(args.chunk, size - start)
+        vectors = clustered_vectors(rng, centres, count, args.noise)
+        index.add(vectors, [LABELS[i % len(LABELS)] for i in range(start, start + count)])
+    add_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    index.build_ivf()
+    ivf_seconds = time.perf_counter() - started
+
+    picks = rng.choice(size, args.queries, replace=False)
+    queries = np.asarray(index._vectors[picks]) + rng.normal(
+        scale=args.query_noise, size=(args.queries, args.dimensions)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact_ms, exact_results = timed_queries(index, queries, args.k, exact=True)
+    ivf_ms, ivf_results = timed_queries(index, queries, args.k, exact=False)
+    # Recall: share of the exact top-k similarities that the IVF search also found
+    recall = np.mean([
+        len(np.intersect1d(np.round(e[1], 5), np.round(i[1], 5))) / args.k
+        for e, i in zip(exact_results, ivf_results)
+    ])
+    disk_bytes = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return {
+        "vectors": size,
+        "add_seconds": round(add_seconds, 2),
+        "ivf_build_seconds": round(ivf_seconds, 2),
+        "ivf_lists": index.stats()["ivf_lists"],
+        "disk_mb": round(disk_bytes / 1e6, 1),
+        "exact_ms": {"p50": round(float(np.percentile(exact_ms, 50)), 3),
+                     "p99": round(float(np.percentile(exact_ms, 99)), 3)},
+        "ivf_ms": {"p50": round(float(np.percentile(ivf_ms, 50)), 3),
+                   "p99": round(float(np.percentile(ivf_ms, 99)), 3)},
+        "ivf_recall": round(float(recall), 4),
+    }
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated index sizes")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=2000, help="Synthetic topic clusters")
+    parser.add_argument("--noise", type=float, default=0.08, help="Per-dimension spread within a cluster")
+    parser.add_argument("--query-noise", type=float, default=0.03)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--chunk", type=int, default=50000, help="Vectors added per add() call")
+    parser.add_argument("--dir", help="Where to write the indexes (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="knn_benchmark_")
+    try:
+        results = [run_size(int(size), args, directory) for size in args.sizes.split(",")]
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print("=== kNN Index Benchmark ===")
+    print(f"{args.dimensions} dimensions, k={args.k}, nprobe={args.nprobe}, {args.queries} queries per size\n")
+    print(f"{'vectors':>9} {'disk':>9} {'build':>8} {'exact p50':>10} {'exact p99':>10} "
+          f"{'ivf p50':>9} {'ivf p99':>9} {'recall':>7}")
+    for row in results:
+        print(f"{row['vectors']:>9} {row['disk_mb']:>7}MB {row['ivf_build_seconds']:>7}s "
+              f"{row['exact_ms']['p50']:>8}ms {row['exact_ms']['p99']:>8}ms "
+              f"{row['ivf_ms']['p50']:>7}ms {row['ivf_ms']['p99']:>7}ms {row['ivf_recall']:>7.1%}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
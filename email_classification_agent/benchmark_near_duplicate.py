@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Benchmark: near-duplicate lookup latency and memory with a full index.
+
+Indexes --entries synthetic emails built from templated notices (invoice,
+calendar, shipping, newsletter...) across --domains sender domains, then
+looks up fresh variants of the same templates (expected hits) and unrelated
+emails (expected misses). A second run puts every entry under one sender
+domain, which is the worst case for the per-domain scan. The build
+runs under tracemalloc to measure memory, which inflates build time.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from shared.models import NormalizedEmail, ClassificationResult
+from near_duplicate import NearDuplicateIndex
+
+TEMPLATES = [
+    ("InvoiceRequest", "Invoice {num} from {company}",
+     "Dear {name}, please find attached invoice {num} dated {date} for {amount}. Payment is due "
+     "within 30 days of the invoice date. You can pay online through the customer portal or by "
+     "bank transfer quoting the invoice number. Thank you for your business."),
+    ("InvoiceRequest", "Payment reminder: invoice {num} is overdue",
+     "Hello {name}, our records show that invoice {num} for {amount}, issued on {date}, has not "
+     "yet been paid. Please arrange payment at your earliest convenience or contact our accounts "
+     "team if you believe this is an error."),
+    ("AppointmentBooking", "Invitation: {topic} on {date}",
+     "Hi {name}, you have been invited to {topic} on {date} at {time}. The meeting will take place "
+     "online and the link is included in the calendar invite. Please accept or decline so the "
+     "organiser can confirm attendance."),
+    ("AppointmentBooking", "Your appointment on {date} is confirmed",
+     "Dear {name}, this is a confirmation of your appointment on {date} at {time} with {company}. "
+     "If you need to reschedule, please reply to this email at least 24 hours in advance."),
+    ("NewClientInquiry", "Enquiry about {topic} services",
+     "Hello, my name is {name} from {company}. We are looking for a partner to help with {topic} "
+     "and would like to learn more about your services, typical timelines and pricing. Could you "
+     "send some information or suggest a time for a short call?"),
+    ("HumanReview", "{company} newsletter for {date}",
+     "Hi {name}, here is the latest newsletter from {company}. This month we cover {topic}, "
+     "product updates and upcoming events. Manage your subscription preferences from the link "
+     "at the bottom of this email."),
+    ("HumanReview", "Your order {num} has shipped",
+     "Hello {name}, good news! Your order {num} placed on {date} has shipped and should arrive "
+     "within three to five business days. Track your parcel using the tracking link in your account."),
+]
+NAMES = ["Alice", "Bob", "Carol", "Dave", "Erin", "Frank", "Grace", "Heidi", "Ivan", "Judy"]
+TOPICS = ["quarterly planning", "cloud migration", "data analytics", "security review", "design sprint"]
+WORDS = ("report project budget travel lunch feedback draft access account password team office "
+         "holiday printer laptop parking training policy contract review deadline question").split()
+
+
+def fill(template: str, rng: random.Random) -> str:
+    return template.format(
+        num=f"INV-{rng.randint(10000, 999999)}",
+        company=f"Company {rng.randint(1, 500)}",
+        name=rng.choice(NAMES),
+        date=f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        time=f"{rng.randint(8, 17)}:{rng.choice(['00', '30'])}",
+        amount=f"${rng.randint(10, 99999)}.{rng.randint(0, 99):02d}",
+        topic=rng.choice(TOPICS),
+    )
+
+
+def templated_email(rng: random.Random, domains: int) -> tuple:
+    workflow, subject, body = rng.choice(TEMPLATES)
+    email = NormalizedEmail(
+        sender=f"notifications@sender{rng.randrange(domains)}.example.com",
+        subject=fill(subject, rng),
+        body=fill(body, rng),
+        received_time="2024-01-01T00:00:00"
+    )
+    return email, workflow
+
+
+def unrelated_email(rng: random.Random, domains: int) -> NormalizedEmail:
+    return NormalizedEmail(
+        sender=f"person@sender{rng.randrange(domains)}.example.com",
+        subject=" ".join(rng.choices(WORDS, k=4)),
+        body=" ".join(rng.choices(WORDS, k=40)),
+        received_time="2024-01-01T00:00:00"
+    )
+
+
+def run(entries: int, lookups: int, domains: int, max_distance: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    tracemalloc.start()
+    index = NearDuplicateIndex(max_entries=entries, max_distance=max_distance)
+    started = time.perf_counter()
+    for _ in range(entries):
+        email, workflow = templated_email(rng, domains)
+        index.add(email, ClassificationResult(workflow_type=workflow, confidence_score=0.9))
+    build_seconds = time.perf_counter() - started
+    memory_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    def timed_lookups(make_email):
+        latencies, outcomes = [], []
+        for _ in range(lookups):
+            email, expected = make_email()
+            started = time.perf_counter()
+            match = index.find(email)
+            latencies.append(time.perf_counter() - started)
+            outcomes.append((match, expected))
+        return np.array(latencies) * 1e6, outcomes
+
+    variant_latency, variant_outcomes = timed_lookups(lambda: templated_email(rng, domains))
+    unrelated_latency, unrelated_outcomes = timed_lookups(lambda: (unrelated_email(rng, domains), None))
+
+    hits = [(m, e) for m, e in variant_outcomes if m is not None]
+    return {
+        "build_seconds": build_seconds,
+        "memory_mb": memory_bytes / 1e6,
+        "variant_p50_us": float(np.percentile(variant_latency, 50)),
+        "variant_p99_us": float(np.percentile(variant_latency, 99)),
+        "unrelated_p50_us": float(np.percentile(unrelated_latency, 50)),
+        "hit_rate": len(hits) / lookups,
+        "wrong_label": sum(1 for m, e in hits if m[0].workflow_type != e),
+        "false_positives": sum(1 for m, _ in unrelated_outcomes if m is not None),
+    }
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--domains", type=int, default=200)
+    parser.add_argument("--max-distance", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print("=== Near-Duplicate Index Benchmark ===")
+    print(f"Entries: {args.entries}, lookups: {args.lookups} per kind, max distance: {args.max_distance}\n")
+    print(f"{'domains':>8} {'build s':>8} {'memory MB':>10} {'hit p50 us':>11} {'hit p99 us':>11} "
+          f"{'miss p50 us':>12} {'hit rate':>9} {'wrong':>6} {'false +':>8}")
+    for domains in (args.domains, 1):
+        r = run(args.entries, args.lookups, domains, args.max_distance, args.seed)
+        print(f"{domains:>8} {r['build_seconds']:>8.1f} {r['memory_mb']:>10.1f} {r['variant_p50_us']:>11.1f} "
+              f"{r['variant_p99_us']:>11.1f} {r['unrelated_p50_us']:>12.1f} {r['hit_rate']:>9.1%} "
+              f"{r['wrong_label']:>6} {r['false_positives']:>8}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Benchmark: prompt tokens removed by body preprocessing, and its speed.
+
+Runs preprocess_body over a corpus and reports tokens before and after,
+the share of bodies cut to the token budget and the time per body. The
+corpus is a JSON Lines file with a "body" field per line (flat records or
+ClassifiedEmail payloads, as for train_local_classifier.py); without
+--corpus a synthetic corpus of replies, forwards, signatures and legal
+footers is generated.
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from body_preprocessor import preprocess_body
+
+DISCLAIMERS = [
+    "CONFIDENTIALITY NOTICE: This email and any attachments are confidential and intended solely for the "
+    "use of the individual or entity to whom they are addressed. If you have received this email in error "
+    "please notify the sender immediately and delete it from your system.",
+    "DISCLAIMER: The information contained in this message is privileged and confidential and is intended "
+    "only for the addressee. Any review, retransmission or dissemination is prohibited.",
+]
+SIGNATURES = [
+    "Best regards,\n{name}\nAccounts Payable | Example Corp\nTel: +1 555 0100\nwww.example.com",
+    "Thanks,\n{name}",
+    "--\n{name}\nSenior Consultant\nExample Consulting Ltd.",
+    "Kind regards,\n{name}\nSent from my iPhone",
+]
+OPENERS = [
+    "Please find attached invoice INV-{n} for last month's services. The total due is ${n}.00 within 30 days.",
+    "Could we schedule a call next week to go over the project plan? Tuesday or Wednesday afternoon works for me.",
+    "We are interested in your consulting services and would like to know more about pricing and availability.",
+    "Following up on my previous message, have you had a chance to look at the proposal?",
+]
+NAMES = ["Alice Martin", "Bob Chen", "Carol Diaz", "Dave Patel"]
+
+
+def synthetic_body(rng: random.Random) -> str:
+    """A new message on top of 0-6 quoted earlier messages, each with signature and footer."""
+    def message(depth: int) -> str:
+        name = rng.choice(NAMES)
+        parts = [rng.choice(OPENERS).format(n=rng.randint(100, 9999))]
+        parts.append("\n".join(rng.choice(OPENERS).format(n=rng.randint(100, 9999))
+                               for _ in range(rng.randint(0, 3))))
+        parts.append(rng.choice(SIGNATURES).format(name=name))
+        if rng.random() < 0.6:
+            parts.append(rng.choice(DISCLAIMERS))
+        return "\n\n".join(p for p in parts if p)
+
+    body = message(0)
+    for depth in range(rng.randint(0, 6)):
+        earlier = message(depth + 1)
+        style = rng.random()
+        if style < 0.4:
+            header = f"On Mon, Jan {depth + 1}, 2024 at 10:0{depth} AM {rng.choice(NAMES)} <someone@example.com> wrote:"
+            body += f"\n\n{header}\n" + "\n".join(f"> {line}" for line in earlier.splitlines())
+        elif style < 0.8:
+            body += (f"\n\nFrom: {rng.choice(NAMES)} <someone@example.com>\nSent: Monday, January {depth + 1}, 2024"
+                     f"\nTo: Team\nSubject: RE: Project\n\n{earlier}")
+        else:
+            body += f"\n\n---------- Forwarded message ---------\nFrom: someone@example.com\n\n{earlier}"
+    return body
+
+
+def load_corpus(path: str):
+    bodies = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                bodies.append(record.get("original_email", record).get("body", ""))
+    return bodies
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", help="JSON Lines file with email bodies")
+    parser.add_argument("--emails", type=int, default=5000, help="Size of the synthetic corpus")
+    parser.add_argument("--budget", type=int, default=1000, help="Token budget per body")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        bodies = load_corpus(args.corpus)
+    else:
+        rng = random.Random(args.seed)
+        bodies = [synthetic_body(rng) for _ in range(args.emails)]
+
+    latencies = []
+    results = []
+    for body in bodies:
+        started = time.perf_counter()
+        results.append(preprocess_body(body, args.budget))
+        latencies.append(time.perf_counter() - started)
+    latencies = np.array(latencies) * 1e6
+
+    original = np.array([r.original_tokens for r in results])
+    kept = np.array([r.kept_tokens for r in results])
+    total_bytes = sum(len(body.encode()) for body in bodies)
+
+    print("=== Body Preprocessing Benchmark ===")
+    print(f"Corpus: {args.corpus or 'synthetic'} ({len(bodies)} bodies, {total_bytes / 1e6:.1f} MB), "
+          f"budget: {args.budget} tokens\n")
+    print(f"Tokens per body (mean):   {original.mean():8.1f} -> {kept.mean():8.1f}")
+    print(f"Tokens per body (p95):    {np.percentile(original, 95):8.1f} -> {np.percentile(kept, 95):8.1f}")
+    print(f"Tokens saved:             {original.sum() - kept.sum()} "
+          f"({(original.sum() - kept.sum()) / max(1, original.sum()):.1%})")
+    print(f"Cut to budget:            {sum(r.truncated for r in results)} bodies")
+    print(f"Time per body p50 / p99:  {np.percentile(latencies, 50):.1f} / {np.percentile(latencies, 99):.1f} us")
+    print(f"Throughput:               {total_bytes / 1e6 / (latencies.sum() / 1e6):.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,316 @@
+# body_preprocessor.py for email_classification_agent
+import re
+import threading
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+# Rough token count: words and individual punctuation marks
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Start of quoted history: what follows belongs to earlier messages
+QUOTE_HEADER_PATTERN = re.compile(
+    r"""^\s*(?:
+        On\s.{1,300}?\swrote:\s*$
+      | Le\s.{1,300}?\sa\s+écrit\s*:\s*$
+      | Am\s.{1,300}?\sschrieb\s.{0,200}:\s*$
+      | -{2,}\s*Original\s+Message\s*-{2,}
+      | _{10,}\s*$
+    )""",
+    re.IGNORECASE | re.VERBOSE
+)
+# Start of a forwarded message: what follows is what the sender wants handled
+FORWARD_HEADER_PATTERN = re.compile(
+    r"^\s*(?:-{2,}\s*Forwarded\s+message\s*-{2,}|Begin\s+forwarded\s+message\s*:)",
+    re.IGNORECASE
+)
+# Lines of the header block after a quote or forward header, e.g. "Subject: FW: Invoice 4411"
+HEADER_FIELD_PATTERN = re.compile(
+    r"^\s*\*?(?:From|Sent|Date|To|Cc|Bcc|Subject|Reply-To):\*?(?:\s|$)", re.IGNORECASE
+)
+FORWARD_SUBJECT_PATTERN = re.compile(r"^\s*\*?Subject:\*?\s*fwd?\s*:", re.IGNORECASE)
+# "On <date>, <name> <address>" wrapped before "wrote:"
+WRAPPED_QUOTE_START_PATTERN = re.compile(r"^\s*On\s.{1,300}$", re.IGNORECASE)
+WRAPPED_QUOTE_END_PATTERN = re.compile(r"^.{0,200}\swrote:\s*$", re.IGNORECASE)
+# Outlook-style header block: "From: ..." followed by "Sent:"/"Date:"
+OUTLOOK_FROM_PATTERN = re.compile(r"^\s*\*?From:\*?\s+\S", re.IGNORECASE)
+OUTLOOK_SENT_PATTERN = re.compile(r"^\s*\*?(?:Sent|Date):\*?\s+\S", re.IGNORECASE)
+QUOTED_LINE_PATTERN = re.compile(r"^\s*>")
+SIGNATURE_DELIMITER_PATTERN = re.compile(r"^--\s?$")
+MOBILE_FOOTER_PATTERN = re.compile(
+    r"^\s*(?:Sent\s+from\s+my\s+\w+|Sent\s+from\s+(?:Mail|Outlook)\s+for\s+\w+|Get\s+Outlook\s+for\s+\w+)",
+    re.IGNORECASE
+)
+SIGN_OFF_PATTERN = re.compile(
+    r"^\s*(?:(?:best|kind|warm|warmest)?\s*regards|best(?:\s+wishes)?|thanks(?:\s+again)?|"
+    r"thank\s+you|many\s+thanks|cheers|sincerely|yours(?:\s+(?:truly|sincerely))?)\s*[,.!]?\s*$",
+    re.IGNORECASE
+)
+# Lines that are only contact details, e.g. "Tel: 555 0100", "alice@example.com", "www.example.com"
+SIGNATURE_CONTACT_PATTERN = re.compile(
+    r"^\s*(?:(?:tel|phone|mobile|cell|fax|e-?mail|web|[tmpef])\s*[:.]\s*\S.*"
+    r"|\S+@\S+|(?:https?://|www\.)\S+|\+?[\d\s().-]{7,})\s*$",
+    re.IGNORECASE
+)
+# Disclaimer and mailing-list boilerplate, dropped when it trails the message
+DISCLAIMER_PATTERN = re.compile(
+    r"(?:confidential|privileged).{0,200}(?:intended\s+(?:solely\s+|only\s+)?for|addressee)"
+    r"|received\s+this\s+(?:e-?mail|message|communication)\s+in\s+error"
+    r"|this\s+(?:e-?mail|message)\s+and\s+any\s+(?:attachments|files)"
+    r"|^\s*disclaimer\s*:?"
+    r"|(?:unsubscribe|manage\s+your\s+(?:email\s+)?preferences)",
+    re.IGNORECASE | re.DOTALL
+)
+
+MAX_SIGNATURE_LINES = 8
+MAX_SIGNATURE_LINE_LENGTH = 80
+# Longest line without contact details that can still be a name, title or company
+MAX_SIGNATURE_NAME_WORDS = 6
+MAX_PARAGRAPH_LINES = 50
+
+
+def count_tokens(text: str) -> int:
+    """Approximate LLM token count of a text."""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def is_signature_line(line: str) -> bool:
+    """Whether a line after a sign-off looks like part of a signature: blank, contact details or a name."""
+    stripped = line.strip()
+    if not stripped:
+        return True
+    if len(line) > MAX_SIGNATURE_LINE_LENGTH:
+        return False
+    if SIGNATURE_CONTACT_PATTERN.match(stripped):
+        return True
+    words = stripped.split()
+    # Names, job titles and company names are short and are not sentences
+    return (len(words) <= MAX_SIGNATURE_NAME_WORDS and not stripped[0].islower()
+            and not stripped.endswith(("?", "!", ":", ";"))
+            and not (stripped.endswith(".") and len(words) > 3))
+
+
+def clean_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Drop quoted history, signatures and disclaimers from a stream of body lines.
+
+    A sign-off or "--" starts a signature only if every line after it, up to
+    the end of the message, looks like a name or contact details; disclaimers
+    are dropped only when nothing but boilerplate follows them. Quoted history
+    is cut only when new text precedes it, and forwarded messages are kept
+    without their header block. Lines are
+    consumed lazily and at most one paragraph plus a short signature
+    candidate and any trailing boilerplate are buffered, so a generator over
+    a large body can be stopped early once enough text has been produced.
+    """
+    paragraph: List[str] = []
+    signature: List[str] = []
+    # A paragraph after the signature candidate that is not signature-like: if it
+    # turns out to be a disclaimer it belongs to the trailing block, else the message goes on
+    tail: List[str] = []
+    # Disclaimer lines in the signature candidate, not counted against MAX_SIGNATURE_LINES
+    signature_disclaimer_lines = 0
+    # Disclaimer paragraphs (and blank lines after them), kept only if content follows
+    boilerplate: List[str] = []
+    pending: Optional[str] = None
+    emitted = False
+    # Inside the header block after a quote or forward header; whether it is a forward
+    in_header = False
+    header_forwarded = False
+
+    def flush_paragraph():
+        nonlocal emitted
+        kept = list(paragraph)
+        paragraph.clear()
+        if DISCLAIMER_PATTERN.search("\n".join(kept)):
+            boilerplate.extend(kept)
+            return []
+        if boilerplate and any(line.strip() for line in kept):
+            kept = boilerplate + kept
+            boilerplate.clear()
+        emitted = emitted or any(line.strip() for line in kept)
+        return kept
+
+    def add_line(line: str):
+        """Lines of the message proper, other than sign-offs."""
+        if line.strip():
+            paragraph.append(line)
+            if len(paragraph) >= MAX_PARAGRAPH_LINES:
+                yield from flush_paragraph()
+        else:
+            yield from flush_paragraph()
+            if boilerplate:
+                boilerplate.append(line)
+            else:
+                yield line
+
+    def tail_is_disclaimer() -> bool:
+        # The tail with the signature candidate's lines of the same paragraph
+        start = max((i + 1 for i, previous in enumerate(signature) if not previous.strip()), default=0)
+        return bool(DISCLAIMER_PATTERN.search("\n".join(signature[start:] + tail)))
+
+    def restore_signature():
+        """The sign-off did not start a signature after all: its lines are the message."""
+        nonlocal signature_disclaimer_lines
+        restored = signature + tail
+        signature.clear()
+        tail.clear()
+        signature_disclaimer_lines = 0
+        for previous in restored:
+            yield from add_line(previous)
+
+    def end_signature():
+        """The message ends before a forwarded one: settle the signature candidate as at the end."""
+        nonlocal signature_disclaimer_lines
+        if tail and not tail_is_disclaimer():
+            yield from restore_signature()
+        elif signature and not emitted and SIGN_OFF_PATTERN.match(signature[0]):
+            yield from add_line(signature[0])
+        signature.clear()
+        tail.clear()
+        signature_disclaimer_lines = 0
+
+    def has_text() -> bool:
+        return emitted or bool(paragraph) or bool(signature)
+
+    def start_header(forwarded: bool):
+        nonlocal in_header, header_forwarded
+        in_header, header_forwarded = True, forwarded
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        if in_header:
+            if not line.strip() or HEADER_FIELD_PATTERN.match(line):
+                header_forwarded = header_forwarded or bool(FORWARD_SUBJECT_PATTERN.match(line))
+                continue
+            in_header = False
+            if header_forwarded:
+                # Keep the forwarded message, apart from the header block
+                yield from end_signature()
+                yield from add_line("")
+            elif has_text():
+                # Quoted history of a reply
+                break
+
+        if pending is not None:
+            previous, pending = pending, None
+            if (OUTLOOK_FROM_PATTERN.match(previous) and OUTLOOK_SENT_PATTERN.match(line)
+                    or WRAPPED_QUOTE_START_PATTERN.match(previous) and WRAPPED_QUOTE_END_PATTERN.match(line)):
+                start_header(False)
+                continue
+            paragraph.append(previous)
+
+        if QUOTE_HEADER_PATTERN.match(line) or FORWARD_HEADER_PATTERN.match(line):
+            # Decide once the header block is over: a reply is cut, a forward kept
+            start_header(bool(FORWARD_HEADER_PATTERN.match(line)))
+            continue
+        if OUTLOOK_FROM_PATTERN.match(line) or (
+                WRAPPED_QUOTE_START_PATTERN.match(line) and not line.rstrip().endswith((".", "?", "!"))):
+            # Decide once the next line is known
+            pending = line
+            continue
+        if QUOTED_LINE_PATTERN.match(line) or MOBILE_FOOTER_PATTERN.match(line):
+            continue
+
+        if signature:
+            if line.strip() and (tail or not (len(signature) - signature_disclaimer_lines <= MAX_SIGNATURE_LINES
+                                              and is_signature_line(line))):
+                tail.append(line)
+                if len(tail) < MAX_PARAGRAPH_LINES:
+                    continue
+                yield from restore_signature()
+                continue
+            if tail and tail_is_disclaimer():
+                signature.extend(tail)
+                signature_disclaimer_lines += len(tail)
+                tail.clear()
+            if not tail:
+                signature.append(line)
+                continue
+            # More of the message follows, so the sign-off did not start a signature
+            yield from restore_signature()
+        if SIGN_OFF_PATTERN.match(line) or SIGNATURE_DELIMITER_PATTERN.match(line):
+            yield from flush_paragraph()
+            signature.append(line)
+            continue
+
+        yield from add_line(line)
+
+    if tail and not tail_is_disclaimer():
+        yield from restore_signature()
+    if pending is not None:
+        paragraph.append(pending)
+    yield from flush_paragraph()
+    # A message that is nothing but a "disclaimer" (e.g. a request to unsubscribe) is kept
+    if not emitted and boilerplate:
+        emitted = True
+        yield from boilerplate
+    # Whatever followed a sign-off at the end of the message is the signature,
+    # unless the sign-off is all there is (e.g. a bare "Thanks!")
+    if not emitted and signature and SIGN_OFF_PATTERN.match(signature[0]):
+        yield from signature[:1]
+
+
+class PreprocessedBody(NamedTuple):
+    text: str
+    original_tokens: int
+    kept_tokens: int
+    truncated: bool
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.kept_tokens
+
+
+def preprocess_body(body: str, token_budget: int = 1000) -> PreprocessedBody:
+    """Strip quoted history, signatures and disclaimers and cut the rest to a token budget."""
+    original_tokens = count_tokens(body)
+    kept: List[str] = []
+    kept_tokens = 0
+    truncated = False
+    for line in clean_lines(body.splitlines()):
+        line_tokens = count_tokens(line)
+        if token_budget and kept_tokens + line_tokens > token_budget:
+            remaining = token_budget - kept_tokens
+            matches = list(TOKEN_PATTERN.finditer(line))
+            if remaining > 0:
+                kept.append(line[:matches[remaining - 1].end()])
+                kept_tokens += remaining
+            truncated = True
+            break
+        kept.append(line)
+        kept_tokens += line_tokens
+
+    text = re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+    if truncated:
+        text += "\n[truncated]"
+    return PreprocessedBody(text, original_tokens, kept_tokens, truncated)
+
+
+class PreprocessingStats:
+    """Running totals of tokens removed from email bodies before classification."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.original_tokens = 0
+        self.kept_tokens = 0
+        self.truncated = 0
+
+    def record(self, result: PreprocessedBody):
+        with self._lock:
+            self.requests += 1
+            self.original_tokens += result.original_tokens
+            self.kept_tokens += result.kept_tokens
+            self.truncated += int(result.truncated)
+
+    def stats(self) -> dict:
+        with self._lock:
+            saved = self.original_tokens - self.kept_tokens
+            return {
+                "requests": self.requests,
+                "original_tokens": self.original_tokens,
+                "kept_tokens": self.kept_tokens,
+                "tokens_saved": saved,
+                "avg_tokens_saved": round(saved / self.requests, 1) if self.requests else None,
+                "reduction": round(saved / self.original_tokens, 4) if self.original_tokens else None,
+                "truncated": self.truncated,
+            }
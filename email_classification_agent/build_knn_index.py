@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Build the kNN index of labeled emails used by the nearest-neighbour tier.
+
+Takes the same JSON Lines input as train_local_classifier.py. Bodies are
+preprocessed the way the service does before classification (unless
+--no-preprocess), so the indexed emails look like the ones they are compared
+with. A share of the data is held out to report accuracy and coverage per
+confidence threshold.
+Use the output directory as KNN_INDEX_PATH.
+
+    python build_knn_index.py --data history.jsonl --output models/knn_index
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knn_index import KNNClassifier, VectorIndex
+from train_local_classifier import evaluate, load_examples, preprocess_examples
+
+
+def main_build():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="Labeled emails as JSON Lines")
+    parser.add_argument("--output", required=True, help="Index directory (replaced if it exists)")
+    parser.add_argument("--dimensions", type=int, default=256, help="Embedding dimensions")
+    parser.add_argument("--ivf-threshold", type=int, default=50000,
+                        help="Build an IVF index when there are at least this many emails")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-similarity", type=float, default=0.3)
+    parser.add_argument("--token-budget", type=int, default=1000, help="PROMPT_BODY_TOKEN_BUDGET of the service")
+    parser.add_argument("--no-preprocess", action="store_true",
+                        help="Index raw bodies, for a service with BODY_PREPROCESSING_ENABLED=false")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of examples held out for evaluation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    if not args.no_preprocess:
+        examples = preprocess_examples(examples, args.token_budget)
+    random.Random(args.seed).shuffle(examples)
+    holdout_size = int(len(examples) * args.holdout)
+    holdout, indexed = examples[:holdout_size], examples[holdout_size:]
+    print(f"Loaded {len(examples)} examples ({len(indexed)} indexed, {len(holdout)} held out)")
+
+    if os.path.exists(args.output):
+        shutil.rmtree(args.output)
+    index = VectorIndex(args.dimensions, path=args.output, ivf_threshold=args.ivf_threshold)
+    classifier = KNNClassifier(index, k=args.k, min_similarity=args.min_similarity)
+    started = time.perf_counter()
+    classifier.add([email for email, _ in indexed], [label for _, label in indexed])
+    print(f"Indexed {index.count} emails in {time.perf_counter() - started:.1f}s ({index.stats()['mode']} search)")
+
+    if holdout:
+        report = evaluate(classifier, holdout)
+        print(f"\nHeld-out accuracy: {report['accuracy']:.1%}")
+        print(f"{'threshold':>10} {'coverage':>9} {'accuracy':>9}")
+        for threshold, row in report["thresholds"].items():
+            accuracy = f"{row['accuracy']:.1%}" if row["accuracy"] is not None else "-"
+            print(f"{threshold:>10} {row['coverage']:>9.1%} {accuracy:>9}")
+    print(f"\nSaved index to {args.output}")
+
+
+if __name__ == "__main__":
+    main_build()
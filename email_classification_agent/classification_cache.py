@@ -0,0 +1,259 @@
+# classification_cache.py for email_classification_agent
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from shared.models import NormalizedEmail, ClassificationResult
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so formatting differences hash alike."""
+    return WHITESPACE_PATTERN.sub(" ", text or "").strip().lower()
+
+
+def sender_domain(sender: str) -> str:
+    """Domain part of an address such as ``Billing <billing@supplier.com>``."""
+    address = sender.strip().rstrip(">").lower()
+    return address.rsplit("@", 1)[-1] if "@" in address else address
+
+
+def cache_key(email: NormalizedEmail) -> str:
+    """Content hash of an email's sender domain, subject and body."""
+    content = "\x1f".join((
+        sender_domain(email.sender),
+        normalize_text(email.subject),
+        normalize_text(email.body),
+    ))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """LRU cache of classification results with a TTL and an optional SQLite tier.
+
+    The in-memory tier holds at most max_entries results. When db_path is
+    set, results are also written to SQLite so they survive restarts; a
+    memory miss falls through to disk and promotes the entry back into memory.
+
+    Disk I/O runs on the cache's own thread: put() returns once the result is
+    in memory and its write is queued, queued writes are committed together,
+    and get_async() reads the disk without blocking the event loop.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 86400.0,
+                 db_path: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored_at, result json)
+        # Writes not yet on disk, key -> (stored_at, result json)
+        self._pending: Dict[str, tuple] = {}
+        self._flush_scheduled = False
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stores = 0
+        self.disk_commits = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            with self._conn:
+                self._conn.execute(
+                    """CREATE TABLE IF NOT EXISTS classification_cache (
+                           key TEXT PRIMARY KEY,
+                           result TEXT NOT NULL,
+                           stored_at REAL NOT NULL
+                       )"""
+                )
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="classification-cache")
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def _memory_get(self, key: str, now: float) -> Optional[ClassificationResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return ClassificationResult.model_validate_json(entry[1])
+                del self._entries[key]
+                self.expirations += 1
+            return None
+
+    def _disk_get(self, key: str, now: float) -> Optional[ClassificationResult]:
+        with self._lock:
+            row = self._pending.get(key)
+        if row is None:
+            with self._db_lock:
+                if self._conn is None:
+                    return None
+                found = self._conn.execute(
+                    "SELECT stored_at, result FROM classification_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if found is not None and self._expired(found[0], now):
+                    with self._conn:
+                        self._conn.execute("DELETE FROM classification_cache WHERE key = ?", (key,))
+                    with self._lock:
+                        self.expirations += 1
+                    return None
+                row = found
+        if row is None or self._expired(row[0], now):
+            return None
+        with self._lock:
+            self._remember(key, row[0], row[1])
+            self.disk_hits += 1
+        return ClassificationResult.model_validate_json(row[1])
+
+    def _missed(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def get(self, key: str) -> Optional[ClassificationResult]:
+        """Return the cached result for a key, or None on a miss."""
+        now = self._clock()
+        result = self._memory_get(key, now)
+        if result is None and self._conn is not None:
+            result = self._disk_get(key, now)
+        if result is None:
+            self._missed()
+        return result
+
+    async def get_async(self, key: str) -> Optional[ClassificationResult]:
+        """get() for the event loop: a memory miss is looked up on disk on the cache's thread."""
+        now = self._clock()
+        result = self._memory_get(key, now)
+        if result is None and self._executor is not None:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, self._disk_get, key, now)
+        if result is None:
+            self._missed()
+        return result
+
+    def put(self, key: str, result: ClassificationResult):
+        """Cache a classification result under a key; the disk write is queued, not awaited."""
+        now = self._clock()
+        payload = result.model_dump_json()
+        with self._lock:
+            self._remember(key, now, payload)
+            self.stores += 1
+            if self._executor is None:
+                return
+            self._pending[key] = (now, payload)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self._executor.submit(self._flush)
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+        if not pending:
+            return
+        try:
+            with self._db_lock:
+                if self._conn is None:
+                    return
+                with self._conn:
+                    self._conn.executemany(
+                        """INSERT INTO classification_cache (key, result, stored_at) VALUES (?, ?, ?)
+                           ON CONFLICT(key) DO UPDATE SET
+                               result = excluded.result,
+                               stored_at = excluded.stored_at""",
+                        [(key, payload, stored_at) for key, (stored_at, payload) in pending.items()]
+                    )
+                self.disk_commits += 1
+        except sqlite3.Error as e:
+            logger.error(f"Could not write {len(pending)} classification cache entries to disk: {e}")
+
+    def flush(self):
+        """Wait until every result put so far is written to disk."""
+        if self._executor is not None:
+            self._executor.submit(self._flush).result()
+
+    def _remember(self, key: str, stored_at: float, payload: str):
+        self._entries[key] = (stored_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers and return how many were removed."""
+        now = self._clock()
+        removed = 0
+        with self._lock:
+            for key in [k for k, (stored_at, _) in self._entries.items() if self._expired(stored_at, now)]:
+                del self._entries[key]
+                removed += 1
+        if self.ttl_seconds > 0:
+            self.flush()
+            with self._db_lock:
+                if self._conn is not None:
+                    with self._conn:
+                        cursor = self._conn.execute(
+                            "DELETE FROM classification_cache WHERE stored_at < ?", (now - self.ttl_seconds,)
+                        )
+                    removed += cursor.rowcount
+        with self._lock:
+            self.expirations += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+        with self._db_lock:
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM classification_cache")
+
+    def close(self):
+        """Write queued results to disk and close the SQLite tier."""
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self._conn is not None,
+                "hits": self.memory_hits + self.disk_hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+                "stores": self.stores,
+                "pending_writes": len(self._pending),
+                "disk_commits": self.disk_commits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,102 @@
+# hedging.py for email_classification_agent
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from llm_limiter import percentile
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """Send a duplicate of a slow call and use whichever copy succeeds first.
+
+    When the first attempt has not finished after the `quantile` of recent
+    call latencies (or `initial_delay` until `min_samples` calls have been
+    seen), a second attempt is started. The first attempt to return a value
+    wins and the other is cancelled; if one attempt raises, the other is
+    still awaited. Hedges are limited to `max_rate` of all calls, and
+    `can_hedge` can veto a hedge, e.g. while calls are queueing.
+    """
+
+    def __init__(self, quantile: float = 0.95, initial_delay: float = 2.0, min_delay: float = 0.05,
+                 max_rate: float = 0.05, min_samples: int = 20, window: int = 1000,
+                 can_hedge: Optional[Callable[[], bool]] = None):
+        self.quantile = quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.can_hedge = can_hedge
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.skipped_budget = 0
+        self.skipped_busy = 0
+
+    def delay(self) -> float:
+        """Seconds to wait for the first attempt before hedging."""
+        if len(self._latencies) < max(1, self.min_samples):
+            return self.initial_delay
+        return max(self.min_delay, percentile(self._latencies, self.quantile))
+
+    def _allow_hedge(self) -> bool:
+        if self.hedges_fired + 1 > self.max_rate * self.calls:
+            self.skipped_budget += 1
+            return False
+        if self.can_hedge is not None and not self.can_hedge():
+            self.skipped_busy += 1
+            return False
+        return True
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Await `call()`, hedging it with a second `call()` if it is slow."""
+        self.calls += 1
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(call())
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.delay())
+            if done or not self._allow_hedge():
+                result = await primary
+                self._latencies.append(time.perf_counter() - started)
+                return result
+
+            self.hedges_fired += 1
+            hedge = asyncio.ensure_future(call())
+            pending = {primary, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        for loser in pending:
+                            loser.cancel()
+                        if task is hedge:
+                            self.hedges_won += 1
+                            logger.info(f"Hedged call won after {time.perf_counter() - started:.2f}s")
+                        self._latencies.append(time.perf_counter() - started)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also reached when the caller itself is cancelled
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "hedge_rate": round(self.hedges_fired / self.calls, 4) if self.calls else None,
+            "skipped_budget": self.skipped_budget,
+            "skipped_busy": self.skipped_busy,
+            "delay_ms": round(self.delay() * 1000, 3),
+        }
@@ -8,7 +8,7 @@ import threading
 import time
 from datetime import datetime
 from http.server import HTTPServer, BaseHTTPRequestHandler
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared.models import NormalizedEmail, ClassificationResult, ClassifiedEmail
@@ -156,6 +156,9 @@ def run_integration_test():
     # Override the router URL
     main.ROUTER_AGENT_URL = "http://localhost:8002/route"
     main.CONFIDENCE_THRESHOLD = 0.85
+    # Every request should reach the mocked LLM
+    main.classification_cache = None
+    main.near_duplicate_index = None
     
     # Clear received emails
     MockRouterHandler.received_emails = []
@@ -168,7 +171,7 @@ def run_integration_test():
     print(f"Created {len(test_cases)} test email scenarios\n")
     
     # Mock the OpenAI LLM
-    with patch('main.llm.invoke') as mock_llm:
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm:
         successful_classifications = 0
         
         for i, test_case in enumerate(test_cases):
@@ -250,8 +253,10 @@ def test_error_scenarios():
     # Test 1: Router unavailable
     print("\n1. Testing router unavailable scenario...")
     main.ROUTER_AGENT_URL = "http://localhost:9999/route"  # Non-existent port
+    main.classification_cache = None
+    main.near_duplicate_index = None
     
-    with patch('main.llm.invoke') as mock_llm:
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm:
         mock_classification = ClassificationResult(
             workflow_type="InvoiceRequest",
             confidence_score=0.95
@@ -283,7 +288,7 @@ def test_error_scenarios():
     
     # Test 3: LLM failure
     print("\n3. Testing LLM failure...")
-    with patch('main.llm.invoke') as mock_llm:
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm:
         mock_llm.side_effect = Exception("LLM API Error")
         
         response = client.post("/classify", json=test_email.model_dump())
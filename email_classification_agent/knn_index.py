@@ -0,0 +1,282 @@
+# knn_index.py for email_classification_agent
+import json
+import os
+import zlib
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shared.models import NormalizedEmail, ClassificationResult
+from local_classifier import LABELS, email_features
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+LABELS_FILE = "labels.u8"
+IVF_FILES = ("ivf_centroids", "ivf_codes", "ivf_scales", "ivf_ids", "ivf_offsets")
+
+
+def embed_email(email: NormalizedEmail, dimensions: int = 256) -> np.ndarray:
+    """Unit-length float32 embedding by signed hashing of the local classifier's features."""
+    counts = Counter(zlib.crc32(f.encode()) for f in email_features(email))
+    hashes = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    weights = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    # One hash bit above the bucket index picks the sign, so collisions tend to cancel out
+    signs = np.where((hashes // dimensions) & 1, 1.0, -1.0).astype(np.float32)
+    vector = np.zeros(dimensions, dtype=np.float32)
+    np.add.at(vector, hashes % dimensions, signs * weights)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 codes and per-vector scales; vectors ~= codes / scales."""
+    peak = np.abs(vectors).max(axis=1)
+    scales = np.where(peak > 0, 127.0 / np.maximum(peak, 1e-12), 1.0).astype(np.float32)
+    codes = np.rint(vectors * scales[:, None]).astype(np.int8)
+    return codes, scales
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """Labeled unit vectors searched by cosine similarity.
+
+    Vectors and labels are kept in raw memory-mapped files inside `path` (or
+    in memory without a path) and can be added incrementally. Up to
+    `ivf_threshold` vectors every search is exact; beyond that an IVF index
+    with int8-quantized vectors is built, `nprobe` of its lists are scanned
+    and the best candidates are re-ranked with the exact vectors. Vectors
+    added after the IVF build are searched exactly until they exceed
+    `rebuild_ratio` of the indexed ones, at which point the IVF is rebuilt.
+    """
+
+    def __init__(self, dimensions: int = 256, path: Optional[str] = None, labels: Sequence[str] = LABELS,
+                 ivf_threshold: int = 50000, nprobe: int = 8, rebuild_ratio: float = 0.1):
+        self.dimensions = dimensions
+        self.path = path
+        self.labels = list(labels)
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.rebuild_ratio = rebuild_ratio
+        self.count = 0
+        self.capacity = 0
+        self._vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self._label_ids = np.zeros(0, dtype=np.uint8)
+        self._ivf: Optional[dict] = None
+        self.ivf_count = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            if os.path.exists(os.path.join(path, META_FILE)):
+                self._load()
+            else:
+                self._save_meta()
+
+    # --- persistence ---
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        with open(self._file(META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported kNN index format {meta.get('format_version')!r} in {self.path}")
+        self.dimensions = meta["dimensions"]
+        self.labels = meta["labels"]
+        self.count = meta["count"]
+        self.ivf_count = meta.get("ivf_count", 0)
+        self._map(meta["capacity"])
+        if self.ivf_count:
+            self._ivf = {name: np.load(self._file(name + ".npy"), mmap_mode="r") for name in IVF_FILES}
+
+    def _save_meta(self):
+        if not self.path:
+            return
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "dimensions": self.dimensions,
+            "labels": self.labels,
+            "count": self.count,
+            "capacity": self.capacity,
+            "ivf_count": self.ivf_count,
+        }
+        temporary = self._file(META_FILE + ".tmp")
+        with open(temporary, "w") as f:
+            json.dump(meta, f)
+        os.replace(temporary, self._file(META_FILE))
+
+    def _map(self, capacity: int):
+        self.capacity = capacity
+        if capacity == 0:
+            return
+        self._vectors = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r+",
+                                  shape=(capacity, self.dimensions))
+        self._label_ids = np.memmap(self._file(LABELS_FILE), dtype=np.uint8, mode="r+", shape=(capacity,))
+
+    def _grow(self, needed: int):
+        capacity = max(needed, self.capacity * 2, 1024)
+        if not self.path:
+            vectors = np.zeros((capacity, self.dimensions), dtype=np.float32)
+            label_ids = np.zeros(capacity, dtype=np.uint8)
+            vectors[:self.count] = self._vectors[:self.count]
+            label_ids[:self.count] = self._label_ids[:self.count]
+            self._vectors, self._label_ids, self.capacity = vectors, label_ids, capacity
+            return
+        self.flush()
+        self._vectors = self._label_ids = None
+        for name, row_bytes in ((VECTORS_FILE, 4 * self.dimensions), (LABELS_FILE, 1)):
+            with open(self._file(name), "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._map(capacity)
+
+    def flush(self):
+        """Write added vectors and the index metadata to disk."""
+        if self.path and self.capacity:
+            self._vectors.flush()
+            self._label_ids.flush()
+        self._save_meta()
+
+    # --- adding and searching ---
+
+    def add(self, vectors: np.ndarray, labels: Sequence[str]):
+        """Append unit vectors with their labels, rebuilding the IVF index when due."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {vectors.shape[1]}")
+        if len(vectors) != len(labels):
+            raise ValueError(f"{len(vectors)} vectors but {len(labels)} labels")
+        label_ids = np.array([self.labels.index(label) for label in labels], dtype=np.uint8)
+        if self.count + len(vectors) > self.capacity:
+            self._grow(self.count + len(vectors))
+        self._vectors[self.count:self.count + len(vectors)] = vectors
+        self._label_ids[self.count:self.count + len(vectors)] = label_ids
+        self.count += len(vectors)
+
+        if self._ivf is None:
+            if self.count >= self.ivf_threshold:
+                self.build_ivf()
+        elif self.count - self.ivf_count > self.rebuild_ratio * self.ivf_count:
+            self.build_ivf()
+        self._save_meta()
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 10, seed: int = 0,
+                  chunk_size: int = 65536):
+        """Cluster the vectors with spherical k-means and store them per cluster as int8 codes."""
+        count = self.count
+        nlist = nlist or max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(seed)
+        sample = self._vectors[np.sort(rng.choice(count, size=min(count, nlist * 64), replace=False))]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids).astype(np.float32)
+
+        assignment = np.empty(count, dtype=np.int32)
+        for start in range(0, count, chunk_size):
+            block = self._vectors[start:min(count, start + chunk_size)]
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        ids = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.searchsorted(assignment[ids], np.arange(nlist + 1)).astype(np.int64)
+        codes = np.empty((count, self.dimensions), dtype=np.int8)
+        scales = np.empty(count, dtype=np.float32)
+        for start in range(0, count, chunk_size):
+            block_ids = ids[start:start + chunk_size]
+            codes[start:start + len(block_ids)], scales[start:start + len(block_ids)] = \
+                quantize(self._vectors[block_ids])
+
+        ivf = {"ivf_centroids": centroids, "ivf_codes": codes, "ivf_scales": scales,
+               "ivf_ids": ids, "ivf_offsets": offsets}
+        if self.path:
+            self._ivf = None
+            for name, array in ivf.items():
+                np.save(self._file(name + ".npy"), array)
+            ivf = {name: np.load(self._file(name + ".npy"), mmap_mode="r") for name in IVF_FILES}
+        self._ivf = ivf
+        self.ivf_count = count
+        self.flush()
+
+    def search(self, query: np.ndarray, k: int = 10, exact: bool = False) -> Tuple[List[str], np.ndarray]:
+        """Labels and cosine similarities of the k nearest vectors, most similar first.
+
+        exact=True scans every vector even when an IVF index exists.
+        """
+        if self.count == 0:
+            return [], np.zeros(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        use_ivf = self._ivf is not None and not exact
+        if not use_ivf:
+            candidates = np.arange(self.count)
+        else:
+            centroids, offsets = self._ivf["ivf_centroids"], self._ivf["ivf_offsets"]
+            probed = _top_k(centroids @ query, min(self.nprobe, len(centroids)))
+            positions = np.concatenate([np.arange(offsets[c], offsets[c + 1]) for c in probed])
+            approximate = (self._ivf["ivf_codes"][positions] @ query) / self._ivf["ivf_scales"][positions]
+            # Re-rank a few times more candidates than needed with the exact vectors
+            shortlist = self._ivf["ivf_ids"][positions[_top_k(approximate, 4 * k)]]
+            candidates = np.concatenate([shortlist, np.arange(self.ivf_count, self.count)])
+        scores = self._vectors[candidates] @ query if use_ivf else self._vectors[:self.count] @ query
+        best = _top_k(scores, k)
+        return [self.labels[i] for i in self._label_ids[candidates[best]]], scores[best]
+
+    def stats(self) -> dict:
+        return {
+            "vectors": self.count,
+            "dimensions": self.dimensions,
+            "mode": "ivf" if self._ivf is not None else "exact",
+            "ivf_lists": len(self._ivf["ivf_centroids"]) if self._ivf is not None else None,
+            "nprobe": self.nprobe if self._ivf is not None else None,
+            "unindexed": self.count - self.ivf_count if self._ivf is not None else None,
+            "persistent": bool(self.path),
+        }
+
+
+class KNNClassifier:
+    """Label emails by a similarity-weighted vote of their nearest labeled neighbours.
+
+    Neighbours below `min_similarity` do not vote. The confidence is the
+    winning label's share of the vote times the similarity of its closest
+    neighbour, so only close, unanimous neighbourhoods reach a high score;
+    with no voting neighbour the result is HumanReview with confidence 0.
+    """
+
+    def __init__(self, index: VectorIndex, k: int = 10, min_similarity: float = 0.3):
+        self.index = index
+        self.k = k
+        self.min_similarity = min_similarity
+
+    def embed(self, email: NormalizedEmail) -> np.ndarray:
+        return embed_email(email, self.index.dimensions)
+
+    def classify(self, email: NormalizedEmail) -> ClassificationResult:
+        labels, similarities = self.index.search(self.embed(email), self.k)
+        votes: dict = {}
+        closest: dict = {}
+        for label, similarity in zip(labels, similarities.tolist()):
+            if similarity < self.min_similarity:
+                break
+            votes[label] = votes.get(label, 0.0) + similarity
+            closest.setdefault(label, similarity)
+        if not votes:
+            return ClassificationResult(workflow_type="HumanReview", confidence_score=0.0)
+        best = max(votes, key=votes.get)
+        confidence = votes[best] / sum(votes.values()) * min(1.0, closest[best])
+        return ClassificationResult(workflow_type=best, confidence_score=round(confidence, 4))
+
+    def add(self, emails: Sequence[NormalizedEmail], labels: Sequence[str]):
+        """Add labeled emails to the index."""
+        if not emails:
+            return
+        self.index.add(np.stack([self.embed(email) for email in emails]), labels)
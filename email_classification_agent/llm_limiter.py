@@ -0,0 +1,111 @@
+# llm_limiter.py for email_classification_agent
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+def percentile(values, fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a sequence, or None when it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class ConcurrencyLimiter:
+    """Cap the number of concurrent LLM calls and measure time spent queueing.
+
+    Callers wait in FIFO order for one of `limit` slots. The limit can be
+    changed at runtime with set_limit().
+    """
+
+    def __init__(self, limit: int, window: int = 1000):
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_latency = 0.0
+        self._waits = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # asyncio primitives belong to one event loop; tests and TestClient may start several
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def set_limit(self, limit: int):
+        """Change the concurrency limit, waking queued callers if it grew."""
+        condition = self._get_condition()
+        async with condition:
+            self.limit = max(1, limit)
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one concurrency slot for the duration of the block."""
+        condition = self._get_condition()
+        queued_at = time.perf_counter()
+        async with condition:
+            self.waiting += 1
+            try:
+                await condition.wait_for(lambda: self.in_flight < self.limit)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        started = time.perf_counter()
+        wait = started - queued_at
+        self.calls += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self._waits.append(wait)
+        try:
+            yield
+        except BaseException:
+            self.errors += 1
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            self.total_latency += latency
+            self._latencies.append(latency)
+            async with condition:
+                self.in_flight -= 1
+                condition.notify()
+
+    def stats(self) -> dict:
+        """Concurrency, queue-wait and latency metrics."""
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "queue_wait_ms": {
+                "avg": ms(self.total_wait / self.calls) if self.calls else None,
+                "p50": ms(percentile(self._waits, 0.50)),
+                "p95": ms(percentile(self._waits, 0.95)),
+                "max": ms(self.max_wait),
+            },
+            "latency_ms": {
+                "avg": ms(self.total_latency / self.calls) if self.calls else None,
+                "p50": ms(percentile(self._latencies, 0.50)),
+                "p95": ms(percentile(self._latencies, 0.95)),
+            },
+        }
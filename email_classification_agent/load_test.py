@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Load test: concurrent /classify requests against a local stub LLM.
+
+Fires --requests classifications at once through the real ChatOpenAI client
+and reports wall time, how many LLM calls the stub served concurrently, the
+limiter's queue-wait metrics and /health latency while the load is running.
+With a non-blocking LLM path the wall time is close to
+latency * ceil(requests / LLM_MAX_CONCURRENCY) and /health stays fast.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from stub_llm import StubLLMServer
+from shared.models import NormalizedEmail
+
+
+class QuietRouterHandler(BaseHTTPRequestHandler):
+    """Accept every routed email without logging."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        data = b'{"status": "routed"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietRouterServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Routed emails arrive in bursts when a batch of classifications completes
+    request_queue_size = 128
+
+
+def build_email(index: int) -> NormalizedEmail:
+    subjects = ["Invoice due", "Meeting next week", "Interested in your services", "Question"]
+    return NormalizedEmail(
+        sender=f"sender{index}@example.com",
+        subject=f"{subjects[index % len(subjects)]} #{index}",
+        body="Hello, please see the subject line.",
+        received_time=datetime.utcnow().isoformat()
+    )
+
+
+async def run_load(main, request_count: int) -> dict:
+    transport = httpx.ASGITransport(app=main.app)
+    # ASGITransport does not run the lifespan, so open and close the router pool here
+    async with main.lifespan(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://classifier") as client:
+        health_latencies = []
+        done = asyncio.Event()
+
+        async def probe_health():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        async def classify(index: int) -> int:
+            response = await client.post("/classify", json=build_email(index).model_dump(), timeout=120)
+            return response.status_code
+
+        prober = asyncio.create_task(probe_health())
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(classify(i) for i in range(request_count)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+        metrics = (await client.get("/metrics")).json()
+
+    return {
+        "elapsed": elapsed,
+        "succeeded": sum(1 for status in statuses if status == 200),
+        "health_max": max(health_latencies) if health_latencies else 0.0,
+        "health_probes": len(health_latencies),
+        "metrics": metrics["llm"],
+        "router_pool": metrics["http_pool"],
+        "rate_limit": metrics["rate_limit"],
+    }
+
+
+def main_load_test():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM_MAX_CONCURRENCY for the run")
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub LLM response latency in seconds")
+    parser.add_argument("--micro-batch", action="store_true", help="Enable MICRO_BATCH_ENABLED for the run")
+    parser.add_argument("--stub-rate-limit", type=int, default=0,
+                        help="Requests per second the stub LLM accepts before answering 429 (0 = no limit)")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    stub = StubLLMServer(latency=args.latency, rate_limit=args.stub_rate_limit).start()
+    router = QuietRouterServer(("127.0.0.1", 0), QuietRouterHandler)
+    threading.Thread(target=router.serve_forever, daemon=True).start()
+
+    # main reads its configuration at import time
+    os.environ["OPENAI_BASE_URL"] = stub.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub-key")
+    os.environ["ROUTER_AGENT_URL"] = f"http://127.0.0.1:{router.server_address[1]}/route"
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["MICRO_BATCH_ENABLED"] = "true" if args.micro_batch else "false"
+    import main
+    logging.getLogger("main").setLevel(logging.ERROR)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    try:
+        result = asyncio.run(run_load(main, args.requests))
+    finally:
+        stub.stop()
+        router.shutdown()
+        router.server_close()
+
+    result["stub_max_in_flight"] = stub.max_in_flight
+    result["llm_requests"] = stub.request_count
+    result["rate_limited_responses"] = stub.rate_limited_count
+    result["serial_seconds"] = args.requests * args.latency
+    result["ideal_seconds"] = math.ceil(args.requests / args.concurrency) * args.latency
+    overlapped = 1 <= result["stub_max_in_flight"] <= args.concurrency
+    if not args.micro_batch:
+        overlapped = overlapped and result["stub_max_in_flight"] > 1
+    result["passed"] = overlapped and result["succeeded"] == args.requests
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        queue_wait = result["metrics"]["queue_wait_ms"]
+        print("=== Classifier Load Test ===")
+        print(f"Requests: {args.requests}, LLM latency: {args.latency}s, concurrency limit: {args.concurrency}, "
+              f"micro-batching: {'on' if args.micro_batch else 'off'}\n")
+        print(f"Succeeded:              {result['succeeded']}/{args.requests}")
+        print(f"Wall time:              {result['elapsed']:.2f}s "
+              f"(serial {result['serial_seconds']:.1f}s, ideal {result['ideal_seconds']:.1f}s)")
+        print(f"LLM requests:           {result['llm_requests']}")
+        print(f"Stub max in flight:     {result['stub_max_in_flight']}")
+        print(f"Queue wait p50/p95/max: {queue_wait['p50']} / {queue_wait['p95']} / {queue_wait['max']} ms")
+        if args.stub_rate_limit:
+            adaptive = result["rate_limit"]["adaptive_concurrency"] or {}
+            print(f"429 responses:          {result['rate_limited_responses']} "
+                  f"(concurrency limit now {adaptive.get('limit', args.concurrency)})")
+        print(f"Router connections:     {result['router_pool']['connections_opened']} opened for "
+              f"{result['router_pool']['requests']} requests")
+        print(f"/health max latency:    {result['health_max'] * 1000:.1f} ms over {result['health_probes']} probes")
+        print(f"\n{'✓' if result['passed'] else '✗'} LLM calls "
+              f"{'overlapped within the limit' if result['passed'] else 'did not overlap as expected'}")
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main_load_test()
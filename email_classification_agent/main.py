@@ -1,10 +1,17 @@
 # main.py for email_classification_agent
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from typing import List, Optional, Tuple
 import os
 import sys
 import logging
-import httpx
+import asyncio
+import math
+import random
+import time
+import openai
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
@@ -13,6 +20,20 @@ from langchain.output_parsers import PydanticOutputParser
 # Add parent directory to path to import shared models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared.models import NormalizedEmail, ClassificationResult, ClassifiedEmail
+from shared.http_pool import HTTPPool
+from llm_limiter import ConcurrencyLimiter
+from classification_cache import ClassificationCache, cache_key
+from near_duplicate import NearDuplicateIndex
+from local_classifier import LocalClassifier
+from knn_index import KNNClassifier, VectorIndex
+from tier_metrics import TierMetrics
+from micro_batcher import MicroBatcher
+from model_cascade import ModelTier, parse_cascade
+from body_preprocessor import PreprocessedBody, PreprocessingStats, count_tokens, preprocess_body
+from rate_limiter import (AdaptiveConcurrency, RateLimiter, RateLimitExceeded, TokenBuckets,
+                          retry_after_seconds)
+from routing_queue import RoutingError, RoutingQueue
+from hedging import Hedger
 
 # Load environment variables
 load_dotenv()
@@ -28,30 +49,227 @@ logger = logging.getLogger(__name__)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ROUTER_AGENT_URL = os.getenv("ROUTER_AGENT_URL", "http://localhost:8002/route")
 CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.85"))
+# Ordered LLM tiers as model:threshold[:input_cost_per_1k:output_cost_per_1k], comma separated.
+# Results below a tier's threshold escalate to the next tier before CONFIDENCE_THRESHOLD applies.
+LLM_CASCADE = os.getenv("LLM_CASCADE", f"gpt-3.5-turbo:{CONFIDENCE_THRESHOLD}:0.0005:0.0015")
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
+# Optional OpenAI-compatible endpoint, e.g. a local stub LLM for load tests
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# Maximum number of LLM requests in flight; further requests queue for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Retries of connection errors and 5xx responses from the LLM API
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Requests and tokens per minute allowed by the LLM account (0 = no limit)
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+# Optional SQLite file through which all workers on the host share one rate-limit budget
+LLM_RATE_LIMIT_PATH = os.getenv("LLM_RATE_LIMIT_PATH") or None
+# Calls wait for rate-limit capacity; beyond this many waiting, or this many seconds, the
+# request fails with 503 and a Retry-After header
+LLM_MAX_QUEUED = int(os.getenv("LLM_MAX_QUEUED", "1000"))
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", "60"))
+# Times a 429 response is retried after its Retry-After delay
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "5"))
+# Lower the concurrency limit on 429s and raise it back towards LLM_MAX_CONCURRENCY on success
+LLM_ADAPTIVE_CONCURRENCY = os.getenv("LLM_ADAPTIVE_CONCURRENCY", "true").lower() == "true"
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+# Completion tokens assumed for a call until its actual usage is known
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "50"))
+# Opt-in: send a duplicate of a classification call still running after the given quantile
+# of recent latencies (LLM_HEDGE_INITIAL_DELAY seconds until enough calls were seen)
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_INITIAL_DELAY = float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "2.0"))
+# Largest share of calls that may be hedged
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.05"))
+# Reuse classifications of identical emails (same sender domain, subject and body)
+CLASSIFICATION_CACHE_ENABLED = os.getenv("CLASSIFICATION_CACHE_ENABLED", "true").lower() == "true"
+CLASSIFICATION_CACHE_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", "10000"))
+CLASSIFICATION_CACHE_TTL = float(os.getenv("CLASSIFICATION_CACHE_TTL", "86400"))
+# Optional SQLite file so cached classifications survive restarts
+CLASSIFICATION_CACHE_PATH = os.getenv("CLASSIFICATION_CACHE_PATH") or None
+# Reuse the classification of a recent email that differs only in numbers, dates or names
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() == "true"
+NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "100000"))
+# Largest SimHash Hamming distance (out of 64 bits) treated as a near duplicate
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "6"))
+NEAR_DUPLICATE_MIN_TOKENS = int(os.getenv("NEAR_DUPLICATE_MIN_TOKENS", "8"))
+# Optional local model (see train_local_classifier.py) tried before the LLM
+LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH") or None
+# Local predictions below this confidence are escalated to the LLM
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9"))
+# Optional nearest-neighbour tier over an index of labeled emails (see build_knn_index.py)
+KNN_INDEX_PATH = os.getenv("KNN_INDEX_PATH") or None
+# kNN votes below this confidence are escalated to the LLM
+KNN_THRESHOLD = float(os.getenv("KNN_THRESHOLD", "0.85"))
+KNN_K = int(os.getenv("KNN_K", "10"))
+# Neighbours less similar than this (cosine) do not vote
+KNN_MIN_SIMILARITY = float(os.getenv("KNN_MIN_SIMILARITY", "0.3"))
+# Index size from which searches use the IVF index instead of an exact scan
+KNN_IVF_THRESHOLD = int(os.getenv("KNN_IVF_THRESHOLD", "50000"))
+KNN_NPROBE = int(os.getenv("KNN_NPROBE", "8"))
+# Strip quoted replies, signatures and disclaimers from bodies before classification
+BODY_PREPROCESSING_ENABLED = os.getenv("BODY_PREPROCESSING_ENABLED", "true").lower() == "true"
+# Approximate number of body tokens kept after preprocessing (0 disables truncation)
+PROMPT_BODY_TOKEN_BUDGET = int(os.getenv("PROMPT_BODY_TOKEN_BUDGET", "1000"))
+# Opt-in: classify LLM-bound emails that arrive close together in one multi-email prompt
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "false").lower() == "true"
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "10"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "20"))
+# Connection pool of the HTTP client shared by all requests to the router
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "30"))
+# HTTP/2 needs the h2 package (pip install "httpx[http2]")
+HTTP_POOL_HTTP2 = os.getenv("HTTP_POOL_HTTP2", "false").lower() == "true"
+ROUTER_TIMEOUT = float(os.getenv("ROUTER_TIMEOUT", "30"))
+# Opt-in: answer 202 with a tracking id once classified and route in background workers
+ASYNC_ROUTING_ENABLED = os.getenv("ASYNC_ROUTING_ENABLED", "false").lower() == "true"
+ROUTING_QUEUE_SIZE = int(os.getenv("ROUTING_QUEUE_SIZE", "1000"))
+ROUTING_WORKERS = int(os.getenv("ROUTING_WORKERS", "4"))
+ROUTING_MAX_ATTEMPTS = int(os.getenv("ROUTING_MAX_ATTEMPTS", "5"))
+# Retries back off exponentially from the base delay up to the max delay, with jitter
+ROUTING_RETRY_BASE_DELAY = float(os.getenv("ROUTING_RETRY_BASE_DELAY", "0.5"))
+ROUTING_RETRY_MAX_DELAY = float(os.getenv("ROUTING_RETRY_MAX_DELAY", "30"))
+# Number of recent tracking ids whose status can be looked up
+ROUTING_STATUS_RETENTION = int(os.getenv("ROUTING_STATUS_RETENTION", "10000"))
+# Seconds to keep delivering queued emails on shutdown
+ROUTING_DRAIN_TIMEOUT = float(os.getenv("ROUTING_DRAIN_TIMEOUT", "10"))
 
 if not OPENAI_API_KEY:
     logger.error("OPENAI_API_KEY not found in environment variables")
     raise ValueError("OPENAI_API_KEY is required")
 
-app = FastAPI(title="Email Classification Agent")
+# Keep-alive client for the router, opened and closed with the application
+http_pool = HTTPPool(
+    max_connections=HTTP_POOL_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+    keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+    timeout=ROUTER_TIMEOUT,
+    http2=HTTP_POOL_HTTP2
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_pool.start()
+    if routing_queue is not None:
+        await routing_queue.start()
+    yield
+    if routing_queue is not None:
+        await routing_queue.stop(ROUTING_DRAIN_TIMEOUT)
+    if classification_cache is not None:
+        await asyncio.to_thread(classification_cache.flush)
+    await http_pool.close()
+
+
+app = FastAPI(title="Email Classification Agent", lifespan=lifespan)
+
+# Initialize one OpenAI client per cascade tier
+llm_tiers: List[ModelTier] = parse_cascade(LLM_CASCADE)
+for tier in llm_tiers:
+    tier.client = ChatOpenAI(
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        model=tier.model,
+        temperature=0.1,
+        timeout=LLM_TIMEOUT,
+        # Retries, and 429s in particular, are handled by invoke_llm
+        max_retries=0
+    )
+logger.info(f"LLM cascade: {' -> '.join(f'{t.model} (threshold {t.threshold})' for t in llm_tiers)}")
+
+# Bounds concurrent LLM calls and records how long requests wait for a slot
+llm_limiter = ConcurrencyLimiter(LLM_MAX_CONCURRENCY)
 
-# Initialize OpenAI LLM
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model="gpt-3.5-turbo",
-    temperature=0.1
+# Requests/tokens per minute, Retry-After pauses and AIMD adjustment of llm_limiter
+llm_rate_limiter = RateLimiter(
+    TokenBuckets(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_RATE_LIMIT_PATH),
+    AdaptiveConcurrency(
+        llm_limiter, min_limit=LLM_MIN_CONCURRENCY, max_limit=LLM_MAX_CONCURRENCY
+    ) if LLM_ADAPTIVE_CONCURRENCY else None,
+    max_waiting=LLM_MAX_QUEUED,
+    max_wait=LLM_MAX_QUEUE_WAIT
 )
 
+# One hedger per cascade tier, as each model has its own latency profile. Hedges are
+# skipped while calls queue for a slot or for rate-limit capacity.
+llm_hedgers = {
+    tier.name: Hedger(
+        quantile=LLM_HEDGE_QUANTILE,
+        initial_delay=LLM_HEDGE_INITIAL_DELAY,
+        max_rate=LLM_HEDGE_MAX_RATE,
+        can_hedge=lambda: llm_limiter.in_flight < llm_limiter.limit and llm_rate_limiter.waiting == 0
+    )
+    for tier in llm_tiers
+} if LLM_HEDGING_ENABLED else {}
+
+classification_cache = ClassificationCache(
+    max_entries=CLASSIFICATION_CACHE_SIZE,
+    ttl_seconds=CLASSIFICATION_CACHE_TTL,
+    db_path=CLASSIFICATION_CACHE_PATH
+) if CLASSIFICATION_CACHE_ENABLED else None
+
+near_duplicate_index = NearDuplicateIndex(
+    max_entries=NEAR_DUPLICATE_MAX_ENTRIES,
+    max_distance=NEAR_DUPLICATE_MAX_DISTANCE,
+    min_tokens=NEAR_DUPLICATE_MIN_TOKENS
+) if NEAR_DUPLICATE_ENABLED else None
+
+
+def load_local_classifier(path: Optional[str]) -> Optional[LocalClassifier]:
+    """Load the local first-stage model, or return None if it is not configured or unusable."""
+    if not path:
+        return None
+    try:
+        model = LocalClassifier.load(path)
+    except Exception as e:
+        logger.error(f"Could not load local classifier from {path}: {e}")
+        return None
+    logger.info(f"Loaded local classifier version {model.version} from {path}")
+    return model
+
+
+local_classifier = load_local_classifier(LOCAL_CLASSIFIER_PATH)
+
+
+def load_knn_classifier(path: Optional[str]) -> Optional[KNNClassifier]:
+    """Open (or create) the kNN index, or return None if it is not configured or unusable."""
+    if not path:
+        return None
+    try:
+        index = VectorIndex(path=path, ivf_threshold=KNN_IVF_THRESHOLD, nprobe=KNN_NPROBE)
+    except Exception as e:
+        logger.error(f"Could not open kNN index at {path}: {e}")
+        return None
+    logger.info(f"Opened kNN index with {index.count} labeled emails at {path}")
+    return KNNClassifier(index, k=KNN_K, min_similarity=KNN_MIN_SIMILARITY)
+
+
+knn_classifier = load_knn_classifier(KNN_INDEX_PATH)
+# Held by kNN searches and by adds, which run in a worker thread and may grow the
+# index files or rebuild the IVF index under a search
+knn_lock = asyncio.Lock()
+
+# Emails resolved and passed on by each classification tier
+tier_metrics = TierMetrics()
+
+# Tokens removed from bodies by preprocessing
+preprocessing_stats = PreprocessingStats()
+
 # Create output parser for structured response
 parser = PydanticOutputParser(pydantic_object=ClassificationResult)
 
+CATEGORY_INSTRUCTIONS = """- InvoiceRequest: Emails about invoices, billing, payments, or financial documents
+    - AppointmentBooking: Emails about scheduling, meetings, appointments, or calendar events
+    - NewClientInquiry: Emails from potential new clients asking about services or products
+    - HumanReview: Emails that don't clearly fit into the above categories or are ambiguous"""
+
 # Create classification prompt template
 classification_prompt = ChatPromptTemplate.from_messages([
     ("system", """You are an email classification expert. Analyze the email and classify it into one of these categories:
-    - InvoiceRequest: Emails about invoices, billing, payments, or financial documents
-    - AppointmentBooking: Emails about scheduling, meetings, appointments, or calendar events
-    - NewClientInquiry: Emails from potential new clients asking about services or products
-    - HumanReview: Emails that don't clearly fit into the above categories or are ambiguous
+    """ + CATEGORY_INSTRUCTIONS + """
     
     Provide a confidence score between 0 and 1 indicating how confident you are in the classification.
     
@@ -64,75 +282,458 @@ classification_prompt = ChatPromptTemplate.from_messages([
     Received: {received_time}""")
 ])
 
+
+class IndexedClassification(ClassificationResult):
+    """Classification of one email in a multi-email prompt."""
+    index: int
+
+
+class MultiEmailClassification(BaseModel):
+    """Structured response to a multi-email prompt."""
+    results: List[IndexedClassification]
+
+
+multi_email_parser = PydanticOutputParser(pydantic_object=MultiEmailClassification)
+
+# Prompt used by the micro-batcher; emails are numbered from 1
+multi_email_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are an email classification expert. You will receive several numbered emails.
+    Classify each one independently into one of these categories:
+    """ + CATEGORY_INSTRUCTIONS + """
+    
+    For every email provide its number as "index" and a confidence score between 0 and 1
+    indicating how confident you are in the classification. Return exactly one result per email.
+    
+    {format_instructions}"""),
+    ("human", """Please classify these {count} emails:
+    
+    {emails}""")
+])
+
+class BatchClassificationRequest(BaseModel):
+    """Request body of /classify/batch."""
+    emails: List[NormalizedEmail]
+
+
+def llm_retry_delay(attempt: int) -> float:
+    """Jittered exponential backoff for retry number `attempt` when the API gives no Retry-After."""
+    return random.uniform(0.5, 1.0) * min(30.0, 2 ** (attempt - 1))
+
+
+async def invoke_llm(messages, tier: Optional[ModelTier] = None):
+    """Call a cascade tier's model (the first by default) without blocking the event loop.
+
+    Calls wait for rate-limit capacity and are made within the concurrency
+    limit. A 429 pauses all calls for its Retry-After delay and is retried;
+    token usage is added to the tier's cost counters.
+    """
+    tier = tier or llm_tiers[0]
+    estimated_tokens = sum(count_tokens(str(message.content)) for message in messages) + LLM_EXPECTED_OUTPUT_TOKENS
+    rate_limited = 0
+    failed = 0
+    while True:
+        await llm_rate_limiter.acquire(estimated_tokens)
+        try:
+            async with llm_limiter.slot():
+                response = await tier.client.ainvoke(messages)
+            break
+        except openai.RateLimitError as e:
+            rate_limited += 1
+            retry_after = retry_after_seconds(e.response.headers)
+            if retry_after is None:
+                retry_after = llm_retry_delay(rate_limited)
+            await llm_rate_limiter.on_rate_limited(retry_after)
+            if rate_limited > LLM_RATE_LIMIT_RETRIES:
+                raise RateLimitExceeded(f"{tier.model} still rate limited after {rate_limited} attempts",
+                                        retry_after) from e
+            logger.warning(f"{tier.model} rate limited, retrying in {retry_after:.2f}s")
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            failed += 1
+            if failed > LLM_MAX_RETRIES:
+                raise
+            delay = llm_retry_delay(failed)
+            logger.warning(f"{tier.model} call failed ({e}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    
+    usage = getattr(response, "usage_metadata", None)
+    actual_tokens = None
+    if isinstance(usage, dict):
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        actual_tokens = input_tokens + output_tokens
+        tier_metrics.record_usage(tier.name, input_tokens, output_tokens, tier.cost(input_tokens, output_tokens))
+    await llm_rate_limiter.on_success(estimated_tokens, actual_tokens)
+    return response
+
+
+async def classify_with_llm(email: NormalizedEmail, tier: Optional[ModelTier] = None) -> ClassificationResult:
+    """Classify a single email with a call to a cascade tier (the first by default).
+
+    With LLM_HEDGING_ENABLED a slow call may be duplicated; see Hedger.
+    """
+    # Prepare the prompt with format instructions
+    formatted_prompt = classification_prompt.format_messages(
+        sender=email.sender,
+        subject=email.subject,
+        body=email.body,
+        received_time=email.received_time,
+        format_instructions=parser.get_format_instructions()
+    )
+    
+    tier = tier or llm_tiers[0]
+    
+    async def attempt() -> ClassificationResult:
+        response = await invoke_llm(formatted_prompt, tier)
+        # Parse the response
+        return parser.parse(response.content)
+    
+    logger.info(f"Sending email to {tier.model} for classification")
+    hedger = llm_hedgers.get(tier.name)
+    if hedger is not None:
+        # The first copy to return a parsable result wins
+        return await hedger.run(attempt)
+    return await attempt()
+
+
+async def classify_many_with_llm(emails: List[NormalizedEmail]) -> list:
+    """Classify several emails with one multi-email call to the first cascade tier.
+
+    If the combined response cannot be parsed or does not cover every email,
+    each email is classified with its own call instead. Returns one result
+    or exception per email.
+    """
+    if len(emails) == 1:
+        return await asyncio.gather(classify_with_llm(emails[0]), return_exceptions=True)
+    
+    formatted_prompt = multi_email_prompt.format_messages(
+        count=len(emails),
+        emails="\n\n".join(
+            f"Email {number}:\nFrom: {email.sender}\nSubject: {email.subject}\n"
+            f"Body: {email.body}\nReceived: {email.received_time}"
+            for number, email in enumerate(emails, 1)
+        ),
+        format_instructions=multi_email_parser.get_format_instructions()
+    )
+    logger.info(f"Sending {len(emails)} emails to LLM in one prompt")
+    response = await invoke_llm(formatted_prompt)
+    
+    try:
+        by_index = {item.index: item for item in multi_email_parser.parse(response.content).results}
+        missing = [number for number in range(1, len(emails) + 1) if number not in by_index]
+        if missing:
+            raise ValueError(f"no result for emails {missing}")
+    except Exception as e:
+        if llm_batcher is not None:
+            llm_batcher.fallbacks += 1
+        logger.warning(f"Could not use multi-email response ({e}), classifying {len(emails)} emails individually")
+        return await asyncio.gather(*(classify_with_llm(email) for email in emails), return_exceptions=True)
+    
+    return [
+        ClassificationResult(workflow_type=by_index[number].workflow_type,
+                             confidence_score=by_index[number].confidence_score)
+        for number in range(1, len(emails) + 1)
+    ]
+
+
+llm_batcher = MicroBatcher(
+    classify_many_with_llm,
+    max_batch_size=MICRO_BATCH_MAX_SIZE,
+    max_wait=MICRO_BATCH_MAX_WAIT_MS / 1000.0
+) if MICRO_BATCH_ENABLED else None
+
+
+async def classify_with_cascade(email: NormalizedEmail) -> ClassificationResult:
+    """Run the LLM cascade, escalating results below each tier's threshold.
+
+    The first tier goes through the micro-batcher when it is enabled. If a
+    later tier fails, the best result so far is used.
+    """
+    best = None
+    for position, tier in enumerate(llm_tiers):
+        last = position == len(llm_tiers) - 1
+        started = time.perf_counter()
+        try:
+            if position == 0 and llm_batcher is not None:
+                result = await llm_batcher.submit(email)
+            else:
+                result = await classify_with_llm(email, tier)
+        except Exception as e:
+            tier_metrics.record(tier.name, False, time.perf_counter() - started, failed=True)
+            if best is None:
+                raise
+            logger.error(f"Cascade tier {tier.model} failed ({e}), keeping {best.workflow_type} "
+                        f"with confidence {best.confidence_score}")
+            return best
+        elapsed = time.perf_counter() - started
+        confident = result.confidence_score >= tier.threshold
+        tier_metrics.record(tier.name, confident or last, elapsed)
+        logger.info(f"{tier.model} result: {result.workflow_type} "
+                   f"with confidence {result.confidence_score} ({elapsed:.2f}s)")
+        if best is None or result.confidence_score >= best.confidence_score:
+            best = result
+        if confident:
+            return result
+        if not last:
+            logger.info(f"Confidence {result.confidence_score} below {tier.threshold}, "
+                       f"escalating to {llm_tiers[position + 1].model}")
+    return best
+
+
+async def classify_content(email: NormalizedEmail) -> ClassificationResult:
+    """Classify an email with the cheapest tier that can answer it.
+
+    Tiers run in order: exact-content cache, near-duplicate index, local
+    model, nearest labeled neighbours, LLM cascade. The returned result is the raw classification; the
+    confidence threshold is applied by the caller.
+    """
+    key = cache_key(email) if classification_cache is not None else None
+    if key is not None:
+        started = time.perf_counter()
+        cached = await classification_cache.get_async(key)
+        tier_metrics.record("cache", cached is not None, time.perf_counter() - started)
+        if cached is not None:
+            logger.info(f"Classification cache hit: {cached.workflow_type} "
+                       f"with confidence {cached.confidence_score}")
+            return cached
+    
+    if near_duplicate_index is not None:
+        started = time.perf_counter()
+        neighbour = near_duplicate_index.find(email)
+        tier_metrics.record("near_duplicate", neighbour is not None, time.perf_counter() - started)
+        if neighbour is not None:
+            result, distance = neighbour
+            logger.info(f"Near-duplicate hit (distance {distance}): {result.workflow_type} "
+                       f"with confidence {result.confidence_score}")
+            return result
+    
+    if local_classifier is not None:
+        started = time.perf_counter()
+        result = local_classifier.classify(email)
+        confident = result.confidence_score >= LOCAL_CLASSIFIER_THRESHOLD
+        tier_metrics.record("local_model", confident, time.perf_counter() - started)
+        if confident:
+            logger.info(f"Local classifier result: {result.workflow_type} "
+                       f"with confidence {result.confidence_score}")
+            return result
+        logger.info(f"Local classifier confidence {result.confidence_score} below "
+                   f"{LOCAL_CLASSIFIER_THRESHOLD}, escalating to LLM")
+    
+    if knn_classifier is not None:
+        async with knn_lock:
+            started = time.perf_counter()
+            result = knn_classifier.classify(email)
+        confident = result.confidence_score >= KNN_THRESHOLD
+        tier_metrics.record("knn", confident, time.perf_counter() - started)
+        if confident:
+            logger.info(f"kNN result: {result.workflow_type} with confidence {result.confidence_score}")
+            return result
+        logger.info(f"kNN confidence {result.confidence_score} below {KNN_THRESHOLD}, escalating to LLM")
+    
+    classification_result = await classify_with_cascade(email)
+    
+    if key is not None:
+        classification_cache.put(key, classification_result)
+    if near_duplicate_index is not None:
+        near_duplicate_index.add(email, classification_result)
+    return classification_result
+
+
+async def send_to_router(classified_email: ClassifiedEmail):
+    """Send a classified email to the router, raising RoutingError if it is not accepted."""
+    logger.info(f"Sending classified email to router at {ROUTER_AGENT_URL}")
+    response = await http_pool.post(ROUTER_AGENT_URL, json=classified_email.model_dump())
+    
+    # 202: a router with a durable queue has persisted the email and forwards it itself
+    if response.status_code not in (200, 202):
+        logger.error(f"Router returned error: {response.status_code} - {response.text}")
+        raise RoutingError(
+            f"Failed to route email: {response.text}",
+            retryable=response.status_code >= 500 or response.status_code == 429
+        )
+
+
+# Background delivery to the router when ASYNC_ROUTING_ENABLED
+routing_queue = RoutingQueue(
+    send_to_router,
+    max_size=ROUTING_QUEUE_SIZE,
+    workers=ROUTING_WORKERS,
+    max_attempts=ROUTING_MAX_ATTEMPTS,
+    base_delay=ROUTING_RETRY_BASE_DELAY,
+    max_delay=ROUTING_RETRY_MAX_DELAY,
+    max_tracked=ROUTING_STATUS_RETENTION
+) if ASYNC_ROUTING_ENABLED else None
+
+
+def prepare_email(email: NormalizedEmail) -> Tuple[NormalizedEmail, Optional[PreprocessedBody]]:
+    """Return the email with its body reduced for classification, and the token counts."""
+    if not BODY_PREPROCESSING_ENABLED:
+        return email, None
+    preprocessed = preprocess_body(email.body, PROMPT_BODY_TOKEN_BUDGET)
+    preprocessing_stats.record(preprocessed)
+    if preprocessed.tokens_saved:
+        logger.info(f"Preprocessing kept {preprocessed.kept_tokens} of {preprocessed.original_tokens} "
+                   f"body tokens ({preprocessed.tokens_saved} saved)")
+    return email.model_copy(update={"body": preprocessed.text}), preprocessed
+
+
+async def classify_and_route(email: NormalizedEmail) -> dict:
+    """Classify one email, apply the confidence threshold and send it to the router."""
+    prepared, preprocessed = prepare_email(email)
+    classification_result = await classify_content(prepared)
+    
+    # Create classified email payload
+    classified_email = ClassifiedEmail(
+        original_email=email,
+        classification=classification_result
+    )
+    
+    # Determine routing based on confidence threshold
+    if classification_result.confidence_score < CONFIDENCE_THRESHOLD:
+        logger.warning(f"Low confidence score ({classification_result.confidence_score}), "
+                      f"changing to HumanReview")
+        classification_result.workflow_type = "HumanReview"
+        classified_email.classification = classification_result
+    
+    tokens_saved = preprocessed.tokens_saved if preprocessed is not None else 0
+    if routing_queue is not None:
+        tracking_id = await routing_queue.submit(
+            classified_email, workflow_type=classification_result.workflow_type
+        )
+        logger.info(f"Email classified, queued for routing as {tracking_id}")
+        return {
+            "status": "accepted",
+            "tracking_id": tracking_id,
+            "classification": classification_result.model_dump(),
+            "routed": False,
+            "tokens_saved": tokens_saved
+        }
+    
+    await send_to_router(classified_email)
+    logger.info("Email successfully classified and routed")
+    return {
+        "status": "success",
+        "classification": classification_result.model_dump(),
+        "routed": True,
+        "tokens_saved": tokens_saved
+    }
+
+
 @app.post("/classify")
 async def classify_email(email: NormalizedEmail):
-    """Classify an email and route it appropriately."""
+    """Classify an email and route it appropriately.
+
+    With ASYNC_ROUTING_ENABLED the response is 202 with a tracking id as soon
+    as the email is classified; see /classify/status/{tracking_id}.
+    """
     logger.info(f"Received email for classification from {email.sender}")
     
     try:
-        # Prepare the prompt with format instructions
-        formatted_prompt = classification_prompt.format_messages(
-            sender=email.sender,
-            subject=email.subject,
-            body=email.body,
-            received_time=email.received_time,
-            format_instructions=parser.get_format_instructions()
-        )
-        
-        # Get classification from LLM
-        logger.info("Sending email to LLM for classification")
-        response = llm.invoke(formatted_prompt)
-        
-        # Parse the response
-        classification_result = parser.parse(response.content)
-        logger.info(f"Classification result: {classification_result.workflow_type} "
-                   f"with confidence {classification_result.confidence_score}")
-        
-        # Create classified email payload
-        classified_email = ClassifiedEmail(
-            original_email=email,
-            classification=classification_result
-        )
-        
-        # Determine routing based on confidence threshold
-        if classification_result.confidence_score < CONFIDENCE_THRESHOLD:
-            logger.warning(f"Low confidence score ({classification_result.confidence_score}), "
-                          f"changing to HumanReview")
-            classification_result.workflow_type = "HumanReview"
-            classified_email.classification = classification_result
-        
-        # Send to router agent
-        async with httpx.AsyncClient() as client:
-            logger.info(f"Sending classified email to router at {ROUTER_AGENT_URL}")
-            response = await client.post(
-                ROUTER_AGENT_URL,
-                json=classified_email.model_dump(),
-                timeout=30.0
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Router returned error: {response.status_code} - {response.text}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to route email: {response.text}"
-                )
-            
-            logger.info("Email successfully classified and routed")
-            return {
-                "status": "success",
-                "classification": classification_result.model_dump(),
-                "routed": True
-            }
-            
+        result = await classify_and_route(email)
+    except RateLimitExceeded as e:
+        logger.error(f"Rate limited classifying email: {e}")
+        raise HTTPException(status_code=503, detail=str(e),
+                            headers={"Retry-After": str(math.ceil(e.retry_after))})
     except Exception as e:
         logger.error(f"Error classifying email: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    if result["status"] == "accepted":
+        return JSONResponse(status_code=202, content=result)
+    return result
+
+
+@app.get("/classify/status/{tracking_id}")
+async def classification_status(tracking_id: str):
+    """Routing status of an email accepted with 202."""
+    status = routing_queue.status(tracking_id) if routing_queue is not None else None
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown tracking id: {tracking_id}")
+    return status
+
+
+@app.post("/classify/batch")
+async def classify_email_batch(request: BatchClassificationRequest):
+    """Classify and route a list of emails concurrently.
+
+    Returns one result per email, in request order. A failure for one email
+    is reported in its own entry and does not fail the rest of the batch.
+    """
+    if len(request.emails) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(request.emails)} emails exceeds MAX_BATCH_SIZE ({MAX_BATCH_SIZE})"
+        )
+    logger.info(f"Received batch of {len(request.emails)} emails for classification")
+    
+    outcomes = await asyncio.gather(
+        *(classify_and_route(email) for email in request.emails),
+        return_exceptions=True
+    )
+    
+    results = []
+    for email, outcome in zip(request.emails, outcomes):
+        if isinstance(outcome, Exception):
+            detail = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            logger.error(f"Error classifying email from {email.sender}: {detail}")
+            entry = {"status": "error", "error": detail}
+            if isinstance(outcome, RateLimitExceeded):
+                entry["retry_after"] = math.ceil(outcome.retry_after)
+            results.append(entry)
+        else:
+            results.append(outcome)
+    
+    succeeded = sum(1 for result in results if result["status"] in ("success", "accepted"))
+    logger.info(f"Batch classification complete: {succeeded}/{len(results)} succeeded")
+    return {"results": results}
+
+
+@app.post("/knn/examples")
+async def add_knn_example(example: ClassifiedEmail):
+    """Add a labeled (e.g. human-reviewed) email to the kNN index."""
+    if knn_classifier is None:
+        raise HTTPException(status_code=404, detail="kNN tier is not enabled (set KNN_INDEX_PATH)")
+    email, _ = prepare_email(example.original_email)
+    try:
+        async with knn_lock:
+            await asyncio.to_thread(knn_classifier.add, [email], [example.classification.workflow_type])
+            vectors = knn_classifier.index.count
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"status": "added", "vectors": vectors}
+
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "agent": "email_classification"}
 
+
+@app.get("/metrics")
+async def metrics():
+    """LLM concurrency, queue-wait, per-tier classification and router connection pool metrics."""
+    return {
+        "llm": llm_limiter.stats(),
+        "rate_limit": llm_rate_limiter.stats(),
+        "hedging": {name: hedger.stats() for name, hedger in llm_hedgers.items()} or None,
+        "cascade": [
+            {"model": tier.model, "threshold": tier.threshold} for tier in llm_tiers
+        ],
+        "cache": classification_cache.stats() if classification_cache is not None else None,
+        "near_duplicate": near_duplicate_index.stats() if near_duplicate_index is not None else None,
+        "local_model": {
+            "version": local_classifier.version,
+            "threshold": LOCAL_CLASSIFIER_THRESHOLD
+        } if local_classifier is not None else None,
+        "knn": dict(
+            knn_classifier.index.stats(),
+            threshold=KNN_THRESHOLD
+        ) if knn_classifier is not None else None,
+        "tiers": tier_metrics.stats(),
+        "micro_batch": llm_batcher.stats() if llm_batcher is not None else None,
+        "preprocessing": preprocessing_stats.stats(),
+        "http_pool": http_pool.stats(),
+        "routing_queue": routing_queue.stats() if routing_queue is not None else None
+    }
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting Email Classification Agent on port 8001")
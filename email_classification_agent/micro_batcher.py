@@ -0,0 +1,95 @@
+# micro_batcher.py for email_classification_agent
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Group concurrent submissions into batches for a single handler call.
+
+    A batch is flushed when it reaches max_batch_size or max_wait seconds
+    after its first item arrived, whichever comes first. The handler gets
+    the items in submission order and returns one entry per item; an entry
+    that is an exception is raised to that item's caller only. Handlers that
+    retry a batch item by item can count that in `fallbacks`.
+    """
+
+    def __init__(self, handler: Callable[[List], Awaitable[Sequence]],
+                 max_batch_size: int = 10, max_wait: float = 0.02):
+        self._handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.size_flushes = 0
+        self.timer_flushes = 0
+        self.fallbacks = 0
+
+    async def submit(self, item):
+        """Queue an item and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self.size_flushes += 1
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush_on_timer)
+        return await future
+
+    def _flush_on_timer(self):
+        self._timer = None
+        self.timer_flushes += 1
+        self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[tuple]):
+        self.batches += 1
+        self.items += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        try:
+            results = list(await self._handler([item for item, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch handler returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch)} failed: {e}")
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                # The caller went away (e.g. request cancelled)
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "max_batch_seen": self.max_batch_seen,
+            "size_flushes": self.size_flushes,
+            "timer_flushes": self.timer_flushes,
+            "fallbacks": self.fallbacks,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,67 @@
+# model_cascade.py for email_classification_agent
+from typing import Any, List, Optional
+
+
+class ModelTier:
+    """One LLM in the classification cascade.
+
+    Results below `threshold` are escalated to the next tier. Costs are in
+    USD per 1000 tokens and only feed the cost counters.
+    """
+
+    def __init__(self, model: str, threshold: float, input_cost_per_1k: float = 0.0,
+                 output_cost_per_1k: float = 0.0, client: Optional[Any] = None):
+        self.model = model
+        self.threshold = threshold
+        self.input_cost_per_1k = input_cost_per_1k
+        self.output_cost_per_1k = output_cost_per_1k
+        self.client = client
+
+    @property
+    def name(self) -> str:
+        """Tier name used in metrics."""
+        return f"llm:{self.model}"
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (input_tokens * self.input_cost_per_1k + output_tokens * self.output_cost_per_1k) / 1000.0
+
+    def __repr__(self) -> str:
+        return f"ModelTier({self.model!r}, threshold={self.threshold})"
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def parse_cascade(spec: str) -> List[ModelTier]:
+    """Parse ``model:threshold[:input_cost_per_1k:output_cost_per_1k]`` entries separated by commas.
+
+    Model names may themselves contain colons (e.g. fine-tuned models), so the
+    numeric fields are taken from the end of each entry.
+    """
+    tiers = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split(":")
+        numbers = []
+        while len(parts) > 1 and len(numbers) < 3 and _is_number(parts[-1]):
+            numbers.insert(0, float(parts.pop()))
+        if len(numbers) not in (1, 3):
+            raise ValueError(
+                f"Invalid cascade entry {entry!r}: expected model:threshold or "
+                f"model:threshold:input_cost_per_1k:output_cost_per_1k"
+            )
+        threshold = numbers[0]
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"Invalid cascade entry {entry!r}: threshold must be between 0 and 1")
+        input_cost, output_cost = (numbers[1], numbers[2]) if len(numbers) == 3 else (0.0, 0.0)
+        tiers.append(ModelTier(":".join(parts), threshold, input_cost, output_cost))
+    if not tiers:
+        raise ValueError("LLM cascade must contain at least one model")
+    return tiers
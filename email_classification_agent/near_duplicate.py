@@ -0,0 +1,144 @@
+# near_duplicate.py for email_classification_agent
+import hashlib
+import re
+import sys
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from shared.models import NormalizedEmail, ClassificationResult
+from classification_cache import normalize_text, sender_domain
+
+FINGERPRINT_BITS = 64
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+DIGITS_PATTERN = re.compile(r"\d+")
+
+
+def email_tokens(email: NormalizedEmail) -> List[str]:
+    """Subject and body words with digit runs masked, so invoice numbers and dates match."""
+    text = DIGITS_PATTERN.sub("0", normalize_text(f"{email.subject} {email.body}"))
+    return TOKEN_PATTERN.findall(text)
+
+
+def _feature_hashes(tokens: List[str]) -> np.ndarray:
+    # Word unigrams and bigrams, each hashed to 64 bits
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "little") for f in features],
+        dtype=np.uint64
+    )
+
+
+def simhash(tokens: List[str]) -> int:
+    """64-bit SimHash of a token list."""
+    if not tokens:
+        return 0
+    hashes = _feature_hashes(tokens)
+    # One row of 64 bits per feature; a bit votes +1 when set and -1 when clear
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    fingerprint = np.packbits(votes > 0, bitorder="little").view("<u8")[0]
+    return int(fingerprint)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def domain_hash(domain: str) -> int:
+    return int.from_bytes(hashlib.blake2b(domain.encode(), digest_size=8).digest(), "little")
+
+
+class NearDuplicateIndex:
+    """Bounded index of recent classifications, searchable by SimHash distance.
+
+    Fingerprints live in a fixed-size NumPy ring buffer, so memory is bounded
+    by max_entries and the oldest entry is overwritten first. A lookup scans
+    every fingerprint from the same sender domain with a vectorized XOR and
+    popcount and accepts the nearest one within max_distance bits.
+    """
+
+    def __init__(self, max_entries: int = 100000, max_distance: int = 6, min_tokens: int = 8):
+        if not 0 <= max_distance < FINGERPRINT_BITS:
+            raise ValueError("max_distance must be between 0 and 63")
+        self.max_entries = max(1, max_entries)
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self._fingerprints = np.zeros(self.max_entries, dtype=np.uint64)
+        self._domains = np.zeros(self.max_entries, dtype=np.uint64)
+        self._results: List[Optional[str]] = [None] * self.max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    def fingerprint(self, email: NormalizedEmail) -> Optional[int]:
+        """SimHash of an email, or None if it is too short to compare reliably."""
+        tokens = email_tokens(email)
+        if len(tokens) < self.min_tokens:
+            return None
+        return simhash(tokens)
+
+    def find(self, email: NormalizedEmail) -> Optional[Tuple[ClassificationResult, int]]:
+        """Return (result, distance) of the closest indexed neighbour, if any."""
+        fingerprint = self.fingerprint(email)
+        domain = domain_hash(sender_domain(email.sender))
+        with self._lock:
+            if fingerprint is None:
+                self.skipped += 1
+                return None
+            self.lookups += 1
+            positions = np.flatnonzero(self._domains[:self._size] == np.uint64(domain))
+            if len(positions):
+                distances = np.bitwise_count(self._fingerprints[positions] ^ np.uint64(fingerprint))
+                nearest = int(np.argmin(distances))
+                distance = int(distances[nearest])
+                if distance <= self.max_distance:
+                    self.hits += 1
+                    payload = self._results[positions[nearest]]
+                    return ClassificationResult.model_validate_json(payload), distance
+            self.misses += 1
+            return None
+
+    def add(self, email: NormalizedEmail, result: ClassificationResult) -> bool:
+        """Index an email's classification; returns False if it was too short to index."""
+        fingerprint = self.fingerprint(email)
+        if fingerprint is None:
+            return False
+        domain = domain_hash(sender_domain(email.sender))
+        # Results repeat heavily, so share one string per distinct result
+        payload = sys.intern(result.model_dump_json())
+        with self._lock:
+            position = self._next
+            if self._size == self.max_entries:
+                self.evictions += 1
+            else:
+                self._size += 1
+            self._fingerprints[position] = fingerprint
+            self._domains[position] = domain
+            self._results[position] = payload
+            self._next = (position + 1) % self.max_entries
+        return True
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        """Lookup, hit and eviction counters."""
+        with self._lock:
+            return {
+                "entries": self._size,
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped_short": self.skipped,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+                "evictions": self.evictions,
+            }
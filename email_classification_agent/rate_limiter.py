@@ -0,0 +1,331 @@
+# rate_limiter.py for email_classification_agent
+import asyncio
+import email.utils
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from llm_limiter import ConcurrencyLimiter
+
+logger = logging.getLogger(__name__)
+
+# Key of the shared "no calls until" timestamp set by Retry-After
+PAUSE_KEY = "pause"
+
+
+class RateLimitExceeded(Exception):
+    """LLM capacity is not available within the allowed wait; try again after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(headers: Mapping[str, str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait according to retry-after-ms or Retry-After (seconds or HTTP date)."""
+    milliseconds = headers.get("retry-after-ms")
+    if milliseconds:
+        try:
+            return max(0.0, float(milliseconds) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - (now if now is not None else time.time()))
+
+
+class TokenBuckets:
+    """Requests-per-minute and tokens-per-minute buckets, optionally shared between processes.
+
+    Each bucket holds one minute of capacity and refills continuously; a
+    limit of 0 disables that bucket. A pause (from a Retry-After header)
+    blocks all calls until it ends. With `db_path` the bucket levels and the
+    pause live in a SQLite table (WAL mode), so every uvicorn worker on the
+    host draws from the same budget. Its transactions can wait on other
+    workers' locks, so async callers run them on `executor`, the store's own
+    thread; stats() reads through a second connection and never waits for a
+    writer.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 db_path: Optional[str] = None, clock: Callable[[], float] = time.time):
+        self.capacity = {name: float(limit) for name, limit in
+                         (("requests", requests_per_minute), ("tokens", tokens_per_minute)) if limit > 0}
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state: Dict[str, Tuple[float, float]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._reader_lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        if db_path:
+            # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_rate_limit "
+                "(name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._reader = sqlite3.connect(db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            self._reader.execute("PRAGMA query_only=ON")
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-rate-limit")
+
+    def _load(self, conn: Optional[sqlite3.Connection] = None) -> Dict[str, Tuple[float, float]]:
+        conn = conn or self._conn
+        if conn is None:
+            return dict(self._state)
+        rows = conn.execute("SELECT name, level, updated FROM llm_rate_limit").fetchall()
+        return {name: (level, updated) for name, level, updated in rows}
+
+    def _save(self, changes: Dict[str, Tuple[float, float]]):
+        if self._conn is None:
+            self._state.update(changes)
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO llm_rate_limit (name, level, updated) VALUES (?, ?, ?)",
+            [(name, level, updated) for name, (level, updated) in changes.items()]
+        )
+
+    def _transaction(self, update: Callable[[Dict[str, Tuple[float, float]], float], Tuple[dict, float]]) -> float:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = self._clock()
+                changes, result = update(self._load(), now)
+                if changes:
+                    self._save(changes)
+                if self._conn is not None:
+                    self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                if self._conn is not None:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+    def _level(self, state: Dict[str, Tuple[float, float]], name: str, now: float) -> float:
+        capacity = self.capacity[name]
+        level, updated = state.get(name, (capacity, now))
+        return min(capacity, level + max(0.0, now - updated) * capacity / 60.0)
+
+    def try_acquire(self, requests: int = 1, tokens: int = 0) -> float:
+        """Take capacity for one call; returns 0 when taken, else the seconds to wait before retrying."""
+        amounts = {"requests": requests, "tokens": tokens}
+
+        def update(state, now):
+            paused_until = state.get(PAUSE_KEY, (0.0, 0.0))[0]
+            if paused_until > now:
+                return {}, paused_until - now
+            wait = 0.0
+            levels = {}
+            for name, capacity in self.capacity.items():
+                levels[name] = self._level(state, name, now)
+                # A call larger than the whole bucket waits for a full bucket
+                needed = min(amounts[name], capacity)
+                if levels[name] < needed:
+                    wait = max(wait, (needed - levels[name]) * 60.0 / capacity)
+            if wait > 0:
+                return {}, wait
+            return {name: (levels[name] - amounts[name], now) for name in levels}, 0.0
+
+        return self._transaction(update)
+
+    def adjust_tokens(self, tokens: int):
+        """Charge (or refund, if negative) tokens once a call's actual usage is known."""
+        if "tokens" not in self.capacity or not tokens:
+            return
+
+        def update(state, now):
+            return {"tokens": (self._level(state, "tokens", now) - tokens, now)}, 0.0
+
+        self._transaction(update)
+
+    def pause(self, seconds: float):
+        """Block all calls, in every process sharing the store, for `seconds`."""
+        def update(state, now):
+            paused_until = max(state.get(PAUSE_KEY, (0.0, 0.0))[0], now + seconds)
+            return {PAUSE_KEY: (paused_until, now)}, 0.0
+
+        self._transaction(update)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        with self._lock, self._reader_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def stats(self) -> dict:
+        if self._reader is not None:
+            # In WAL mode a read sees the last commit without waiting for a writer
+            with self._reader_lock:
+                state = self._load(self._reader)
+        else:
+            with self._lock:
+                state = self._load()
+        now = self._clock()
+        levels = {name: round(self._level(state, name, now), 1) for name in self.capacity}
+        paused_for = max(0.0, state.get(PAUSE_KEY, (0.0, 0.0))[0] - now)
+        return {
+            "requests_per_minute": self.capacity.get("requests"),
+            "tokens_per_minute": self.capacity.get("tokens"),
+            "available": levels,
+            "paused_for": round(paused_for, 3),
+            "shared": self._conn is not None,
+        }
+
+
+class AdaptiveConcurrency:
+    """AIMD control of a ConcurrencyLimiter.
+
+    Every successful call adds 1/limit to the limit (about one more slot per
+    round of `limit` calls, up to max_limit). A rate-limited call multiplies
+    it by `decrease`, at most once per `cooldown` seconds so that a burst of
+    429s from the same overload counts once.
+    """
+
+    def __init__(self, limiter: ConcurrencyLimiter, min_limit: int = 1, max_limit: Optional[int] = None,
+                 decrease: float = 0.5, cooldown: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.limiter = limiter
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit or limiter.limit)
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._clock = clock
+        self._limit = float(min(max(limiter.limit, self.min_limit), self.max_limit))
+        self._last_decrease: Optional[float] = None
+        self.increases = 0
+        self.decreases = 0
+
+    async def _apply(self):
+        limit = int(self._limit)
+        if limit != self.limiter.limit:
+            await self.limiter.set_limit(limit)
+
+    async def on_success(self):
+        if self._limit < self.max_limit:
+            before = int(self._limit)
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            if int(self._limit) > before:
+                self.increases += 1
+            await self._apply()
+
+    async def on_rate_limited(self):
+        now = self._clock()
+        if self._last_decrease is not None and now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.min_limit), self._limit * self.decrease)
+        self.decreases += 1
+        logger.warning(f"LLM rate limited, concurrency limit lowered to {int(self._limit)}")
+        await self._apply()
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self._limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+class RateLimiter:
+    """Wait for token-bucket capacity before LLM calls and react to 429 responses.
+
+    At most `max_waiting` callers wait at once, each for at most `max_wait`
+    seconds; beyond that RateLimitExceeded is raised so the request can be
+    retried later instead of piling up.
+    """
+
+    def __init__(self, buckets: TokenBuckets, adaptive: Optional[AdaptiveConcurrency] = None,
+                 max_waiting: int = 1000, max_wait: float = 60.0, poll_interval: float = 1.0):
+        self.buckets = buckets
+        self.adaptive = adaptive
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.waiting = 0
+        self.max_waiting_seen = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.rejected = 0
+        self.rate_limited = 0
+
+    async def _buckets(self, method: Callable, *args):
+        """Call a bucket method, on the shared store's thread so SQLite never blocks the event loop."""
+        executor = self.buckets.executor
+        if executor is None:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, method, *args)
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until one call of about `tokens` tokens fits in the buckets."""
+        wait = await self._buckets(self.buckets.try_acquire, 1, tokens)
+        if wait <= 0:
+            return
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise RateLimitExceeded(f"{self.waiting} LLM calls already waiting for rate limit capacity", wait)
+
+        started = time.monotonic()
+        self.waiting += 1
+        self.waits += 1
+        self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+        try:
+            while wait > 0:
+                waited = time.monotonic() - started
+                if waited + wait > self.max_wait:
+                    self.rejected += 1
+                    raise RateLimitExceeded(f"LLM rate limit capacity not available within {self.max_wait:.0f}s",
+                                            wait)
+                # Other workers share the buckets, so check again rather than trusting the estimate
+                await asyncio.sleep(min(wait, self.poll_interval))
+                wait = await self._buckets(self.buckets.try_acquire, 1, tokens)
+        finally:
+            self.waiting -= 1
+            self.total_wait += time.monotonic() - started
+
+    async def on_success(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None):
+        """Record a successful call and correct the token estimate with its actual usage."""
+        if actual_tokens is not None:
+            await self._buckets(self.buckets.adjust_tokens, actual_tokens - estimated_tokens)
+        if self.adaptive is not None:
+            await self.adaptive.on_success()
+
+    async def on_rate_limited(self, retry_after: float):
+        """Pause all calls for `retry_after` seconds and lower the concurrency limit."""
+        self.rate_limited += 1
+        await self._buckets(self.buckets.pause, retry_after)
+        if self.adaptive is not None:
+            await self.adaptive.on_rate_limited()
+
+    def stats(self) -> dict:
+        return dict(
+            self.buckets.stats(),
+            waiting=self.waiting,
+            max_waiting=self.max_waiting,
+            max_waiting_seen=self.max_waiting_seen,
+            waits=self.waits,
+            avg_wait_ms=round(self.total_wait / self.waits * 1000, 3) if self.waits else None,
+            rejected=self.rejected,
+            rate_limited_responses=self.rate_limited,
+            adaptive_concurrency=self.adaptive.stats() if self.adaptive is not None else None,
+        )
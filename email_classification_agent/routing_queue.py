@@ -0,0 +1,158 @@
+# routing_queue.py for email_classification_agent
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingError(Exception):
+    """A failed delivery; `retryable` tells the queue whether to try again."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class RoutingQueue:
+    """Bounded in-process queue that delivers classified emails in the background.
+
+    submit() returns a tracking id as soon as the item is queued; it waits
+    for space when the queue is full. Worker tasks call `send` for each item
+    and retry failures with exponential backoff and jitter, unless `send`
+    raises a RoutingError with retryable=False. The status of the most
+    recent `max_tracked` items can be looked up by tracking id.
+
+    Workers are started on first use in the running event loop, or by
+    start(); stop() waits for queued items to be delivered before cancelling
+    the workers.
+    """
+
+    def __init__(self, send: Callable[[Any], Awaitable[None]], max_size: int = 1000, workers: int = 4,
+                 max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                 max_tracked: int = 10000):
+        self._send = send
+        self.max_size = max(1, max_size)
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_tracked = max_tracked
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._status: "OrderedDict[str, dict]" = OrderedDict()
+        self.in_flight = 0
+        self.submitted = 0
+        self.routed = 0
+        self.retries = 0
+        self.failed = 0
+
+    def _get_queue(self) -> asyncio.Queue:
+        # asyncio queues belong to one event loop; tests and TestClient may start several
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._loop = loop
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        return self._queue
+
+    async def start(self):
+        self._get_queue()
+        logger.info(f"Routing queue started with {self.workers} workers (max {self.max_size} queued)")
+
+    async def stop(self, timeout: float = 10.0):
+        """Deliver what is queued (for up to `timeout` seconds), then stop the workers."""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Routing queue stopped with {self._queue.qsize()} emails undelivered")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._queue = None
+        self._loop = None
+        self._tasks = []
+
+    async def submit(self, item: Any, **details) -> str:
+        """Queue an item for delivery and return its tracking id.
+
+        Keyword arguments are stored with the item's status.
+        """
+        queue = self._get_queue()
+        tracking_id = uuid.uuid4().hex
+        now = time.time()
+        self._track(tracking_id, dict(details, status="queued", attempts=0, last_error=None,
+                                      created=now, updated=now))
+        await queue.put((tracking_id, item))
+        self.submitted += 1
+        return tracking_id
+
+    def status(self, tracking_id: str) -> Optional[dict]:
+        entry = self._status.get(tracking_id)
+        return dict(entry, tracking_id=tracking_id) if entry is not None else None
+
+    def _track(self, tracking_id: str, entry: dict):
+        self._status[tracking_id] = entry
+        while len(self._status) > self.max_tracked:
+            self._status.popitem(last=False)
+
+    def _update(self, tracking_id: str, **changes):
+        entry = self._status.get(tracking_id)
+        if entry is not None:
+            entry.update(changes, updated=time.time())
+
+    def retry_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def _worker(self):
+        queue = self._queue
+        while True:
+            tracking_id, item = await queue.get()
+            self.in_flight += 1
+            try:
+                await self._deliver(tracking_id, item)
+            finally:
+                self.in_flight -= 1
+                queue.task_done()
+
+    async def _deliver(self, tracking_id: str, item: Any):
+        for attempt in range(1, self.max_attempts + 1):
+            self._update(tracking_id, status="routing", attempts=attempt)
+            try:
+                await self._send(item)
+                self._update(tracking_id, status="routed", last_error=None)
+                self.routed += 1
+                return
+            except Exception as e:
+                retryable = getattr(e, "retryable", True)
+                if not retryable or attempt == self.max_attempts:
+                    logger.error(f"Routing {tracking_id} failed after {attempt} attempts: {e}")
+                    self._update(tracking_id, status="failed", last_error=str(e))
+                    self.failed += 1
+                    return
+                delay = self.retry_delay(attempt)
+                logger.warning(f"Routing {tracking_id} failed ({e}), retrying in {delay:.2f}s")
+                self._update(tracking_id, status="retrying", last_error=str(e))
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "routed": self.routed,
+            "retries": self.retries,
+            "failed": self.failed,
+            "tracked": len(self._status),
+        }
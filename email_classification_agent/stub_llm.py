@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""A local stand-in for the OpenAI chat completions API.
+
+It answers POST /v1/chat/completions after a configurable delay with a
+ClassificationResult chosen by simple keyword rules (one per "Email N:" block
+for multi-email prompts), and counts how many requests it was serving at
+once. Point the classifier at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+to load-test without an API key.
+
+With --slow-fraction F a random share F of requests takes --slow-latency
+seconds instead, to reproduce a long latency tail.
+
+With --rate-limit N it accepts at most N requests per --rate-window seconds
+and answers the rest with 429 and Retry-After, like the OpenAI API.
+
+    python stub_llm.py --port 8100 --latency 0.5 --rate-limit 20 --rate-window 1
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import math
+import random
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.models import ClassificationResult
+
+
+EMAIL_BLOCK_PATTERN = re.compile(r"^\s*Email (\d+):\s*$", re.MULTILINE)
+
+KEYWORD_RULES = [
+    (("invoice", "payment", "billing", "amount due"), "InvoiceRequest", 0.92),
+    (("meeting", "schedule", "appointment", "available"), "AppointmentBooking", 0.88),
+    (("interested", "information", "services", "pricing"), "NewClientInquiry", 0.90),
+]
+
+
+def classify_text(text: str) -> ClassificationResult:
+    """Keyword classification used as the stub's completion."""
+    lowered = text.lower()
+    for keywords, workflow_type, confidence in KEYWORD_RULES:
+        if any(keyword in lowered for keyword in keywords):
+            return ClassificationResult(workflow_type=workflow_type, confidence_score=confidence)
+    return ClassificationResult(workflow_type="HumanReview", confidence_score=0.45)
+
+
+def completion_content(prompt: str) -> str:
+    """Response text for a prompt: one classification, or a list for numbered emails."""
+    parts = EMAIL_BLOCK_PATTERN.split(prompt)
+    if len(parts) < 3:
+        return classify_text(prompt).model_dump_json()
+    results = [
+        dict(classify_text(text).model_dump(), index=int(number))
+        for number, text in zip(parts[1::2], parts[2::2])
+    ]
+    return json.dumps({"results": results})
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Serve OpenAI-style chat completion responses."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server: "StubLLMServer" = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not Found"}})
+            return
+
+        retry_after = server.check_rate_limit()
+        if retry_after is not None:
+            self._send_json(429, {"error": {
+                "message": "Rate limit reached for requests",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }}, {"retry-after-ms": str(int(retry_after * 1000)), "Retry-After": str(math.ceil(retry_after))})
+            return
+
+        server.request_started()
+        try:
+            latency = server.slow_latency if random.random() < server.slow_fraction else server.latency
+            if latency:
+                time.sleep(latency)
+            messages = request.get("messages", [])
+            prompt = messages[-1].get("content", "") if messages else ""
+            content = completion_content(prompt)
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+            completion_tokens = len(content.split())
+            self._send_json(200, {
+                "id": f"chatcmpl-stub-{server.request_count}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+        finally:
+            server.request_finished()
+
+    def _send_json(self, status: int, body: dict, headers: Optional[dict] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request, e.g. a cancelled hedge
+            pass
+
+    def log_message(self, format, *args):
+        # Suppress default logging
+        pass
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Threaded stub LLM bound to localhost; port 0 picks a free port.
+
+    rate_limit > 0 accepts at most that many requests per rate_window seconds.
+    A slow_fraction share of requests takes slow_latency seconds.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, port: int = 0, latency: float = 0.5, rate_limit: int = 0, rate_window: float = 1.0,
+                 slow_fraction: float = 0.0, slow_latency: float = 5.0):
+        super().__init__(("127.0.0.1", port), StubLLMHandler)
+        self.latency = latency
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.rate_limited_count = 0
+        self._accepted = deque()
+        self.request_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def check_rate_limit(self) -> Optional[float]:
+        """Admit a request, or return the seconds until one would be admitted."""
+        if not self.rate_limit:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            while self._accepted and now - self._accepted[0] >= self.rate_window:
+                self._accepted.popleft()
+            if len(self._accepted) >= self.rate_limit:
+                self.rate_limited_count += 1
+                return self.rate_window - (now - self._accepted[0])
+            self._accepted.append(now)
+            return None
+
+    def request_started(self):
+        with self._lock:
+            self.request_count += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Run a local stub of the OpenAI chat completions API")
+    arg_parser.add_argument("--port", type=int, default=8100)
+    arg_parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before each response")
+    arg_parser.add_argument("--rate-limit", type=int, default=0, help="Requests accepted per window (0 = no limit)")
+    arg_parser.add_argument("--rate-window", type=float, default=1.0, help="Rate limit window in seconds")
+    arg_parser.add_argument("--slow-fraction", type=float, default=0.0, help="Share of requests that are slow")
+    arg_parser.add_argument("--slow-latency", type=float, default=5.0, help="Seconds a slow request takes")
+    args = arg_parser.parse_args()
+
+    server = StubLLMServer(args.port, args.latency, args.rate_limit, args.rate_window,
+                           args.slow_fraction, args.slow_latency)
+    print(f"Stub LLM listening on {server.base_url} (latency {args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
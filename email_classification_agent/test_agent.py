@@ -7,12 +7,30 @@ from datetime import datetime
 from unittest.mock import Mock, patch, AsyncMock
 import logging
 import asyncio
+import sqlite3
+import tempfile
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared.models import NormalizedEmail, ClassificationResult, ClassifiedEmail
+from shared.http_pool import HTTPPool
 
 # Import our main module
 import main
+from classification_cache import ClassificationCache, cache_key
+from near_duplicate import NearDuplicateIndex
+from local_classifier import LABELS, LocalClassifier
+from knn_index import KNNClassifier, VectorIndex, embed_email
+from tier_metrics import TierMetrics
+from micro_batcher import MicroBatcher
+from model_cascade import ModelTier, parse_cascade
+from body_preprocessor import preprocess_body
+from stub_llm import StubLLMServer
+from routing_queue import RoutingQueue
+from llm_limiter import ConcurrencyLimiter
+from hedging import Hedger
+from rate_limiter import (AdaptiveConcurrency, RateLimiter, RateLimitExceeded, TokenBuckets,
+                          retry_after_seconds)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -88,12 +106,10 @@ async def test_classify_endpoint():
     test_cases = create_test_emails()
     
     # Mock the LLM and router calls
-    with patch('main.llm.invoke') as mock_llm, \
-         patch('httpx.AsyncClient') as mock_client_class:
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm, \
+         patch('main.http_pool', new_callable=AsyncMock) as mock_client:
         
         # Setup mock client
-        mock_client = AsyncMock()
-        mock_client_class.return_value.__aenter__.return_value = mock_client
         mock_response = AsyncMock()
         mock_response.status_code = 200
         mock_client.post.return_value = mock_response
@@ -200,8 +216,8 @@ async def test_router_communication():
         received_time=datetime.utcnow().isoformat()
     )
     
-    with patch('main.llm.invoke') as mock_llm, \
-         patch('httpx.AsyncClient') as mock_client_class:
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm, \
+         patch('main.http_pool', new_callable=AsyncMock) as mock_client:
         
         # Mock LLM response
         mock_classification = ClassificationResult(
@@ -211,8 +227,6 @@ async def test_router_communication():
         mock_llm.return_value.content = mock_classification.model_dump_json()
         
         # Test successful routing
-        mock_client = AsyncMock()
-        mock_client_class.return_value.__aenter__.return_value = mock_client
         mock_response = AsyncMock()
         mock_response.status_code = 200
         mock_client.post.return_value = mock_response
@@ -252,12 +266,10 @@ async def test_confidence_threshold():
         received_time=datetime.utcnow().isoformat()
     )
     
-    with patch('main.llm.invoke') as mock_llm, \
-         patch('httpx.AsyncClient') as mock_client_class:
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm, \
+         patch('main.http_pool', new_callable=AsyncMock) as mock_client:
         
         # Setup mock client
-        mock_client = AsyncMock()
-        mock_client_class.return_value.__aenter__.return_value = mock_client
         mock_response = AsyncMock()
         mock_response.status_code = 200
         mock_client.post.return_value = mock_response
@@ -299,6 +311,960 @@ async def test_confidence_threshold():
     return True
 
 
+async def test_batch_classify_endpoint():
+    """Test /classify/batch per-item results and ordering."""
+    print("\n=== Testing /classify/batch endpoint ===")
+    
+    test_cases = create_test_emails()
+    emails = [test_case['email'] for test_case in test_cases]
+    
+    def llm_response(prompt):
+        # Classify by subject so each item gets a distinguishable result
+        text = prompt[-1].content
+        workflow = "InvoiceRequest" if "Invoice" in text else "AppointmentBooking"
+        response = Mock()
+        response.content = ClassificationResult(
+            workflow_type=workflow, confidence_score=0.95
+        ).model_dump_json()
+        return response
+    
+    async def router_post(url, json=None, timeout=None):
+        response = Mock()
+        # The router rejects the "Quick Question" email
+        failed = json['original_email']['subject'] == "Quick Question"
+        response.status_code = 500 if failed else 200
+        response.text = "Router error" if failed else ""
+        return response
+    
+    with patch.object(main.llm_tiers[0], 'client') as mock_llm, \
+         patch('main.http_pool', new_callable=AsyncMock) as mock_client:
+        mock_llm.ainvoke = AsyncMock(side_effect=llm_response)
+        mock_client.post.side_effect = router_post
+        
+        result = await main.classify_email_batch(main.BatchClassificationRequest(emails=emails))
+        results = result['results']
+        
+        assert len(results) == len(emails)
+        assert results[0]['classification']['workflow_type'] == "InvoiceRequest"
+        assert results[1]['classification']['workflow_type'] == "AppointmentBooking"
+        assert results[3]['status'] == "error" and "Router error" in results[3]['error']
+        assert sum(1 for r in results if r['status'] == "success") == len(emails) - 1
+        print(f"✓ {len(results)} per-item results returned in order, 1 error isolated")
+    
+    # Oversized batches are rejected up front
+    try:
+        await main.classify_email_batch(
+            main.BatchClassificationRequest(emails=emails * (main.MAX_BATCH_SIZE // len(emails) + 1))
+        )
+        print("✗ Oversized batch should have been rejected")
+        return False
+    except main.HTTPException as e:
+        assert e.status_code == 413
+        print("✓ Oversized batch rejected with 413")
+    
+    return True
+
+
+async def test_llm_concurrency_limit():
+    """Test that LLM calls overlap up to LLM_MAX_CONCURRENCY without blocking the loop."""
+    print("\n=== Testing LLM concurrency limit ===")
+    
+    in_flight = 0
+    peak = 0
+    
+    async def slow_llm(prompt):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.1)
+        in_flight -= 1
+        response = Mock()
+        response.content = ClassificationResult(
+            workflow_type="InvoiceRequest", confidence_score=0.95
+        ).model_dump_json()
+        return response
+    
+    limiter = main.ConcurrencyLimiter(3)
+    with patch.object(main.llm_tiers[0], 'client') as mock_llm, \
+         patch('main.llm_limiter', limiter):
+        mock_llm.ainvoke = AsyncMock(side_effect=slow_llm)
+        
+        started = time.perf_counter()
+        calls = [asyncio.create_task(main.invoke_llm([])) for _ in range(9)]
+        # The event loop stays free while the LLM calls are pending
+        health = await asyncio.wait_for(main.health_check(), timeout=0.05)
+        await asyncio.gather(*calls)
+        elapsed = time.perf_counter() - started
+    
+    assert health['status'] == "healthy"
+    assert peak == 3, f"expected 3 concurrent calls, saw {peak}"
+    assert 0.25 < elapsed < 0.6, f"9 calls at concurrency 3 took {elapsed:.2f}s"
+    print(f"✓ 9 calls ran 3 at a time in {elapsed:.2f}s")
+    
+    stats = limiter.stats()
+    assert stats['calls'] == 9 and stats['in_flight'] == 0 and stats['max_in_flight'] == 3
+    assert stats['queue_wait_ms']['max'] >= 150
+    print(f"✓ Queue wait recorded (max {stats['queue_wait_ms']['max']:.0f} ms)")
+    
+    metrics = await main.metrics()
+    assert "queue_wait_ms" in metrics['llm']
+    print("✓ /metrics exposes LLM limiter stats")
+    
+    return True
+
+
+async def test_classification_cache():
+    """Test the content-addressed classification cache."""
+    print("\n=== Testing classification cache ===")
+    
+    now = [1000.0]
+    email = create_test_emails()[0]['email']
+    reformatted = email.model_copy(update={
+        "sender": "Accounts <ACCOUNTS@" + email.sender.split("@")[1] + ">",
+        "subject": "  " + email.subject.upper(),
+        "body": email.body.replace(" ", "  "),
+        "received_time": "2024-02-01T00:00:00"
+    })
+    assert cache_key(email) == cache_key(reformatted)
+    assert cache_key(email) != cache_key(email.model_copy(update={"body": email.body + " Thanks."}))
+    print("✓ Keys ignore formatting, local part and received time but not content")
+    
+    # LRU eviction and TTL expiry
+    cache = ClassificationCache(max_entries=2, ttl_seconds=60, clock=lambda: now[0])
+    result = ClassificationResult(workflow_type="InvoiceRequest", confidence_score=0.95)
+    cache.put("a", result)
+    cache.put("b", result)
+    assert cache.get("a") is not None
+    cache.put("c", result)
+    assert cache.get("b") is None and cache.get("a") is not None
+    now[0] += 61
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['expirations'] == 1 and stats['hits'] == 2
+    print(f"✓ LRU eviction and TTL expiry counted: {stats['evictions']} evicted, {stats['expirations']} expired")
+    
+    # The SQLite tier survives a restart
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        first = ClassificationCache(db_path=path, clock=lambda: now[0])
+        first.put("k", result)
+        first.close()
+        second = ClassificationCache(db_path=path, clock=lambda: now[0])
+        assert second.get("k") == result and second.stats()['disk_hits'] == 1
+        assert second.get("k") == result and second.stats()['memory_hits'] == 1
+        second.close()
+        print("✓ Persistent tier survives restart and promotes entries into memory")
+        
+        # Disk writes are queued and committed together, never waiting on the event loop
+        writer = ClassificationCache(db_path=path, clock=lambda: now[0])
+        other = sqlite3.connect(path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        started = time.monotonic()
+        for i in range(50):
+            writer.put(f"batch{i}", result)
+        assert await writer.get_async("batch3") == result
+        assert time.monotonic() - started < 0.5
+        other.execute("COMMIT")
+        other.close()
+        writer.close()
+        assert writer.stats()['disk_commits'] <= 2 and writer.stats()['pending_writes'] == 0
+        reader = ClassificationCache(db_path=path, clock=lambda: now[0])
+        assert await reader.get_async("batch49") == result and reader.stats()['disk_hits'] == 1
+        assert await reader.get_async("missing") is None and reader.stats()['misses'] == 1
+        reader.close()
+    print(f"✓ 50 results written in {writer.stats()['disk_commits']} commits off the event loop")
+    
+    # A hit skips the LLM but still goes through the confidence threshold
+    low = ClassificationResult(workflow_type="InvoiceRequest", confidence_score=main.CONFIDENCE_THRESHOLD - 0.1)
+    with patch('main.classification_cache', ClassificationCache()), \
+         patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm, \
+         patch('main.http_pool', new_callable=AsyncMock) as mock_client:
+        mock_llm.return_value.content = low.model_dump_json()
+        mock_client.post.return_value = Mock(status_code=200)
+        
+        first_result = await main.classify_email(email)
+        second_result = await main.classify_email(reformatted)
+        
+        assert mock_llm.call_count == 1, f"LLM called {mock_llm.call_count} times"
+        assert first_result['classification']['workflow_type'] == "HumanReview"
+        assert second_result['classification']['workflow_type'] == "HumanReview"
+        cached = main.classification_cache.get(cache_key(email))
+        assert cached.workflow_type == "InvoiceRequest", "cache must hold the raw classification"
+    print("✓ Cache hit skipped the LLM and still applied the confidence threshold")
+    
+    return True
+
+
+def templated_invoice(name, number, sender="billing@supplier.com"):
+    return NormalizedEmail(
+        sender=sender,
+        subject=f"Invoice INV-{number} is ready",
+        body=f"Dear {name}, your invoice INV-{number} dated 2024-{number % 12 + 1:02d}-15 for "
+             f"${number % 997}.00 is now available in the billing portal. Please arrange payment "
+             f"within 30 days. Thank you for your business. Kind regards, the Billing Team",
+        received_time=datetime.utcnow().isoformat()
+    )
+
+
+async def test_near_duplicate_index():
+    """Test near-duplicate reuse of classifications."""
+    print("\n=== Testing near-duplicate index ===")
+    
+    result = ClassificationResult(workflow_type="InvoiceRequest", confidence_score=0.93)
+    index = NearDuplicateIndex(max_entries=3, max_distance=6)
+    assert index.add(templated_invoice("Alice", 1234), result)
+    
+    match = index.find(templated_invoice("Bob", 98765))
+    assert match is not None and match[0] == result
+    print(f"✓ Templated invoice with another name and number matched at distance {match[1]}")
+    
+    assert index.find(templated_invoice("Bob", 98765, sender="billing@other.com")) is None
+    unrelated = NormalizedEmail(
+        sender="billing@supplier.com",
+        subject="Team offsite",
+        body="Hi all, we are planning the team offsite for next month. Please vote for a venue "
+             "and let us know about any dietary requirements before Friday.",
+        received_time=datetime.utcnow().isoformat()
+    )
+    assert index.find(unrelated) is None
+    short = unrelated.model_copy(update={"subject": "Hi", "body": "Call me?"})
+    assert not index.add(short, result), "short emails are not indexed"
+    print("✓ Other sender domains, unrelated content and short emails do not match")
+    
+    for i in range(3):
+        index.add(unrelated.model_copy(update={"subject": f"Team offsite {i}"}), result)
+    assert len(index) == 3 and index.stats()['evictions'] == 1
+    assert index.find(templated_invoice("Carol", 555)) is None
+    print("✓ Oldest entry evicted once max_entries is reached")
+    
+    # classify_content reuses the neighbour's result and skips the LLM
+    with patch('main.near_duplicate_index', NearDuplicateIndex()), \
+         patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value.content = result.model_dump_json()
+        await main.classify_content(templated_invoice("Alice", 1234))
+        reused = await main.classify_content(templated_invoice("Dave", 4321))
+        assert mock_llm.call_count == 1 and reused == result
+        assert main.near_duplicate_index.stats()['hits'] == 1
+    print("✓ classify_content reused the near-duplicate's classification")
+    
+    return True
+
+
+def labeled_history(count):
+    """Synthetic labeled emails for training the local classifier."""
+    templates = [
+        ("InvoiceRequest", "Invoice {n} attached", "Please find attached invoice {n} for {n} dollars, payment due in 30 days."),
+        ("AppointmentBooking", "Meeting on day {n}", "Can we schedule a meeting on day {n}? I am available in the afternoon."),
+        ("NewClientInquiry", "Question about your services", "We are interested in your consulting services, please send pricing information for project {n}."),
+    ]
+    history = []
+    for i in range(count):
+        label, subject, body = templates[i % len(templates)]
+        history.append((NormalizedEmail(
+            sender=f"person{i}@company{i % 7}.com",
+            subject=subject.format(n=i),
+            body=body.format(n=i),
+            received_time=datetime.utcnow().isoformat()
+        ), label))
+    return history
+
+
+async def test_local_classifier():
+    """Test the local first-stage classifier and escalation to the LLM."""
+    print("\n=== Testing local classifier tier ===")
+    
+    history = labeled_history(90)
+    model = LocalClassifier.train([e for e, _ in history], [l for _, l in history],
+                                  version="test-1", n_features=2 ** 14, epochs=20)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "local.npz")
+        model.save(path)
+        loaded = LocalClassifier.load(path)
+    assert loaded.version == "test-1" and loaded.metadata['training_examples'] == 90
+    print(f"✓ Model version {loaded.version} saved and loaded")
+    
+    invoice = labeled_history(1)[0][0].model_copy(update={"subject": "Invoice 777 attached"})
+    result = loaded.classify(invoice)
+    assert result.workflow_type == "InvoiceRequest" and result.confidence_score >= 0.9, result
+    print(f"✓ Local model classified an invoice with confidence {result.confidence_score}")
+    
+    unclear = NormalizedEmail(sender="someone@elsewhere.org", subject="Hello",
+                              body="Just checking in about the thing we discussed.",
+                              received_time=datetime.utcnow().isoformat())
+    llm_result = ClassificationResult(workflow_type="HumanReview", confidence_score=0.6)
+    metrics = TierMetrics()
+    with patch('main.local_classifier', loaded), \
+         patch('main.LOCAL_CLASSIFIER_THRESHOLD', 0.9), \
+         patch('main.tier_metrics', metrics), \
+         patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value.content = llm_result.model_dump_json()
+        
+        local_result = await main.classify_content(invoice)
+        assert local_result.workflow_type == "InvoiceRequest" and mock_llm.call_count == 0
+        escalated = await main.classify_content(unclear)
+        assert escalated == llm_result and mock_llm.call_count == 1
+    
+    tiers = metrics.stats()
+    assert tiers['local_model']['attempts'] == 2 and tiers['local_model']['resolved'] == 1
+    assert tiers[main.llm_tiers[0].name]['attempts'] == 1
+    print(f"✓ Confident prediction skipped the LLM, unclear email escalated "
+          f"(local hit rate {tiers['local_model']['hit_rate']})")
+    
+    return True
+
+
+async def test_knn_classifier():
+    """Test the embedding index, the kNN vote and the kNN tier."""
+    print("\n=== Testing kNN classifier tier ===")
+    import numpy as np
+    
+    history = labeled_history(60)
+    invoice = labeled_history(1)[0][0].model_copy(update={"subject": "Invoice 777 attached"})
+    unclear = NormalizedEmail(sender="someone@elsewhere.org", subject="Hello",
+                              body="Just checking in about the thing we discussed.",
+                              received_time=datetime.utcnow().isoformat())
+    invoices = [e for e, l in history if l == "InvoiceRequest"]
+    others = [e for e, l in history if l != "InvoiceRequest"]
+    same = float(embed_email(invoice) @ embed_email(invoices[1]))
+    different = float(embed_email(invoice) @ embed_email(others[0]))
+    assert same > 0.6 > different, (same, different)
+    print(f"✓ Similar emails embed close together ({same:.2f} vs {different:.2f})")
+    
+    # Exact and IVF search agree on clustered vectors; the index survives a reopen
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(20, 32)).astype(np.float32)
+    vectors = centres[np.arange(2000) % 20] + rng.normal(scale=0.1, size=(2000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    labels = [LABELS[i % 20 % len(LABELS)] for i in range(2000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        index = VectorIndex(32, path=tmp, ivf_threshold=1000, nprobe=4)
+        index.add(vectors[:1500], labels[:1500])
+        assert index.stats()['mode'] == "ivf" and index.ivf_count == 1500
+        index.add(vectors[1500:1600], labels[1500:1600])
+        assert index.stats()['unindexed'] == 100
+        query = vectors[1599]
+        exact_labels, exact_scores = index.search(query, 5, exact=True)
+        ivf_labels, ivf_scores = index.search(query, 5)
+        assert np.allclose(exact_scores, ivf_scores, atol=1e-5) and ivf_labels == exact_labels
+        assert ivf_scores[0] > 0.999
+        del index
+        reopened = VectorIndex(path=tmp)
+        assert reopened.count == 1600 and reopened.dimensions == 32 and reopened.stats()['mode'] == "ivf"
+        assert np.allclose(reopened.search(query, 5)[1], exact_scores, atol=1e-5)
+    print("✓ IVF search matches exact search, including vectors added after the build, and reloads from disk")
+    
+    classifier = KNNClassifier(VectorIndex(), k=5, min_similarity=0.3)
+    empty = classifier.classify(invoice)
+    assert empty.workflow_type == "HumanReview" and empty.confidence_score == 0.0
+    classifier.add([e for e, _ in history], [l for _, l in history])
+    result = classifier.classify(invoice)
+    assert result.workflow_type == "InvoiceRequest" and result.confidence_score >= 0.6, result
+    assert classifier.classify(unclear).confidence_score < 0.6
+    print(f"✓ Neighbours voted InvoiceRequest with confidence {result.confidence_score}; "
+          f"an empty index defers with confidence 0")
+    
+    # Reviewed emails added through the endpoint are used by the tier before the LLM
+    llm_result = ClassificationResult(workflow_type="HumanReview", confidence_score=0.6)
+    metrics = TierMetrics()
+    classifier = KNNClassifier(VectorIndex(), k=5, min_similarity=0.3)
+    with patch('main.knn_classifier', classifier), \
+         patch('main.KNN_THRESHOLD', 0.6), \
+         patch('main.tier_metrics', metrics), \
+         patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value.content = llm_result.model_dump_json()
+        for email in invoices[:5]:
+            response = await main.add_knn_example(ClassifiedEmail(
+                original_email=email,
+                classification=ClassificationResult(workflow_type="InvoiceRequest", confidence_score=1.0)
+            ))
+        assert response == {"status": "added", "vectors": 5}
+        
+        knn_result = await main.classify_content(invoice)
+        assert knn_result.workflow_type == "InvoiceRequest" and mock_llm.call_count == 0
+        escalated = await main.classify_content(unclear)
+        assert escalated == llm_result and mock_llm.call_count == 1
+        assert (await main.metrics())['knn']['vectors'] == 5
+    tiers = metrics.stats()
+    assert tiers['knn']['attempts'] == 2 and tiers['knn']['resolved'] == 1
+    print(f"✓ Reviewed emails added via /knn/examples resolved a similar email without the LLM")
+
+    # A slow add (e.g. an IVF rebuild) runs off the event loop, and searches wait for it
+    add = classifier.add
+    def slow_add(*args):
+        time.sleep(0.3)
+        add(*args)
+    with patch('main.knn_classifier', classifier), \
+         patch.object(classifier, 'add', slow_add), \
+         patch('main.KNN_THRESHOLD', 0.6), \
+         patch('main.tier_metrics', TierMetrics()):
+        started = time.perf_counter()
+        adding = asyncio.create_task(main.add_knn_example(ClassifiedEmail(
+            original_email=invoices[5],
+            classification=ClassificationResult(workflow_type="InvoiceRequest", confidence_score=1.0)
+        )))
+        await asyncio.sleep(0.05)
+        assert time.perf_counter() - started < 0.2, "the add blocked the event loop"
+        await main.classify_content(invoice)
+        assert adding.done() and (await adding)['vectors'] == 6
+    print("✓ /knn/examples adds in a worker thread; a concurrent search waited for the add")
+    
+    with patch('main.knn_classifier', None):
+        try:
+            await main.add_knn_example(ClassifiedEmail(original_email=invoice, classification=llm_result))
+            print("✗ Adding examples without an index should return 404")
+            return False
+        except main.HTTPException as e:
+            assert e.status_code == 404
+    print("✓ /knn/examples returns 404 when the tier is not enabled")
+    
+    return True
+
+
+async def test_micro_batching():
+    """Test grouping concurrent LLM classifications into one prompt."""
+    print("\n=== Testing micro-batching ===")
+    
+    batches = []
+    
+    async def handler(items):
+        batches.append(list(items))
+        return [ValueError("bad item") if item == 4 else item * 10 for item in items]
+    
+    batcher = MicroBatcher(handler, max_batch_size=3, max_wait=0.01)
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(5)), return_exceptions=True)
+    assert batches == [[0, 1, 2], [3, 4]], batches
+    assert results[:4] == [0, 10, 20, 30] and isinstance(results[4], ValueError)
+    stats = batcher.stats()
+    assert stats['size_flushes'] == 1 and stats['timer_flushes'] == 1
+    print("✓ Full batch flushed at max size, remainder on the timer, errors isolated per item")
+    
+    emails = [test_case['email'] for test_case in create_test_emails()[:3]]
+    expected = ["InvoiceRequest", "AppointmentBooking", "NewClientInquiry"]
+    
+    def batched_response(indices):
+        response = Mock()
+        response.content = main.MultiEmailClassification(results=[
+            main.IndexedClassification(index=i, workflow_type=expected[i - 1], confidence_score=0.9)
+            for i in indices
+        ]).model_dump_json()
+        return response
+    
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm:
+        # Results come back out of order and are matched by index
+        mock_llm.return_value = batched_response([3, 1, 2])
+        results = await main.classify_many_with_llm(emails)
+        assert [r.workflow_type for r in results] == expected
+        assert mock_llm.call_count == 1
+        prompt = mock_llm.call_args[0][0][-1].content
+        assert "Email 3:" in prompt and emails[2].subject in prompt
+    print("✓ Three emails classified with one multi-email prompt")
+    
+    single = Mock()
+    single.content = ClassificationResult(workflow_type="HumanReview", confidence_score=0.5).model_dump_json()
+    fallback_batcher = MicroBatcher(main.classify_many_with_llm)
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm, \
+         patch('main.llm_batcher', fallback_batcher):
+        # The batched response is missing email 2, so every email is retried alone
+        mock_llm.side_effect = [batched_response([1, 3]), single, single, single]
+        results = await main.classify_many_with_llm(emails)
+        assert mock_llm.call_count == 4
+        assert all(r.workflow_type == "HumanReview" for r in results)
+        assert fallback_batcher.stats()['fallbacks'] == 1
+    print("✓ Incomplete batched response fell back to per-email calls")
+    
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm, \
+         patch('main.llm_batcher', MicroBatcher(main.classify_many_with_llm, max_batch_size=10, max_wait=0.02)), \
+         patch('main.tier_metrics', TierMetrics()):
+        mock_llm.return_value = batched_response([1, 2, 3])
+        results = await asyncio.gather(*(main.classify_content(email) for email in emails))
+        assert [r.workflow_type for r in results] == expected and mock_llm.call_count == 1
+        assert main.tier_metrics.stats()[main.llm_tiers[0].name]['resolved'] == 3
+    print("✓ Concurrent classify_content calls shared one LLM request")
+    
+    return True
+
+
+async def test_model_cascade():
+    """Test escalation through the LLM cascade and its per-tier counters."""
+    print("\n=== Testing model cascade ===")
+    
+    tiers = parse_cascade("gpt-4o-mini:0.8:0.15:0.6, ft:gpt-3.5-turbo:acme::abc123:0.9")
+    assert [t.model for t in tiers] == ["gpt-4o-mini", "ft:gpt-3.5-turbo:acme::abc123"]
+    assert tiers[0].threshold == 0.8 and tiers[0].cost(1000, 1000) == 0.75
+    assert tiers[1].threshold == 0.9 and tiers[1].cost(1000, 1000) == 0.0
+    for bad in ("gpt-4o", "gpt-4o:1.5", "gpt-4o:0.8:0.1", ""):
+        try:
+            parse_cascade(bad)
+            print(f"✗ {bad!r} should be rejected")
+            return False
+        except ValueError:
+            pass
+    print("✓ Cascade spec parsed, invalid entries rejected")
+    
+    def model_client(workflow_type, confidence, input_tokens=100, output_tokens=20):
+        response = Mock()
+        response.content = ClassificationResult(
+            workflow_type=workflow_type, confidence_score=confidence
+        ).model_dump_json()
+        response.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        client = Mock()
+        client.ainvoke = AsyncMock(return_value=response)
+        return client
+    
+    email = create_test_emails()[0]['email']
+    cheap = ModelTier("cheap", 0.8, 1.0, 2.0, client=model_client("HumanReview", 0.6))
+    strong = ModelTier("strong", 0.8, 10.0, 20.0, client=model_client("InvoiceRequest", 0.95))
+    metrics = TierMetrics()
+    with patch('main.llm_tiers', [cheap, strong]), patch('main.tier_metrics', metrics):
+        result = await main.classify_content(email)
+        assert result.workflow_type == "InvoiceRequest" and result.confidence_score == 0.95
+        assert cheap.client.ainvoke.call_count == 1 and strong.client.ainvoke.call_count == 1
+        
+        # A confident first tier stops the cascade
+        cheap.client = model_client("InvoiceRequest", 0.9)
+        await main.classify_content(email)
+        assert strong.client.ainvoke.call_count == 1
+    
+    stats = metrics.stats()
+    assert stats['llm:cheap']['attempts'] == 2 and stats['llm:cheap']['escalation_rate'] == 0.5
+    assert stats['llm:strong']['attempts'] == 1 and stats['llm:strong']['resolved'] == 1
+    assert stats['llm:cheap']['cost_usd'] == round(2 * (100 * 1.0 + 20 * 2.0) / 1000, 6)
+    assert stats['llm:strong']['input_tokens'] == 100
+    print(f"✓ Low confidence escalated to the next tier "
+          f"(cheap escalation rate {stats['llm:cheap']['escalation_rate']}, "
+          f"cost ${stats['llm:cheap']['cost_usd']} + ${stats['llm:strong']['cost_usd']})")
+    
+    # A failing later tier keeps the best earlier result
+    cheap.client = model_client("AppointmentBooking", 0.7)
+    strong.client = Mock(ainvoke=AsyncMock(side_effect=Exception("timeout")))
+    with patch('main.llm_tiers', [cheap, strong]), patch('main.tier_metrics', TierMetrics()):
+        result = await main.classify_content(email)
+        assert result.workflow_type == "AppointmentBooking" and result.confidence_score == 0.7
+        assert main.tier_metrics.stats()['llm:strong']['failed'] == 1
+    print("✓ Failed escalation fell back to the earlier tier's result")
+    
+    return True
+
+
+async def test_body_preprocessing():
+    """Test removal of quoted history, signatures and disclaimers from bodies."""
+    print("\n=== Testing body preprocessing ===")
+    
+    new_text = "Please send the invoice for March, the amount due seems wrong."
+    bodies = {
+        "quoted reply": f"{new_text}\n\nOn Mon, Jan 1, 2024 at 9:00 AM Bob <bob@example.com> wrote:\n> Old text\n> more",
+        "wrapped header": f"{new_text}\n\nOn Mon, Jan 1, 2024 at 9:00 AM Bob Smith\n<bob@example.com> wrote:\n\nOld text",
+        "outlook header": f"{new_text}\n\nFrom: Bob Smith\nSent: Monday, January 1, 2024\nTo: Alice\n\nOld text",
+        "signature": f"{new_text}\n\nBest regards,\nAlice Martin\nAccounts Payable\nTel: 555 0100",
+        "delimiter": f"{new_text}\n-- \nAlice Martin\nSent from my iPhone",
+        "disclaimer": f"{new_text}\n\nCONFIDENTIALITY NOTICE: This email and any attachments are confidential "
+                      f"and intended solely for the addressee.",
+    }
+    for name, body in bodies.items():
+        result = preprocess_body(body)
+        assert result.text == new_text, f"{name}: {result.text!r}"
+        assert result.tokens_saved > 0 and not result.truncated, name
+    print(f"✓ Quoted history, signatures and disclaimers removed ({len(bodies)} layouts)")
+    
+    assert preprocess_body("Thanks!").text == "Thanks!"
+    unchanged = "Can we meet on Tuesday?\n\nI am free after 2pm."
+    assert preprocess_body(unchanged).text == unchanged and preprocess_body(unchanged).tokens_saved == 0
+    print("✓ A bare sign-off and plain bodies are kept as they are")
+
+    # A sign-off followed by more of the message, or a "disclaimer" that is the message, is content
+    kept = [
+        "Hi Anna,\n\nThanks!\nCould we move our appointment to Friday at 3pm?",
+        "Hi,\nThank you.\nI need a copy of invoice 4411 for our records.",
+        "Cheers\nWe are a new company and would like a quote for monthly bookkeeping.",
+        "Please unsubscribe me from the newsletter.",
+        "How do I manage your preferences for appointment reminders?",
+        "Please unsubscribe me from the newsletter.\n\nAlso, could you resend invoice 4411?",
+    ]
+    for body in kept:
+        assert preprocess_body(body).text == body, preprocess_body(body).text
+    body = "Hi,\nThank you.\nI need a copy of invoice 4411.\n\nKind regards,\nJane Doe\njane@example.com"
+    assert preprocess_body(body).text == "Hi,\nThank you.\nI need a copy of invoice 4411."
+    body = (f"{new_text}\n\nBest regards,\nAlice Martin\nTel: 555 0100\n\n"
+            f"CONFIDENTIAL: this message is\nintended solely for the addressee.")
+    assert preprocess_body(body).text == new_text
+    print(f"✓ Requests after a sign-off and non-trailing boilerplate kept ({len(kept) + 2} bodies)")
+
+    # A forward is the request: only its header block goes, and "--" mid-body is not a signature
+    invoice = "Invoice 4411: 250 EUR due by March 31."
+    gmail_header = ("---------- Forwarded message ---------\nFrom: Billing <billing@acme.com>\n"
+                    "Date: Mon, Jan 1, 2024 at 9:00 AM\nSubject: Invoice 4411\nTo: <alice@example.com>\n\n")
+    outlook_header = "From: Bob Smith\nSent: Monday, January 1, 2024\nTo: Alice\nSubject: FW: Invoice 4411\n\n"
+    forwards = {
+        "forwarded": (gmail_header + invoice, invoice),
+        "outlook forward": (outlook_header + invoice, invoice),
+        "forward with note": (f"FYI, can you pay this?\n\nThanks,\nBob\n\n{gmail_header}{invoice}\n\nBest regards,\nAcme",
+                              f"FYI, can you pay this?\n\n{invoice}"),
+        "outlook forward with note": (f"FYI, can you pay this?\n\n{outlook_header}{invoice}",
+                                      f"FYI, can you pay this?\n\n{invoice}"),
+        "mid-body delimiter": ("Hi,\n--\nCould you resend invoice 4411? We never received it.",
+                               "Hi,\n--\nCould you resend invoice 4411? We never received it."),
+        "quote without new text": ("On Mon, Jan 1, 2024 at 9:00 AM Bob <bob@example.com> wrote:\n\n" + invoice, invoice),
+    }
+    for name, (body, expected) in forwards.items():
+        assert preprocess_body(body).text == expected, f"{name}: {preprocess_body(body).text!r}"
+    print(f"✓ Forwarded content and text after a mid-body '--' kept ({len(forwards)} bodies)")
+
+    long_body = " ".join(f"word{i}" for i in range(500))
+    result = preprocess_body(long_body, token_budget=100)
+    assert result.truncated and result.kept_tokens == 100
+    assert result.text.endswith("word99\n[truncated]")
+    print("✓ Long bodies cut to the token budget")
+    
+    # The LLM sees the reduced body; the router still gets the original email
+    email = create_test_emails()[0]['email']
+    email = email.model_copy(update={"body": email.body + "\n\n" + bodies["quoted reply"].split("\n\n", 1)[1]})
+    with patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm, \
+         patch('main.http_pool', new_callable=AsyncMock) as mock_client:
+        mock_llm.return_value.content = ClassificationResult(
+            workflow_type="InvoiceRequest", confidence_score=0.95
+        ).model_dump_json()
+        mock_client.post.return_value = Mock(status_code=200)
+        
+        result = await main.classify_email(email)
+        prompt = mock_llm.call_args[0][0][-1].content
+        assert "Old text" not in prompt and result['tokens_saved'] > 0
+        routed = mock_client.post.call_args[1]['json']
+        assert "Old text" in routed['original_email']['body']
+    
+    assert main.preprocessing_stats.stats()['tokens_saved'] > 0
+    print(f"✓ Prompt built from the reduced body ({result['tokens_saved']} tokens saved), original routed")
+    
+    return True
+
+
+async def test_http_pool():
+    """Test connection reuse and limits of the shared HTTP client."""
+    print("\n=== Testing shared HTTP pool ===")
+    
+    server = StubLLMServer(latency=0.05).start()
+    url = server.base_url + "/chat/completions"
+    request = {"messages": [{"role": "user", "content": "invoice"}]}
+    try:
+        pool = HTTPPool(max_connections=4, max_keepalive_connections=4)
+        await pool.start()
+        for _ in range(5):
+            response = await pool.post(url, json=request)
+            assert response.status_code == 200
+        stats = pool.stats()
+        assert stats['connections_opened'] == 1 and stats['idle_connections'] == 1
+        print(f"✓ Sequential requests reused one keep-alive connection "
+              f"({stats['requests']} requests, reuse {stats['connection_reuse']})")
+        
+        await asyncio.gather(*(pool.post(url, json=request) for _ in range(12)))
+        stats = pool.stats()
+        assert server.max_in_flight <= 4 and stats['connections'] <= 4
+        assert stats['max_in_flight'] == 12 and stats['in_flight'] == 0
+        print(f"✓ Concurrent requests capped at {server.max_in_flight} connections")
+        
+        await pool.close()
+        assert pool.stats()['connections'] == 0
+        print("✓ Pool closed on shutdown")
+    finally:
+        server.stop()
+    
+    # The application opens and closes its pool with its lifespan
+    async with main.lifespan(main.app):
+        assert main.http_pool._client is not None
+    assert main.http_pool._client is None
+    assert "http_pool" in await main.metrics()
+    print("✓ Application lifespan starts and closes the pool")
+    
+    return True
+
+
+async def test_async_routing():
+    """Test 202 responses with background routing, retries and status lookups."""
+    print("\n=== Testing asynchronous routing ===")
+    
+    email = create_test_emails()[0]['email']
+    router_statuses = [503, 200, 400]
+    
+    async def router_post(url, json=None):
+        return Mock(status_code=router_statuses.pop(0), text="router says no")
+    
+    queue = RoutingQueue(main.send_to_router, workers=2, max_attempts=3, base_delay=0.01)
+    with patch('main.routing_queue', queue), \
+         patch('main.invoke_llm', new_callable=AsyncMock) as mock_llm, \
+         patch('main.http_pool', new_callable=AsyncMock) as mock_client:
+        mock_llm.return_value.content = ClassificationResult(
+            workflow_type="InvoiceRequest", confidence_score=0.95
+        ).model_dump_json()
+        mock_client.post.side_effect = router_post
+        
+        response = await main.classify_email(email)
+        assert response.status_code == 202
+        accepted = json.loads(response.body)
+        assert accepted['status'] == "accepted" and accepted['classification']['workflow_type'] == "InvoiceRequest"
+        print(f"✓ Classified email answered with 202 and tracking id {accepted['tracking_id'][:8]}...")
+        
+        await queue.stop()
+        status = await main.classification_status(accepted['tracking_id'])
+        assert status['status'] == "routed" and status['attempts'] == 2, status
+        print(f"✓ Router 503 retried in the background, routed after {status['attempts']} attempts")
+        
+        # A 4xx from the router is not retried
+        response = await main.classify_email(email)
+        await queue.stop()
+        status = await main.classification_status(json.loads(response.body)['tracking_id'])
+        assert status['status'] == "failed" and status['attempts'] == 1
+        assert "router says no" in status['last_error']
+        stats = (await main.metrics())['routing_queue']
+        assert stats['routed'] == 1 and stats['failed'] == 1 and stats['retries'] == 1
+        print("✓ Non-retryable router error marked failed without retries")
+        
+        try:
+            await main.classification_status("unknown")
+            print("✗ Unknown tracking id should be 404")
+            return False
+        except main.HTTPException as e:
+            assert e.status_code == 404
+        print("✓ Unknown tracking id returns 404")
+    
+    # The queue is bounded: submit waits once it is full
+    release = asyncio.Event()
+    
+    async def slow_send(item):
+        await release.wait()
+    
+    bounded = RoutingQueue(slow_send, max_size=1, workers=1)
+    await bounded.submit("first")
+    await asyncio.sleep(0)
+    await bounded.submit("second")
+    try:
+        await asyncio.wait_for(bounded.submit("third"), timeout=0.05)
+        print("✗ Submit to a full queue should wait")
+        return False
+    except asyncio.TimeoutError:
+        pass
+    release.set()
+    await bounded.stop()
+    assert bounded.stats()['routed'] == 2
+    print("✓ Full queue applies backpressure to submitters")
+    
+    return True
+
+
+async def test_rate_limiting():
+    """Test token buckets, Retry-After handling and AIMD concurrency against a 429ing stub."""
+    print("\n=== Testing LLM rate limiting ===")
+    
+    now = [1000.0]
+    buckets = TokenBuckets(requests_per_minute=60, tokens_per_minute=1000, clock=lambda: now[0])
+    assert buckets.try_acquire(1, 900) == 0
+    assert buckets.try_acquire(1, 200) == 6.0, "100 missing tokens refill in 6s"
+    now[0] += 6
+    assert buckets.try_acquire(1, 200) == 0
+    buckets.adjust_tokens(-300)
+    assert buckets.stats()['available']['tokens'] == 300
+    buckets.pause(2.5)
+    assert buckets.try_acquire(1, 0) == 2.5
+    print("✓ Request and token buckets refill per minute and honour pauses")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rate_limit.db")
+        worker_a = TokenBuckets(requests_per_minute=2, db_path=path, clock=lambda: now[0])
+        worker_b = TokenBuckets(requests_per_minute=2, db_path=path, clock=lambda: now[0])
+        assert worker_a.try_acquire() == 0 and worker_b.try_acquire() == 0
+        assert worker_a.try_acquire() == 30.0
+        now[0] += 30
+        worker_b.pause(5)
+        assert worker_a.try_acquire() == 5
+        print("✓ Budget and Retry-After pause shared through SQLite between workers")
+        
+        # Another process holding the write lock blocks neither the event loop nor stats()
+        now[0] += 60
+        other = sqlite3.connect(path, isolation_level=None)
+        assert other.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        other.execute("BEGIN IMMEDIATE")
+        started = time.monotonic()
+        assert worker_a.stats()['available']['requests'] == 2.0
+        assert time.monotonic() - started < 0.5
+        acquiring = asyncio.create_task(RateLimiter(worker_a).acquire())
+        ticks = 0
+        while time.monotonic() - started < 0.3:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert not acquiring.done() and ticks > 10
+        other.execute("COMMIT")
+        await asyncio.wait_for(acquiring, 5)
+        assert worker_b.stats()['available']['requests'] == 1.0
+        other.close()
+        worker_a.close()
+        worker_b.close()
+    print("✓ Shared store locked by another worker: loop kept running, stats read without waiting")
+    
+    assert retry_after_seconds({"retry-after-ms": "1500", "retry-after": "2"}) == 1.5
+    assert retry_after_seconds({"retry-after": "3"}) == 3.0
+    assert retry_after_seconds({"retry-after": "Wed, 21 Oct 2015 07:28:10 GMT"}, now=1445412480.0) == 10.0
+    assert retry_after_seconds({}) is None
+    print("✓ Retry-After parsed from milliseconds, seconds and HTTP dates")
+    
+    limiter = ConcurrencyLimiter(8)
+    adaptive = AdaptiveConcurrency(limiter, min_limit=1, cooldown=1.0, clock=lambda: now[0])
+    await adaptive.on_rate_limited()
+    await adaptive.on_rate_limited()
+    assert limiter.limit == 4 and adaptive.decreases == 1, "429s within the cooldown count once"
+    for _ in range(5):
+        await adaptive.on_success()
+    assert limiter.limit == 5 and adaptive.increases == 1
+    print("✓ AIMD halved the limit on 429 and added one slot per round of successes")
+    
+    strict = RateLimiter(TokenBuckets(requests_per_minute=1), max_wait=0.05)
+    await strict.acquire()
+    try:
+        await strict.acquire()
+        print("✗ A wait beyond max_wait should be refused")
+        return False
+    except RateLimitExceeded as e:
+        assert 59 < e.retry_after <= 60
+    print("✓ Calls that would wait too long are refused with a retry delay")
+    
+    # Against a stub that accepts 3 requests per 0.3s every call still succeeds
+    stub = StubLLMServer(latency=0.02, rate_limit=3, rate_window=0.3).start()
+    email = create_test_emails()[0]['email']
+    try:
+        tier = ModelTier("stub", 0.5, client=main.ChatOpenAI(
+            api_key="stub", base_url=stub.base_url, model="stub", max_retries=0))
+        limiter = ConcurrencyLimiter(8)
+        rate_limiter = RateLimiter(TokenBuckets(), AdaptiveConcurrency(limiter))
+        with patch('main.llm_tiers', [tier]), patch('main.llm_limiter', limiter), \
+             patch('main.llm_rate_limiter', rate_limiter), patch('main.LLM_RATE_LIMIT_RETRIES', 20):
+            results = await asyncio.gather(*(main.classify_with_llm(email, tier) for _ in range(10)))
+        assert all(result.workflow_type == "InvoiceRequest" for result in results)
+        stats = rate_limiter.stats()
+        assert stub.rate_limited_count > 0 and stats['rate_limited_responses'] == stub.rate_limited_count
+        assert stats['adaptive_concurrency']['decreases'] >= 1 and limiter.limit < 8
+        print(f"✓ 10 calls succeeded through {stub.rate_limited_count} 429s, "
+              f"concurrency lowered to {limiter.limit}")
+        
+        # When retries run out the caller gets 503 with Retry-After instead of 500
+        stub.rate_limit, stub.rate_window = 1, 5.0
+        with patch('main.llm_tiers', [tier]), patch('main.LLM_RATE_LIMIT_RETRIES', 0), \
+             patch('main.llm_rate_limiter', RateLimiter(TokenBuckets(), max_wait=1.0)):
+            try:
+                await main.classify_email(email)
+                await main.classify_email(email)
+                print("✗ Exhausted rate limit retries should fail the request")
+                return False
+            except main.HTTPException as e:
+                assert e.status_code == 503 and 1 <= int(e.headers['Retry-After']) <= 5, e
+                retry_after = e.headers['Retry-After']
+        print(f"✓ Persistent 429s answered with 503, Retry-After {retry_after}s")
+    finally:
+        stub.stop()
+    
+    return True
+
+
+async def test_request_hedging():
+    """Test hedged LLM calls: the first valid result wins and the slow copy is cancelled."""
+    print("\n=== Testing request hedging ===")
+    
+    cancelled = []
+    
+    def make_call(*behaviours):
+        """Each call() plays the next (delay, outcome) pair; outcomes that are exceptions are raised."""
+        queue = list(behaviours)
+        
+        async def call():
+            delay, outcome = queue.pop(0)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(outcome)
+                raise
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return call
+    
+    hedger = Hedger(initial_delay=0.05, max_rate=1.0)
+    started = time.perf_counter()
+    assert await hedger.run(make_call((1.0, "slow"), (0.01, "hedge"))) == "hedge"
+    await asyncio.sleep(0)
+    assert time.perf_counter() - started < 0.5 and cancelled == ["slow"]
+    assert await hedger.run(make_call((0.01, "fast"))) == "fast"
+    stats = hedger.stats()
+    assert stats['hedges_fired'] == 1 and stats['hedges_won'] == 1 and stats['calls'] == 2
+    print(f"✓ Slow call hedged after {hedger.initial_delay * 1000:.0f} ms, hedge won and the original was cancelled")
+    
+    # An unparsable response does not win: the other copy is awaited
+    hedger = Hedger(initial_delay=0.05, max_rate=1.0)
+    assert await hedger.run(make_call((0.1, ValueError("bad JSON")), (0.2, "valid"))) == "valid"
+    try:
+        await hedger.run(make_call((0.1, ValueError("bad JSON")), (0.01, ValueError("also bad"))))
+        print("✗ Two failed copies should raise")
+        return False
+    except ValueError:
+        pass
+    print("✓ A failed copy leaves the other to answer; both failing raises")
+    
+    # The budget caps the hedge rate
+    hedger = Hedger(initial_delay=0.01, max_rate=0.0)
+    assert await hedger.run(make_call((0.05, "slow"))) == "slow"
+    assert hedger.stats()['hedges_fired'] == 0 and hedger.stats()['skipped_budget'] == 1
+    hedger = Hedger(initial_delay=0.01, max_rate=1.0, can_hedge=lambda: False)
+    assert await hedger.run(make_call((0.05, "slow"))) == "slow" and hedger.stats()['skipped_busy'] == 1
+    print("✓ No hedge beyond the rate budget or while calls are queueing")
+    
+    # Through classify_with_llm: the first parsed ClassificationResult wins
+    async def completion(messages):
+        call_number = completion.calls = getattr(completion, "calls", 0) + 1
+        await asyncio.sleep(1.0 if call_number == 1 else 0.01)
+        return Mock(content=ClassificationResult(
+            workflow_type="InvoiceRequest", confidence_score=0.9
+        ).model_dump_json(), usage_metadata=None)
+    
+    email = create_test_emails()[0]['email']
+    tier = main.llm_tiers[0]
+    with patch.object(tier, 'client') as mock_llm, \
+         patch('main.llm_hedgers', {tier.name: Hedger(initial_delay=0.05, max_rate=1.0)}):
+        mock_llm.ainvoke = AsyncMock(side_effect=completion)
+        started = time.perf_counter()
+        result = await main.classify_with_llm(email)
+        elapsed = time.perf_counter() - started
+        assert result.workflow_type == "InvoiceRequest" and elapsed < 0.5 and mock_llm.ainvoke.call_count == 2
+        hedging = (await main.metrics())['hedging'][tier.name]
+        assert hedging['hedges_won'] == 1
+    print(f"✓ Hedged classification returned in {elapsed * 1000:.0f} ms instead of 1000 ms")
+    
+    return True
+
+
+async def test_benchmark_report():
+    """Test the precision/recall report and baseline comparison of benchmark_classifier."""
+    print("\n=== Testing benchmark evaluation report ===")
+    from benchmark_classifier import classification_report, compare, synthetic_corpus
+    
+    pairs = ([("InvoiceRequest", "InvoiceRequest")] * 3 + [("InvoiceRequest", "HumanReview")]
+             + [("HumanReview", "HumanReview")] + [("HumanReview", "InvoiceRequest")])
+    report = classification_report(pairs)
+    invoice, review = report['per_class']['InvoiceRequest'], report['per_class']['HumanReview']
+    assert report['accuracy'] == round(4 / 6, 4)
+    assert invoice['precision'] == 0.75 and invoice['recall'] == 0.75 and invoice['support'] == 4
+    assert review['precision'] == 0.5 and review['recall'] == 0.5
+    assert report['per_class']['AppointmentBooking']['support'] == 0
+    assert report['per_class']['AppointmentBooking']['f1'] is None
+    assert report['confusion']['InvoiceRequest']['HumanReview'] == 1
+    print(f"✓ Per-class precision/recall computed (accuracy {report['accuracy']}, macro F1 {report['macro_f1']})")
+    
+    first, second = synthetic_corpus(50, seed=3), synthetic_corpus(50, seed=3)
+    assert [e.model_dump() for e, _ in first] == [e.model_dump() for e, _ in second]
+    assert len({e.body for e, _ in first}) < 50
+    comparison = compare({"emails_per_second": 120.0, "latency_ms": {"p50": 80.0}, "accuracy": 0.9},
+                         {"emails_per_second": 100.0, "latency_ms": {"p50": 100.0}, "accuracy": 0.95})
+    assert comparison['emails_per_second']['improved'] and comparison['emails_per_second']['relative'] == 0.2
+    assert comparison['latency_ms.p50']['improved'] and not comparison['accuracy']['improved']
+    print("✓ Synthetic corpus is deterministic with repeats; baseline comparison flags regressions")
+    
+    return True
+
+
 async def run_all_tests():
     """Run all async test functions."""
     print("=== Email Classification Agent Test Suite ===")
@@ -306,13 +1272,30 @@ async def run_all_tests():
     # Set test configuration
     main.CONFIDENCE_THRESHOLD = 0.85
     main.ROUTER_AGENT_URL = "http://localhost:8002/route"
+    # Tests reuse the same emails with different mocked LLM responses
+    main.classification_cache = None
+    main.near_duplicate_index = None
     
     tests = [
         test_health_endpoint,
         test_llm_parsing,
         test_classify_endpoint,
         test_router_communication,
-        test_confidence_threshold
+        test_confidence_threshold,
+        test_batch_classify_endpoint,
+        test_llm_concurrency_limit,
+        test_classification_cache,
+        test_near_duplicate_index,
+        test_local_classifier,
+        test_knn_classifier,
+        test_micro_batching,
+        test_model_cascade,
+        test_body_preprocessing,
+        test_http_pool,
+        test_async_routing,
+        test_rate_limiting,
+        test_request_hedging,
+        test_benchmark_report
     ]
     
     passed = 0
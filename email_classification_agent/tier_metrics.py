@@ -0,0 +1,79 @@
+# tier_metrics.py for email_classification_agent
+import threading
+from collections import deque
+from typing import Dict
+
+from llm_limiter import percentile
+
+
+class TierMetrics:
+    """Per-tier counters for the classification pipeline.
+
+    Each tier that looks at an email records whether it resolved it, passed
+    it on to the next tier (escalated) or failed, and how long that took.
+    LLM tiers also record token usage and its cost.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._window = window
+        self._lock = threading.Lock()
+        self._tiers: Dict[str, dict] = {}
+
+    def _tier(self, name: str) -> dict:
+        tier = self._tiers.get(name)
+        if tier is None:
+            tier = {"attempts": 0, "resolved": 0, "failed": 0, "total_latency": 0.0,
+                    "latencies": deque(maxlen=self._window),
+                    "calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+            self._tiers[name] = tier
+        return tier
+
+    def record(self, name: str, resolved: bool, latency: float, failed: bool = False):
+        with self._lock:
+            tier = self._tier(name)
+            tier["attempts"] += 1
+            tier["resolved"] += int(resolved)
+            tier["failed"] += int(failed)
+            tier["total_latency"] += latency
+            tier["latencies"].append(latency)
+
+    def record_usage(self, name: str, input_tokens: int, output_tokens: int, cost: float):
+        """Add the token usage and cost of one model call."""
+        with self._lock:
+            tier = self._tier(name)
+            tier["calls"] += 1
+            tier["input_tokens"] += input_tokens
+            tier["output_tokens"] += output_tokens
+            tier["cost"] += cost
+
+    def stats(self) -> dict:
+        """Attempts, hit and escalation rates, latency and cost of every tier, in the order first seen."""
+        with self._lock:
+            result = {}
+            for name, tier in self._tiers.items():
+                attempts = tier["attempts"]
+                escalated = attempts - tier["resolved"] - tier["failed"]
+                p50 = percentile(tier["latencies"], 0.50)
+                p95 = percentile(tier["latencies"], 0.95)
+                stats = {
+                    "attempts": attempts,
+                    "resolved": tier["resolved"],
+                    "escalated": escalated,
+                    "failed": tier["failed"],
+                    "hit_rate": round(tier["resolved"] / attempts, 4) if attempts else None,
+                    "escalation_rate": round(escalated / attempts, 4) if attempts else None,
+                    "latency_ms": {
+                        "avg": round(tier["total_latency"] / attempts * 1000, 3) if attempts else None,
+                        "p50": round(p50 * 1000, 3) if p50 is not None else None,
+                        "p95": round(p95 * 1000, 3) if p95 is not None else None,
+                    },
+                }
+                if tier["calls"]:
+                    stats.update({
+                        "calls": tier["calls"],
+                        "input_tokens": tier["input_tokens"],
+                        "output_tokens": tier["output_tokens"],
+                        "cost_usd": round(tier["cost"], 6),
+                    })
+                result[name] = stats
+            return result
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Train the local first-stage classifier from labeled email history.
+
+The input is JSON Lines. Each line is either a flat record
+({"sender", "subject", "body", "workflow_type"}) or a ClassifiedEmail payload
+as received by the router ({"original_email": {...}, "classification": {...}}).
+Bodies are preprocessed the way the service does before classification
+(unless --no-preprocess, for a service run with BODY_PREPROCESSING_ENABLED=false),
+so the model is fitted on emails that look like the ones it will score.
+A share of the data is held out to report accuracy and how many emails the
+model would resolve at each confidence threshold.
+
+    python train_local_classifier.py --data history.jsonl --output models/local_classifier.npz
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime
+from typing import List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.models import NormalizedEmail
+from body_preprocessor import preprocess_body
+from local_classifier import LABELS, LocalClassifier
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95)
+
+
+def load_examples(path: str) -> List[Tuple[NormalizedEmail, str]]:
+    examples = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "original_email" in record:
+                email = record["original_email"]
+                label = record["classification"]["workflow_type"]
+            else:
+                email = record
+                label = record["workflow_type"]
+            if label not in LABELS:
+                raise ValueError(f"{path}:{line_number}: unknown workflow_type {label!r}")
+            examples.append((NormalizedEmail(
+                sender=email["sender"],
+                subject=email.get("subject", ""),
+                body=email.get("body", ""),
+                received_time=email.get("received_time", "")
+            ), label))
+    return examples
+
+
+def preprocess_examples(examples: List[Tuple[NormalizedEmail, str]],
+                        token_budget: int) -> List[Tuple[NormalizedEmail, str]]:
+    """Reduce the bodies as the service does with PROMPT_BODY_TOKEN_BUDGET=token_budget."""
+    return [(email.model_copy(update={"body": preprocess_body(email.body, token_budget).text}), label)
+            for email, label in examples]
+
+
+def evaluate(model: LocalClassifier, examples: List[Tuple[NormalizedEmail, str]]) -> dict:
+    """Accuracy overall and coverage/accuracy of the emails accepted at each threshold."""
+    predictions = [(model.classify(email), label) for email, label in examples]
+    report = {
+        "examples": len(examples),
+        "accuracy": sum(p.workflow_type == label for p, label in predictions) / len(predictions),
+        "thresholds": {},
+    }
+    for threshold in THRESHOLDS:
+        accepted = [(p, label) for p, label in predictions if p.confidence_score >= threshold]
+        report["thresholds"][threshold] = {
+            "coverage": len(accepted) / len(predictions),
+            "accuracy": (sum(p.workflow_type == label for p, label in accepted) / len(accepted)
+                         if accepted else None),
+        }
+    return report
+
+
+def main_train():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="Labeled emails as JSON Lines")
+    parser.add_argument("--output", required=True, help="Where to write the .npz model")
+    parser.add_argument("--version", default=datetime.utcnow().strftime("%Y%m%d%H%M%S"),
+                        help="Model version recorded in the file (default: UTC timestamp)")
+    parser.add_argument("--feature-bits", type=int, default=18, help="log2 of the hashed feature space")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of examples held out for evaluation")
+    parser.add_argument("--token-budget", type=int, default=1000, help="PROMPT_BODY_TOKEN_BUDGET of the service")
+    parser.add_argument("--no-preprocess", action="store_true",
+                        help="Train on raw bodies, for a service with BODY_PREPROCESSING_ENABLED=false")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    if not args.no_preprocess:
+        examples = preprocess_examples(examples, args.token_budget)
+    random.Random(args.seed).shuffle(examples)
+    holdout_size = int(len(examples) * args.holdout)
+    holdout, training = examples[:holdout_size], examples[holdout_size:]
+    print(f"Loaded {len(examples)} examples ({len(training)} training, {len(holdout)} held out)")
+
+    model = LocalClassifier.train(
+        [email for email, _ in training], [label for _, label in training],
+        version=args.version, n_features=2 ** args.feature_bits, epochs=args.epochs, seed=args.seed
+    )
+    model.metadata["body_token_budget"] = None if args.no_preprocess else args.token_budget
+    if holdout:
+        report = evaluate(model, holdout)
+        model.metadata["holdout"] = report
+        print(f"\nHeld-out accuracy: {report['accuracy']:.1%}")
+        print(f"{'threshold':>10} {'coverage':>9} {'accuracy':>9}")
+        for threshold, row in report["thresholds"].items():
+            accuracy = f"{row['accuracy']:.1%}" if row["accuracy"] is not None else "-"
+            print(f"{threshold:>10} {row['coverage']:>9.1%} {accuracy:>9}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    model.save(args.output)
+    print(f"\nSaved model version {model.version} to {args.output}")
+
+
+if __name__ == "__main__":
+    main_train()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Benchmark per-message FETCH against batched UID FETCH using the fake IMAP server."""
+import argparse
+import email
+import imaplib
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fake_imap_server import FakeIMAPServer, build_test_message
+
+logging.getLogger("main").setLevel(logging.WARNING)
+
+
+def fetch_per_message(mail: imaplib.IMAP4) -> int:
+    """The original strategy: SEARCH UNSEEN, then one FETCH per message.
+
+    BODY.PEEK[] is used instead of RFC822 so the mailbox stays unseen for the next case.
+    """
+    mail.select("INBOX")
+    status, messages = mail.search(None, "UNSEEN")
+    count = 0
+    for email_id in messages[0].split():
+        status, msg_data = mail.fetch(email_id, "(BODY.PEEK[])")
+        if status == "OK":
+            main.normalize_email(email.message_from_bytes(msg_data[0][1]))
+            count += 1
+    return count
+
+
+def fetch_batched(mail: imaplib.IMAP4, batch_size: int) -> int:
+    """UID SEARCH UNSEEN followed by UID FETCH over batch_size UID sets."""
+    mail.select("INBOX")
+    count = 0
+    for _, msg in main.fetch_emails_batched(mail, main.search_unseen_uids(mail), batch_size):
+        main.normalize_email(msg)
+        count += 1
+    return count
+
+
+def run_case(server: FakeIMAPServer, label: str, fetch) -> dict:
+    server.reset_counters()
+    mail = imaplib.IMAP4("127.0.0.1", server.port)
+    mail.login("bench", "bench")
+    started = time.perf_counter()
+    count = fetch(mail)
+    elapsed = time.perf_counter() - started
+    round_trips = server.command_count() - 1  # exclude LOGIN
+    mail.logout()
+    return {
+        "mode": label,
+        "messages": count,
+        "seconds": elapsed,
+        "round_trips": round_trips,
+        "msgs_per_sec": count / elapsed if elapsed else float("inf"),
+    }
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="Comma separated mailbox sizes (default: 100,1000,10000)")
+    parser.add_argument("--batch-size", type=int, default=main.IMAP_FETCH_BATCH_SIZE)
+    parser.add_argument("--latency-ms", type=float, default=1.0,
+                        help="Simulated server round-trip latency per command")
+    args = parser.parse_args()
+
+    print("=== IMAP Fetch Benchmark ===")
+    print(f"Batch size: {args.batch_size}, simulated latency: {args.latency_ms} ms/command\n")
+    print(f"{'messages':>9} {'mode':>12} {'round trips':>12} {'seconds':>9} {'msgs/sec':>10}")
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        server = FakeIMAPServer(latency=args.latency_ms / 1000.0).start()
+        for i in range(size):
+            server.add_message(build_test_message(i))
+
+        cases = [
+            run_case(server, "per-message", fetch_per_message),
+            run_case(server, "batched", lambda mail: fetch_batched(mail, args.batch_size)),
+        ]
+        for result in cases:
+            print(f"{size:>9} {result['mode']:>12} {result['round_trips']:>12} "
+                  f"{result['seconds']:>9.3f} {result['msgs_per_sec']:>10.0f}")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: IMAP round trips per cycle with per-message vs bulk \\Seen updates."""
+import argparse
+import imaplib
+import logging
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fake_imap_server import FakeIMAPServer, build_test_message
+
+logging.getLogger("main").setLevel(logging.WARNING)
+
+
+def run_cycle(size: int, store_batch_size: int, latency: float) -> dict:
+    """Run one UNSEEN cycle over size new emails and count the commands it sent."""
+    server = FakeIMAPServer(latency=latency).start()
+    for i in range(size):
+        server.add_message(build_test_message(i))
+
+    mail = imaplib.IMAP4("127.0.0.1", server.port)
+    mail.login("bench", "bench")
+    server.reset_counters()
+
+    with patch('main.dispatch_to_classifier', return_value=True), \
+         patch('main.IMAP_SYNC_MODE', "UNSEEN"), \
+         patch('main.IMAP_STORE_BATCH_SIZE', store_batch_size):
+        started = time.perf_counter()
+        main.process_mailbox(mail)
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "round_trips": server.command_count(),
+        "stores": server.command_count("STORE"),
+        "seconds": elapsed,
+    }
+    mail.logout()
+    server.stop()
+    return result
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="100,1000")
+    parser.add_argument("--batch-size", type=int, default=main.IMAP_STORE_BATCH_SIZE)
+    parser.add_argument("--latency-ms", type=float, default=1.0,
+                        help="Simulated server round-trip latency per command")
+    args = parser.parse_args()
+
+    print("=== IMAP Flag Update Benchmark ===")
+    print(f"Store batch size: {args.batch_size}, simulated latency: {args.latency_ms} ms/command\n")
+    print(f"{'messages':>9} {'mode':>12} {'STOREs':>7} {'round trips':>12} {'seconds':>9}")
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for label, batch_size in (("per-message", 1), ("bulk", args.batch_size)):
+            result = run_cycle(size, batch_size, args.latency_ms / 1000.0)
+            print(f"{size:>9} {label:>12} {result['stores']:>7} {result['round_trips']:>12} "
+                  f"{result['seconds']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
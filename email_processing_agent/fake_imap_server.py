@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""A small in-process IMAP4rev1 stand-in used by the tests and benchmarks.
+
+It speaks just enough of the protocol for imaplib to drive the processing
+agent: LOGIN, CAPABILITY, SELECT/EXAMINE, (UID) SEARCH, (UID) FETCH,
+(UID) STORE, NOOP, IDLE and LOGOUT. Messages live in memory and every command
+is counted so benchmarks can report round trips per cycle. Messages added while
+a client is idling are announced with an untagged EXISTS response at once; other
+clients that selected the mailbox get it ahead of their next command's response.
+"""
+import bisect
+import re
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class FakeMailbox:
+    """In-memory mailbox shared by all connections of a FakeIMAPServer."""
+
+    def __init__(self, uid_validity: int = 1):
+        self.uid_validity = uid_validity
+        self.next_uid = 1
+        self.messages: List[Dict] = []  # [{"uid": int, "raw": bytes, "flags": set}]
+        self.lock = threading.RLock()
+
+    def add_message(self, raw: bytes, flags: Optional[set] = None) -> int:
+        """Append a message and return its UID."""
+        with self.lock:
+            uid = self.next_uid
+            self.next_uid += 1
+            self.messages.append({"uid": uid, "raw": raw, "flags": set(flags or ())})
+            return uid
+
+    def max_uid(self) -> int:
+        with self.lock:
+            return self.messages[-1]["uid"] if self.messages else 0
+
+
+def parse_sequence_set(sequence_set: str, max_value: int) -> List[range]:
+    """Parse an IMAP sequence set such as ``1:3,7,9:*`` into ranges."""
+    ranges = []
+    for part in sequence_set.split(","):
+        if ":" in part:
+            low, high = part.split(":", 1)
+        else:
+            low = high = part
+        low_value = max_value if low == "*" else int(low)
+        high_value = max_value if high == "*" else int(high)
+        if low_value > high_value:
+            low_value, high_value = high_value, low_value
+        ranges.append(range(low_value, high_value + 1))
+    return ranges
+
+
+def in_sequence_set(value: int, ranges: List[range]) -> bool:
+    return any(value in r for r in ranges)
+
+
+class FakeIMAPHandler(socketserver.StreamRequestHandler):
+    """Handle one client connection."""
+
+    # Responses are written line by line; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.selected = False
+        self.write_lock = threading.Lock()
+        self.exists_pending = False
+
+    def finish(self):
+        self.server.remove_session(self)
+        super().finish()
+
+    def flush_exists(self):
+        """Announce messages added since this client's last command."""
+        if self.exists_pending:
+            self.exists_pending = False
+            self.send(f"* {len(self.server.mailbox.messages)} EXISTS")
+
+    def send(self, line: str):
+        self.write(line.encode() + b"\r\n")
+
+    def write(self, data: bytes):
+        # IDLE notifications are written from the thread that adds the message
+        with self.write_lock:
+            self.wfile.write(data)
+
+    def handle(self):
+        server: "FakeIMAPServer" = self.server
+        self.send(f"* OK [CAPABILITY {' '.join(server.capabilities)}] Fake IMAP ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            line = line.decode().rstrip("\r\n")
+            if not line:
+                continue
+            server.record_command(line)
+            if server.latency:
+                time.sleep(server.latency)
+            tag, _, rest = line.partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            uid_mode = False
+            if command == "UID":
+                uid_mode = True
+                command, _, args = args.partition(" ")
+                command = command.upper()
+
+            if command != "IDLE":
+                self.flush_exists()
+            handler = getattr(self, f"cmd_{command.lower()}", None)
+            if handler is None:
+                self.send(f"{tag} BAD Unknown command {command}")
+                continue
+            try:
+                if handler(tag, args, uid_mode) is False:
+                    return
+            except Exception as e:  # pragma: no cover - defensive
+                self.send(f"{tag} BAD {e}")
+
+    # Commands -----------------------------------------------------------
+
+    def cmd_capability(self, tag, args, uid_mode):
+        self.send(f"* CAPABILITY {' '.join(self.server.capabilities)}")
+        self.send(f"{tag} OK CAPABILITY completed")
+
+    def cmd_login(self, tag, args, uid_mode):
+        self.send(f"{tag} OK LOGIN completed")
+
+    def cmd_logout(self, tag, args, uid_mode):
+        self.send("* BYE Fake IMAP closing")
+        self.send(f"{tag} OK LOGOUT completed")
+        return False
+
+    def cmd_noop(self, tag, args, uid_mode):
+        self.send(f"{tag} OK NOOP completed")
+
+    def cmd_select(self, tag, args, uid_mode):
+        mailbox = self.server.mailbox
+        with mailbox.lock:
+            self.send(f"* {len(mailbox.messages)} EXISTS")
+            self.send("* 0 RECENT")
+            self.send("* FLAGS (\\Seen \\Answered \\Flagged \\Deleted \\Draft)")
+            self.send(f"* OK [UIDVALIDITY {mailbox.uid_validity}] UIDs valid")
+            self.send(f"* OK [UIDNEXT {mailbox.next_uid}] Predicted next UID")
+        self.selected = True
+        self.server.add_session(self)
+        self.send(f"{tag} OK [READ-WRITE] SELECT completed")
+
+    cmd_examine = cmd_select
+
+    def cmd_idle(self, tag, args, uid_mode):
+        if "IDLE" not in self.server.capabilities:
+            self.send(f"{tag} BAD IDLE not supported")
+            return
+        self.send("+ idling")
+        self.server.add_idler(self)
+        self.flush_exists()
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return False
+                if line.strip().upper() == b"DONE":
+                    break
+        finally:
+            self.server.remove_idler(self)
+        self.send(f"{tag} OK IDLE terminated")
+
+    def _resolve(self, sequence_set: str, uid_mode: bool) -> List[tuple]:
+        """Return (sequence_number, message) pairs addressed by a set."""
+        mailbox = self.server.mailbox
+        with mailbox.lock:
+            messages = list(mailbox.messages)
+        if not messages:
+            return []
+        if uid_mode:
+            # UIDs are strictly ascending, so each range maps to a contiguous slice
+            uids = [m["uid"] for m in messages]
+            ranges = parse_sequence_set(sequence_set, uids[-1])
+            positions = set()
+            for r in ranges:
+                positions.update(range(bisect.bisect_left(uids, r.start), bisect.bisect_left(uids, r.stop)))
+        else:
+            ranges = parse_sequence_set(sequence_set, len(messages))
+            positions = {n - 1 for r in ranges for n in r if 0 < n <= len(messages)}
+        return [(i + 1, messages[i]) for i in sorted(positions)]
+
+    def cmd_search(self, tag, args, uid_mode):
+        tokens = args.split()
+        if tokens and tokens[0].upper() == "CHARSET":
+            tokens = tokens[2:]
+        mailbox = self.server.mailbox
+        with mailbox.lock:
+            candidates = [(i + 1, m) for i, m in enumerate(mailbox.messages)]
+        index = 0
+        while index < len(tokens):
+            key = tokens[index].upper()
+            if key == "ALL":
+                pass
+            elif key == "UNSEEN":
+                candidates = [(n, m) for n, m in candidates if "\\Seen" not in m["flags"]]
+            elif key == "SEEN":
+                candidates = [(n, m) for n, m in candidates if "\\Seen" in m["flags"]]
+            elif key == "UID":
+                index += 1
+                addressed = {id(m) for _, m in self._resolve(tokens[index], True)}
+                candidates = [(n, m) for n, m in candidates if id(m) in addressed]
+            else:
+                self.send(f"{tag} BAD Unsupported search key {key}")
+                return
+            index += 1
+        results = [str(m["uid"] if uid_mode else n) for n, m in candidates]
+        self.send("* SEARCH" + ("" if not results else " " + " ".join(results)))
+        self.send(f"{tag} OK SEARCH completed")
+
+    def cmd_fetch(self, tag, args, uid_mode):
+        sequence_set, _, items = args.partition(" ")
+        items = items.upper()
+        peek = "PEEK" in items
+        wants_body = "RFC822" in items or "BODY" in items
+        addressed = self._resolve(sequence_set, uid_mode)
+        # UIDs in fetch_failures make the whole FETCH fail, like a message the server cannot read
+        if any(message["uid"] in self.server.fetch_failures for _, message in addressed):
+            self.send(f"{tag} NO FETCH failed")
+            return
+        for number, message in addressed:
+            parts = [f"UID {message['uid']}"]
+            if "FLAGS" in items:
+                parts.append(f"FLAGS ({' '.join(sorted(message['flags']))})")
+            if wants_body:
+                raw = message["raw"]
+                if "HEADER" in items:
+                    raw = raw.split(b"\r\n\r\n", 1)[0] + b"\r\n\r\n"
+                    name = "BODY[HEADER]"
+                else:
+                    name = "RFC822" if "RFC822" in items else "BODY[]"
+                if not peek:
+                    message["flags"].add("\\Seen")
+                # With uid_after_literal the UID follows the body, as RFC 3501 allows
+                before, after = (parts[1:], f" {parts[0]}") if self.server.uid_after_literal else (parts, "")
+                self.write(
+                    f"* {number} FETCH ({' '.join(before + [name])} {{{len(raw)}}}\r\n".encode()
+                    + raw + f"{after})\r\n".encode()
+                )
+            else:
+                self.send(f"* {number} FETCH ({' '.join(parts)})")
+        self.send(f"{tag} OK FETCH completed")
+
+    def cmd_store(self, tag, args, uid_mode):
+        sequence_set, _, rest = args.partition(" ")
+        operation, _, flags = rest.partition(" ")
+        operation = operation.upper()
+        flag_names = set(flags.strip("()").split())
+        failed = False
+        for number, message in self._resolve(sequence_set, uid_mode):
+            # UIDs in store_failures reject the update, like a message locked by another client
+            if message["uid"] in self.server.store_failures:
+                failed = True
+                continue
+            if operation.startswith("+"):
+                message["flags"] |= flag_names
+            elif operation.startswith("-"):
+                message["flags"] -= flag_names
+            else:
+                message["flags"] = set(flag_names)
+            if not operation.endswith(".SILENT"):
+                self.send(f"* {number} FETCH (UID {message['uid']} FLAGS ({' '.join(sorted(message['flags']))}))")
+        if failed:
+            self.send(f"{tag} NO STORE failed for some messages")
+        else:
+            self.send(f"{tag} OK STORE completed")
+
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    """Threaded fake IMAP server bound to localhost on an ephemeral port."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency: float = 0.0, capabilities: Optional[List[str]] = None,
+                 uid_validity: int = 1):
+        super().__init__(("127.0.0.1", 0), FakeIMAPHandler)
+        self.latency = latency
+        self.capabilities = capabilities or ["IMAP4rev1"]
+        self.mailbox = FakeMailbox(uid_validity)
+        self.store_failures: set = set()
+        self.fetch_failures: set = set()
+        self.uid_after_literal = False
+        self.commands: List[str] = []
+        self._commands_lock = threading.Lock()
+        self._idlers: set = set()
+        self._sessions: set = set()
+        self._idlers_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def record_command(self, line: str):
+        with self._commands_lock:
+            self.commands.append(line)
+
+    def command_count(self, name: Optional[str] = None) -> int:
+        """Count received commands, optionally only those named ``name``."""
+        with self._commands_lock:
+            if name is None:
+                return len(self.commands)
+            pattern = re.compile(rf"^\S+ (UID )?{name}\b", re.IGNORECASE)
+            return sum(1 for c in self.commands if pattern.match(c))
+
+    def reset_counters(self):
+        with self._commands_lock:
+            self.commands.clear()
+
+    def add_message(self, raw: bytes, flags: Optional[set] = None) -> int:
+        """Add a message, notifying idling clients with an untagged EXISTS.
+
+        Other clients with the mailbox selected get the EXISTS with the
+        response to their next command.
+        """
+        uid = self.mailbox.add_message(raw, flags)
+        with self._idlers_lock:
+            idlers = list(self._idlers)
+            for session in self._sessions - self._idlers:
+                session.exists_pending = True
+        for idler in idlers:
+            idler.send(f"* {len(self.mailbox.messages)} EXISTS")
+        return uid
+
+    def add_session(self, handler: FakeIMAPHandler):
+        with self._idlers_lock:
+            self._sessions.add(handler)
+
+    def remove_session(self, handler: FakeIMAPHandler):
+        with self._idlers_lock:
+            self._sessions.discard(handler)
+
+    def add_idler(self, handler: FakeIMAPHandler):
+        with self._idlers_lock:
+            self._idlers.add(handler)
+
+    def remove_idler(self, handler: FakeIMAPHandler):
+        with self._idlers_lock:
+            self._idlers.discard(handler)
+
+    def idle_client_count(self) -> int:
+        with self._idlers_lock:
+            return len(self._idlers)
+
+    def start(self) -> "FakeIMAPServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def build_test_message(index: int, body_size: int = 512) -> bytes:
+    """Build a simple RFC 5322 message for tests and benchmarks."""
+    body = (f"Message {index} body. " * (body_size // 20 + 1))[:body_size]
+    return (
+        f"From: sender{index}@example.com\r\n"
+        f"Subject: Test message {index}\r\n"
+        f"Date: Mon, 01 Jan 2024 12:00:00 +0000\r\n"
+        f"Message-ID: <msg{index}@example.com>\r\n"
+        f"Content-Type: text/plain; charset=utf-8\r\n"
+        f"\r\n"
+        f"{body}\r\n"
+    ).encode()
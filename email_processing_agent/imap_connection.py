@@ -0,0 +1,134 @@
+# imap_connection.py for email_processing_agent
+import imaplib
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IMAPConnectionManager:
+    """Keep one authenticated IMAP session open across poll cycles.
+
+    A session that has been unused for longer than keepalive_interval is
+    checked with NOOP before it is handed out. Dead sessions are replaced,
+    retrying the connect callable with exponential backoff and jitter.
+    """
+
+    def __init__(self, connect: Callable[[], Optional[imaplib.IMAP4]],
+                 keepalive_interval: float = 60.0, backoff_base: float = 1.0,
+                 backoff_max: float = 300.0, max_attempts: Optional[int] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self._connect = connect
+        self.keepalive_interval = keepalive_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_attempts = max_attempts
+        self._sleep = sleep
+        self._lock = threading.RLock()
+        self._mail: Optional[imaplib.IMAP4] = None
+        self._connected_at: Optional[float] = None
+        self._last_used: Optional[float] = None
+        self.connect_count = 0
+        self.reconnect_count = 0
+        self.connect_failures = 0
+        self.noop_checks = 0
+        self.last_error: Optional[str] = None
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff for the given attempt with "equal jitter"."""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def get(self) -> imaplib.IMAP4:
+        """Return a live session, reconnecting if the current one is gone."""
+        with self._lock:
+            if self._mail is not None and not self._is_alive():
+                self._discard()
+            if self._mail is None:
+                self._open()
+            self._last_used = time.monotonic()
+            return self._mail
+
+    def mark_used(self):
+        """Record activity on the session (e.g. a completed IDLE) to skip the next NOOP."""
+        with self._lock:
+            if self._mail is not None:
+                self._last_used = time.monotonic()
+
+    def invalidate(self, reason: Optional[str] = None):
+        """Drop the current session, e.g. after imaplib raised abort."""
+        with self._lock:
+            if self._mail is not None:
+                logger.warning(f"Discarding IMAP session: {reason or 'invalidated'}")
+                self.last_error = reason or self.last_error
+                self._discard()
+
+    def close(self):
+        """Log out and forget the current session."""
+        with self._lock:
+            if self._mail is not None:
+                try:
+                    self._mail.logout()
+                except Exception:
+                    pass
+            self._mail = None
+            self._connected_at = None
+
+    def stats(self) -> dict:
+        """Connection-age and reconnect statistics for logging and monitoring."""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "connected": self._mail is not None,
+                "connection_age_seconds": round(now - self._connected_at, 3) if self._connected_at else None,
+                "idle_seconds": round(now - self._last_used, 3) if self._last_used and self._mail else None,
+                "connect_count": self.connect_count,
+                "reconnect_count": self.reconnect_count,
+                "connect_failures": self.connect_failures,
+                "noop_checks": self.noop_checks,
+                "last_error": self.last_error,
+            }
+
+    def _is_alive(self) -> bool:
+        if self._last_used is not None and time.monotonic() - self._last_used < self.keepalive_interval:
+            return True
+        self.noop_checks += 1
+        try:
+            status, _ = self._mail.noop()
+            return status == "OK"
+        except Exception as e:
+            self.last_error = f"NOOP failed: {e}"
+            logger.warning(f"IMAP keepalive NOOP failed: {e}")
+            return False
+
+    def _discard(self):
+        try:
+            self._mail.shutdown()
+        except Exception:
+            pass
+        self._mail = None
+        self._connected_at = None
+
+    def _open(self):
+        attempt = 0
+        while True:
+            mail = self._connect()
+            if mail is not None:
+                if self.connect_count:
+                    self.reconnect_count += 1
+                self.connect_count += 1
+                self._mail = mail
+                self._connected_at = time.monotonic()
+                return
+
+            self.connect_failures += 1
+            self.last_error = "connect failed"
+            if self.max_attempts is not None and attempt + 1 >= self.max_attempts:
+                raise ConnectionError(f"Could not connect to IMAP server after {attempt + 1} attempts")
+            delay = self.backoff_delay(attempt)
+            logger.error(f"IMAP connection attempt {attempt + 1} failed, retrying in {delay:.1f}s")
+            self._sleep(delay)
+            attempt += 1
@@ -1,18 +1,26 @@
 # main.py for email_processing_agent
 import os
+import re
+import asyncio
+import ssl
 import time
+import select
 import logging
 import imaplib
 import email
 from email.header import decode_header
 from datetime import datetime
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Iterable, Iterator, Tuple
 from dotenv import load_dotenv
 import requests
+import httpx
 from bs4 import BeautifulSoup
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared.models import NormalizedEmail
+from sync_checkpoint import SyncCheckpointStore
+from imap_connection import IMAPConnectionManager
 
 # Load environment variables
 load_dotenv()
@@ -26,6 +34,27 @@ MS_GRAPH_CLIENT_ID = os.getenv("MS_GRAPH_CLIENT_ID")
 MS_GRAPH_CLIENT_SECRET = os.getenv("MS_GRAPH_CLIENT_SECRET")
 MS_GRAPH_TENANT_ID = os.getenv("MS_GRAPH_TENANT_ID")
 CLASSIFICATION_AGENT_URL = os.getenv("CLASSIFICATION_AGENT_URL")
+IMAP_FETCH_BATCH_SIZE = int(os.getenv("IMAP_FETCH_BATCH_SIZE", "100"))
+DISPATCH_CONCURRENCY = int(os.getenv("DISPATCH_CONCURRENCY", "8"))
+DISPATCH_TIMEOUT = float(os.getenv("DISPATCH_TIMEOUT", "30"))
+# SINGLE posts each email to CLASSIFICATION_AGENT_URL; BATCH posts groups to CLASSIFICATION_BATCH_URL
+CLASSIFIER_DISPATCH_MODE = os.getenv("CLASSIFIER_DISPATCH_MODE", "SINGLE").upper()
+CLASSIFICATION_BATCH_URL = os.getenv(
+    "CLASSIFICATION_BATCH_URL",
+    f"{CLASSIFICATION_AGENT_URL.rstrip('/')}/batch" if CLASSIFICATION_AGENT_URL else None
+)
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "20"))
+IMAP_STORE_BATCH_SIZE = int(os.getenv("IMAP_STORE_BATCH_SIZE", "500"))
+IMAP_MAILBOX = os.getenv("IMAP_MAILBOX", "INBOX")
+IMAP_SYNC_MODE = os.getenv("IMAP_SYNC_MODE", "UID").upper()  # UID (incremental checkpoint) or UNSEEN
+IMAP_RESYNC_CRITERIA = os.getenv("IMAP_RESYNC_CRITERIA", "UNSEEN")
+SYNC_STATE_PATH = os.getenv("SYNC_STATE_PATH", "sync_state.db")
+IMAP_KEEPALIVE_INTERVAL = float(os.getenv("IMAP_KEEPALIVE_INTERVAL", "60"))
+IMAP_RECONNECT_BACKOFF_MAX = float(os.getenv("IMAP_RECONNECT_BACKOFF_MAX", "300"))
+IMAP_INGEST_MODE = os.getenv("IMAP_INGEST_MODE", "POLL").upper()  # POLL or IDLE
+POLL_INTERVAL_SECONDS = int(os.getenv("POLL_INTERVAL_SECONDS", "30"))
+# RFC 2177 servers may drop an IDLE after 30 minutes; re-issue comfortably before that
+IMAP_IDLE_TIMEOUT = int(os.getenv("IMAP_IDLE_TIMEOUT", "1500"))
 
 # Set up logging
 logging.basicConfig(
@@ -34,6 +63,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Matches the UID item in an untagged FETCH response, e.g. b'12 (UID 345 BODY[] {2048}'
+FETCH_UID_PATTERN = re.compile(rb"UID (\d+)")
+# Untagged "new mail" notification sent while idling, e.g. b'* 42 EXISTS'
+EXISTS_PATTERN = re.compile(rb"^\* \d+ EXISTS", re.IGNORECASE)
+
+# imaplib sessions are not thread safe, so the async pipeline runs every IMAP call on this one thread
+imap_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="imap")
+
+_checkpoint_store: Optional[SyncCheckpointStore] = None
+
+
+def get_checkpoint_store() -> SyncCheckpointStore:
+    """Return the process-wide sync checkpoint store, opening it on first use."""
+    global _checkpoint_store
+    if _checkpoint_store is None:
+        _checkpoint_store = SyncCheckpointStore(SYNC_STATE_PATH)
+    return _checkpoint_store
+
 
 def connect_to_imap() -> Optional[imaplib.IMAP4_SSL]:
     """Establish and authenticate a connection to the IMAP server."""
@@ -48,25 +95,127 @@ def connect_to_imap() -> Optional[imaplib.IMAP4_SSL]:
         return None
 
 
-def fetch_unseen_emails_imap(mail: imaplib.IMAP4_SSL) -> List[email.message.Message]:
+# Sessions stay open across cycles; the fetch and flag helpers default to this manager's connection
+imap_manager = IMAPConnectionManager(
+    lambda: connect_to_imap(),
+    keepalive_interval=IMAP_KEEPALIVE_INTERVAL,
+    backoff_max=IMAP_RECONNECT_BACKOFF_MAX
+)
+
+
+def select_mailbox(mail: imaplib.IMAP4_SSL):
+    """SELECT IMAP_MAILBOX, discarding the message count it reports.
+
+    Any EXISTS response stored after this one then announces mail that
+    arrived during the cycle (see take_new_mail_notices()).
+    """
+    mail.select(IMAP_MAILBOX)
+    take_new_mail_notices(mail)
+
+
+def take_new_mail_notices(mail: imaplib.IMAP4_SSL) -> bool:
+    """Clear untagged EXISTS responses imaplib stored with earlier command
+    responses; returns whether there were any."""
+    return bool(mail.untagged_responses.pop("EXISTS", None))
+
+
+def compress_uid_set(uids: Iterable) -> str:
+    """Render UIDs as a compact IMAP sequence set, e.g. [1, 2, 3, 7] -> "1:3,7"."""
+    values = sorted({int(uid) for uid in uids})
+    ranges = []
+    for value in values:
+        if ranges and value == ranges[-1][1] + 1:
+            ranges[-1][1] = value
+        else:
+            ranges.append([value, value])
+    return ",".join(str(low) if low == high else f"{low}:{high}" for low, high in ranges)
+
+
+def chunk_uids(uids: List[bytes], batch_size: int) -> Iterator[List[bytes]]:
+    """Split a list of UIDs into batches of at most batch_size entries."""
+    batch_size = max(1, batch_size)
+    for start in range(0, len(uids), batch_size):
+        yield uids[start:start + batch_size]
+
+
+def search_uids(mail: imaplib.IMAP4_SSL, criteria: str) -> List[bytes]:
+    """Return the UIDs in the selected mailbox matching an IMAP search criteria."""
+    status, messages = mail.uid("SEARCH", None, criteria)
+    if status != "OK":
+        logger.error(f"UID SEARCH {criteria} failed: {messages}")
+        return []
+    return messages[0].split()
+
+
+def search_unseen_uids(mail: imaplib.IMAP4_SSL) -> List[bytes]:
+    """Return the UIDs of all unseen emails in the selected mailbox."""
+    return search_uids(mail, "UNSEEN")
+
+
+def search_new_uids(mail: imaplib.IMAP4_SSL, last_uid: int) -> List[bytes]:
+    """Return the UIDs above last_uid in the selected mailbox.
+
+    "n:*" always matches the highest UID even when it is below n, so the
+    result is filtered against the checkpoint.
+    """
+    return [uid for uid in search_uids(mail, f"UID {last_uid + 1}:*") if int(uid) > last_uid]
+
+
+def get_mailbox_uid_state(mail: imaplib.IMAP4_SSL) -> Tuple[Optional[int], Optional[int]]:
+    """Return (UIDVALIDITY, UIDNEXT) reported by the last SELECT."""
+    values = []
+    for code in ("UIDVALIDITY", "UIDNEXT"):
+        _, data = mail.response(code)
+        values.append(int(data[-1]) if data and data[-1] else None)
+    return values[0], values[1]
+
+
+def fetch_uid_batch(mail: imaplib.IMAP4_SSL, batch: List[bytes]) -> List[Tuple[bytes, email.message.Message]]:
+    """Fetch one batch of UIDs with a single UID FETCH round trip.
+
+    BODY.PEEK[] returns the headers and every body part in one response without
+    setting \\Seen, so the flag is only changed once the email is dispatched.
+    """
+    status, msg_data = mail.uid("FETCH", compress_uid_set(batch), "(UID BODY.PEEK[])")
+    if status != "OK":
+        logger.error(f"UID FETCH failed for batch of {len(batch)} emails: {msg_data}")
+        return []
+
+    messages = []
+    for index, item in enumerate(msg_data):
+        # Literal responses arrive as (b'<seq> (UID <uid> BODY[] {n}', raw) tuples
+        if not isinstance(item, tuple):
+            continue
+        match = FETCH_UID_PATTERN.search(item[0])
+        if not match:
+            # Servers may also send the UID after the literal, in the b' UID <uid>)' item that follows
+            following = msg_data[index + 1] if index + 1 < len(msg_data) else None
+            if isinstance(following, bytes):
+                match = FETCH_UID_PATTERN.search(following)
+        if not match:
+            continue
+        messages.append((match.group(1), email.message_from_bytes(item[1])))
+    return messages
+
+
+def fetch_emails_batched(mail: Optional[imaplib.IMAP4_SSL], uids: List[bytes],
+                         batch_size: Optional[int] = None) -> Iterator[Tuple[bytes, email.message.Message]]:
+    """Yield (uid, message) pairs, fetching a whole batch of UIDs per round trip."""
+    if mail is None:
+        mail = imap_manager.get()
+    for batch in chunk_uids(uids, batch_size or IMAP_FETCH_BATCH_SIZE):
+        yield from fetch_uid_batch(mail, batch)
+
+
+def fetch_unseen_emails_imap(mail: Optional[imaplib.IMAP4_SSL] = None) -> List[email.message.Message]:
     """Fetch all unseen emails from the IMAP server."""
-    emails = []
     try:
-        mail.select("INBOX")
-        status, messages = mail.search(None, "UNSEEN")
-        
-        if status == "OK":
-            email_ids = messages[0].split()
-            logger.info(f"Found {len(email_ids)} unseen emails")
-            
-            for email_id in email_ids:
-                status, msg_data = mail.fetch(email_id, "(RFC822)")
-                if status == "OK":
-                    raw_email = msg_data[0][1]
-                    msg = email.message_from_bytes(raw_email)
-                    emails.append(msg)
-                    
-        return emails
+        if mail is None:
+            mail = imap_manager.get()
+        select_mailbox(mail)
+        email_uids = search_unseen_uids(mail)
+        logger.info(f"Found {len(email_uids)} unseen emails")
+        return [msg for _, msg in fetch_emails_batched(mail, email_uids)]
     except Exception as e:
         logger.error(f"Error fetching emails: {e}")
         return []
@@ -169,7 +318,8 @@ def dispatch_to_classifier(email: NormalizedEmail) -> bool:
             timeout=30
         )
         
-        if response.status_code == 200:
+        # 202: classified, routing continues in the classifier's background queue
+        if response.status_code in (200, 202):
             logger.info("Successfully dispatched email to classifier")
             return True
         else:
@@ -185,15 +335,580 @@ def dispatch_to_classifier(email: NormalizedEmail) -> bool:
         return False
 
 
-def mark_email_as_seen(mail: imaplib.IMAP4_SSL, email_id: bytes):
-    """Mark an email as seen to avoid processing it again."""
+def mark_email_as_seen(mail: Optional[imaplib.IMAP4_SSL], email_id: bytes):
+    """Mark an email (by UID) as seen to avoid processing it again."""
     try:
-        mail.store(email_id, '+FLAGS', '\\Seen')
+        if mail is None:
+            mail = imap_manager.get()
+        mail.uid("STORE", email_id, '+FLAGS', '\\Seen')
         logger.debug(f"Marked email {email_id} as seen")
     except Exception as e:
         logger.error(f"Error marking email as seen: {e}")
 
 
+def mark_emails_as_seen(mail: Optional[imaplib.IMAP4_SSL], email_ids: List[bytes],
+                        batch_size: Optional[int] = None) -> List[bytes]:
+    """Mark many emails (by UID) as seen with one UID STORE per batch.
+
+    A batch the server rejects is retried UID by UID so a single bad message
+    does not leave the rest unflagged. Returns the UIDs that could not be flagged.
+    """
+    if mail is None:
+        mail = imap_manager.get()
+    failed = []
+    for batch in chunk_uids(email_ids, batch_size or IMAP_STORE_BATCH_SIZE):
+        try:
+            status, data = mail.uid("STORE", compress_uid_set(batch), "+FLAGS.SILENT", "(\\Seen)")
+            if status == "OK":
+                logger.debug(f"Marked {len(batch)} emails as seen")
+                continue
+            logger.warning(f"Bulk STORE failed for {len(batch)} emails ({data}), retrying individually")
+        except imaplib.IMAP4.abort:
+            raise
+        except Exception as e:
+            logger.warning(f"Bulk STORE failed for {len(batch)} emails ({e}), retrying individually")
+
+        for email_id in batch:
+            try:
+                status, data = mail.uid("STORE", email_id, "+FLAGS.SILENT", "(\\Seen)")
+                if status == "OK":
+                    continue
+                logger.error(f"Error marking email {email_id} as seen: {data}")
+            except imaplib.IMAP4.abort:
+                raise
+            except Exception as e:
+                logger.error(f"Error marking email {email_id} as seen: {e}")
+            failed.append(email_id)
+    return failed
+
+
+class SeenFlagBatch:
+    """Collect the UIDs handled during a cycle and flag them \\Seen in bulk.
+
+    UIDs are flushed automatically once batch_size accumulate and must be
+    flushed explicitly at the end of the cycle.
+    """
+
+    def __init__(self, mail: imaplib.IMAP4_SSL, batch_size: Optional[int] = None):
+        self.mail = mail
+        self.batch_size = batch_size or IMAP_STORE_BATCH_SIZE
+        self.pending: List[bytes] = []
+        self.flagged = 0
+        self.failed: List[bytes] = []
+
+    def add(self, email_id: bytes):
+        self.pending.append(email_id)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> List[bytes]:
+        """Send the pending updates; returns the UIDs that failed in this flush."""
+        if not self.pending:
+            return []
+        pending, self.pending = self.pending, []
+        failed = mark_emails_as_seen(self.mail, pending, self.batch_size)
+        self.flagged += len(pending) - len(failed)
+        self.failed.extend(failed)
+        return failed
+
+
+def process_email(mail: imaplib.IMAP4_SSL, email_id: bytes, msg: email.message.Message,
+                  seen_flags: Optional[SeenFlagBatch] = None) -> bool:
+    """Normalize and dispatch one fetched email.
+
+    Returns False only when the dispatch failed and the email should be
+    retried; unparseable emails are marked as seen and count as handled.
+    When seen_flags is given, the \\Seen update is queued on it instead of
+    being stored immediately.
+    """
+    def mark_seen():
+        if seen_flags is not None:
+            seen_flags.add(email_id)
+        else:
+            mark_email_as_seen(mail, email_id)
+
+    try:
+        # Normalize the email
+        normalized = normalize_email(msg)
+        if not normalized:
+            logger.error("Failed to normalize email, marking as seen anyway")
+            mark_seen()
+            return True
+
+        # Dispatch to classifier
+        if dispatch_to_classifier(normalized):
+            # Mark as seen only after successful processing
+            mark_seen()
+            return True
+
+        logger.warning("Failed to dispatch email, will retry in next cycle")
+        return False
+
+    except Exception as e:
+        logger.error(f"Error processing email {email_id}: {e}")
+        # Mark as seen to avoid getting stuck
+        mark_seen()
+        return True
+
+
+class SyncCycle:
+    """Select the UIDs to process in one cycle and track the sync checkpoint.
+
+    With a checkpoint store, only the UIDs above the mailbox checkpoint are
+    selected. When there is no checkpoint yet, or UIDVALIDITY changed and
+    the stored UIDs are meaningless, a full resync selects every email
+    matching IMAP_RESYNC_CRITERIA and then checkpoints the whole mailbox.
+    Without a store the cycle simply selects the unseen emails.
+
+    The checkpoint only advances over the contiguous prefix of handled
+    UIDs below the first failed one. A failed dispatch stops the cycle:
+    emails above it are not dispatched, while those below it still are and
+    keep advancing the checkpoint, so nothing is skipped.
+    """
+
+    def __init__(self, mail: imaplib.IMAP4_SSL, store: Optional[SyncCheckpointStore] = None):
+        self.store = store
+        self.stopped = False
+        self.resync = False
+        self.last_uid = 0
+
+        if store is None:
+            self.uids = search_unseen_uids(mail)
+            logger.info(f"Found {len(self.uids)} unseen emails")
+        else:
+            self.uid_validity, self.uid_next = get_mailbox_uid_state(mail)
+            checkpoint = store.get(IMAP_MAILBOX)
+            self.resync = checkpoint is None or checkpoint[0] != self.uid_validity
+            if self.resync:
+                if checkpoint is None:
+                    logger.info(f"No sync checkpoint for {IMAP_MAILBOX}, running full resync")
+                else:
+                    logger.warning(f"UIDVALIDITY of {IMAP_MAILBOX} changed from {checkpoint[0]} "
+                                   f"to {self.uid_validity}, running full resync")
+                self.uids = search_uids(mail, IMAP_RESYNC_CRITERIA)
+            else:
+                self.last_uid = checkpoint[1]
+                self.uids = search_new_uids(mail, self.last_uid)
+            logger.info(f"Found {len(self.uids)} new emails above UID {self.last_uid}")
+
+        self._position = {uid: index for index, uid in enumerate(self.uids)}
+        self._handled = [False] * len(self.uids)
+        self._prefix = 0
+        # Position of the lowest UID that failed; the checkpoint never passes it
+        self._first_failed = len(self.uids)
+
+    def should_dispatch(self, email_id: bytes) -> bool:
+        """Whether an email is below the first failure, so handling it can still be checkpointed."""
+        return self._position[email_id] < self._first_failed
+
+    def fetched(self, batch: List[bytes],
+                messages: List[Tuple[bytes, email.message.Message]]) -> List[Tuple[bytes, email.message.Message]]:
+        """Check a fetched batch against the UIDs requested.
+
+        If the FETCH failed or the server left out some UIDs, the cycle stops
+        at the lowest missing UID, and only the messages below it are
+        returned for processing.
+        """
+        returned = {int(uid) for uid, _ in messages}
+        missing = [uid for uid in batch if int(uid) not in returned]
+        if not missing:
+            return messages
+        first_missing = min(missing, key=int)
+        logger.warning(f"UID FETCH returned {len(batch) - len(missing)} of {len(batch)} requested emails")
+        self.record(first_missing, False)
+        return [(uid, msg) for uid, msg in messages if int(uid) < int(first_missing)]
+
+    def record(self, email_id: bytes, handled: bool):
+        """Record the outcome of one email, advancing the checkpoint if possible."""
+        position = self._position[email_id]
+        if not handled:
+            if position < self._first_failed:
+                logger.warning(f"Sync of {IMAP_MAILBOX} stopped at UID {int(email_id)}, "
+                               f"will resume from there next cycle")
+                self._first_failed = position
+            self.stopped = True
+            return
+
+        self._handled[position] = True
+        advanced = False
+        while self._prefix < self._first_failed and self._handled[self._prefix]:
+            self._prefix += 1
+            advanced = True
+        if advanced and self.store is not None and not self.resync:
+            self.last_uid = int(self.uids[self._prefix - 1])
+            self.store.save(IMAP_MAILBOX, self.uid_validity, self.last_uid)
+
+    def finish(self):
+        """Checkpoint everything selected this cycle if every email was handled."""
+        if self.store is None or self.stopped or self._prefix < len(self.uids):
+            return
+        high_water = max([self.last_uid] + [int(uid) for uid in self.uids])
+        if self.resync and self.uid_next:
+            high_water = max(high_water, self.uid_next - 1)
+        self.store.save(IMAP_MAILBOX, self.uid_validity, high_water)
+
+
+def sync_mailbox(mail: imaplib.IMAP4_SSL, store: Optional[SyncCheckpointStore],
+                 seen_flags: Optional[SeenFlagBatch] = None):
+    """Process the emails selected by a SyncCycle one at a time."""
+    cycle = SyncCycle(mail, store)
+    for batch in chunk_uids(cycle.uids, IMAP_FETCH_BATCH_SIZE):
+        for email_id, msg in cycle.fetched(batch, fetch_uid_batch(mail, batch)):
+            cycle.record(email_id, process_email(mail, email_id, msg, seen_flags))
+            if cycle.stopped:
+                return
+        if cycle.stopped:
+            return
+    cycle.finish()
+
+
+def process_mailbox(mail: Optional[imaplib.IMAP4_SSL] = None, store: Optional[SyncCheckpointStore] = None):
+    """Fetch, normalize and dispatch every new email in the mailbox sequentially.
+
+    \\Seen updates are collected during the cycle and stored in bulk. The
+    agent's loops use the concurrent process_mailbox_async() instead.
+    """
+    if mail is None:
+        mail = imap_manager.get()
+    select_mailbox(mail)
+    seen_flags = SeenFlagBatch(mail)
+
+    if IMAP_SYNC_MODE == "UID":
+        store = store or get_checkpoint_store()
+    else:
+        store = None
+
+    try:
+        sync_mailbox(mail, store, seen_flags)
+    finally:
+        seen_flags.flush()
+        if seen_flags.failed:
+            logger.warning(f"Could not mark {len(seen_flags.failed)} emails as seen: "
+                           f"{[int(uid) for uid in seen_flags.failed]}")
+
+
+async def run_imap(func, *args):
+    """Run a blocking IMAP call on the dedicated IMAP thread."""
+    return await asyncio.get_running_loop().run_in_executor(imap_executor, func, *args)
+
+
+def create_dispatch_client(concurrency: Optional[int] = None) -> httpx.AsyncClient:
+    """Create the pooled keep-alive client shared by all dispatches."""
+    concurrency = concurrency or DISPATCH_CONCURRENCY
+    return httpx.AsyncClient(
+        timeout=DISPATCH_TIMEOUT,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        headers={"Content-Type": "application/json"}
+    )
+
+
+async def dispatch_to_classifier_async(client: httpx.AsyncClient, email: NormalizedEmail) -> bool:
+    """Send the normalized email to the classification agent over the pooled client."""
+    try:
+        logger.info(f"Dispatching email to classifier: {CLASSIFICATION_AGENT_URL}")
+        
+        response = await client.post(CLASSIFICATION_AGENT_URL, json=email.model_dump())
+        
+        # 202: classified, routing continues in the classifier's background queue
+        if response.status_code in (200, 202):
+            logger.info("Successfully dispatched email to classifier")
+            return True
+        else:
+            logger.error(f"Classifier returned status code: {response.status_code}")
+            logger.error(f"Response: {response.text}")
+            return False
+            
+    except httpx.RequestError as e:
+        logger.error(f"Network error dispatching to classifier: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Unexpected error dispatching to classifier: {e}")
+        return False
+
+
+async def dispatch_batch_to_classifier_async(client: httpx.AsyncClient,
+                                             emails: List[NormalizedEmail]) -> List[bool]:
+    """Send a group of normalized emails to the classifier's batch endpoint.
+
+    Returns one success flag per email, in order; a failed request fails every email.
+    """
+    try:
+        logger.info(f"Dispatching batch of {len(emails)} emails to classifier: {CLASSIFICATION_BATCH_URL}")
+        
+        response = await client.post(
+            CLASSIFICATION_BATCH_URL,
+            json={"emails": [email.model_dump() for email in emails]}
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Classifier returned status code: {response.status_code}")
+            logger.error(f"Response: {response.text}")
+            return [False] * len(emails)
+        
+        results = response.json().get("results", [])
+        if len(results) != len(emails):
+            logger.error(f"Classifier returned {len(results)} results for {len(emails)} emails")
+            return [False] * len(emails)
+        
+        outcomes = [result.get("status") in ("success", "accepted") for result in results]
+        for result, accepted in zip(results, outcomes):
+            if not accepted:
+                logger.error(f"Classifier failed to process email: {result.get('error')}")
+        logger.info(f"Batch dispatched: {sum(outcomes)}/{len(emails)} emails accepted")
+        return outcomes
+            
+    except httpx.RequestError as e:
+        logger.error(f"Network error dispatching batch to classifier: {e}")
+        return [False] * len(emails)
+    except Exception as e:
+        logger.error(f"Unexpected error dispatching batch to classifier: {e}")
+        return [False] * len(emails)
+
+
+async def process_mailbox_async(mail: imaplib.IMAP4_SSL, client: httpx.AsyncClient,
+                                store: Optional[SyncCheckpointStore] = None,
+                                concurrency: Optional[int] = None):
+    """Fetch, parse and dispatch new emails as a bounded producer/consumer pipeline.
+
+    One task fetches UID batches on the IMAP thread, one parses them into
+    NormalizedEmail objects and `concurrency` workers dispatch them over the
+    pooled client, one email per request or, with CLASSIFIER_DISPATCH_MODE=BATCH,
+    up to DISPATCH_BATCH_SIZE emails per /classify/batch request. An email is flagged \\Seen (in bulk) only when its own
+    dispatch succeeded; after the first failed dispatch no emails above it are
+    dispatched this cycle, as in the sequential process_mailbox().
+    """
+    concurrency = concurrency or DISPATCH_CONCURRENCY
+    await run_imap(select_mailbox, mail)
+    if IMAP_SYNC_MODE == "UID":
+        store = store or get_checkpoint_store()
+    else:
+        store = None
+    cycle = await run_imap(SyncCycle, mail, store)
+    seen_flags = SeenFlagBatch(mail)
+
+    # Bounded queues apply backpressure to the fetch stage
+    group_size = DISPATCH_BATCH_SIZE if CLASSIFIER_DISPATCH_MODE == "BATCH" else 1
+    parse_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    dispatch_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2 * group_size)
+
+    # End-of-input markers are sent only when a stage completes. When a stage
+    # fails the TaskGroup cancels the others, and a put() on a full queue whose
+    # consumers are gone would never return.
+    async def fetch_stage():
+        for batch in chunk_uids(cycle.uids, IMAP_FETCH_BATCH_SIZE):
+            if cycle.stopped:
+                break
+            for item in cycle.fetched(batch, await run_imap(fetch_uid_batch, mail, batch)):
+                await parse_queue.put(item)
+        await parse_queue.put(None)
+
+    async def parse_stage():
+        while (item := await parse_queue.get()) is not None:
+            email_id, msg = item
+            normalized = await asyncio.to_thread(normalize_email, msg)
+            await dispatch_queue.put((email_id, normalized))
+        for _ in range(concurrency):
+            await dispatch_queue.put(None)
+
+    async def dispatch_group(items: List[Tuple[bytes, Optional[NormalizedEmail]]]):
+        # Emails above a failed one are left unflagged and above the checkpoint for the next cycle
+        items = [(email_id, normalized) for email_id, normalized in items if cycle.should_dispatch(email_id)]
+        if not items:
+            return
+        outcomes = {}
+        for email_id, normalized in items:
+            if normalized is None:
+                logger.error("Failed to normalize email, marking as seen anyway")
+                outcomes[email_id] = True
+        to_send = [(email_id, normalized) for email_id, normalized in items if normalized is not None]
+        try:
+            if CLASSIFIER_DISPATCH_MODE == "BATCH" and to_send:
+                results = await dispatch_batch_to_classifier_async(client, [n for _, n in to_send])
+                outcomes.update(zip([email_id for email_id, _ in to_send], results))
+            for email_id, normalized in to_send:
+                if email_id not in outcomes:
+                    outcomes[email_id] = await dispatch_to_classifier_async(client, normalized)
+        except Exception as e:
+            logger.error(f"Error processing emails {[int(email_id) for email_id, _ in to_send]}: {e}")
+            # Mark as seen to avoid getting stuck
+            outcomes = {email_id: True for email_id, _ in items}
+
+        for email_id, _ in items:
+            if outcomes[email_id]:
+                await run_imap(seen_flags.add, email_id)
+            cycle.record(email_id, outcomes[email_id])
+
+    async def dispatch_stage():
+        # In BATCH mode each worker drains up to DISPATCH_BATCH_SIZE parsed emails per request
+        finished = False
+        while not finished:
+            item = await dispatch_queue.get()
+            if item is None:
+                break
+            items = [item]
+            while len(items) < group_size:
+                try:
+                    item = dispatch_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                items.append(item)
+            await dispatch_group(items)
+
+    try:
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(fetch_stage())
+                tasks.create_task(parse_stage())
+                for _ in range(concurrency):
+                    tasks.create_task(dispatch_stage())
+        except ExceptionGroup as group:
+            raise group.exceptions[0]
+        cycle.finish()
+    finally:
+        await run_imap(seen_flags.flush)
+        if seen_flags.failed:
+            logger.warning(f"Could not mark {len(seen_flags.failed)} emails as seen: "
+                           f"{[int(uid) for uid in seen_flags.failed]}")
+
+
+def supports_idle(mail: imaplib.IMAP4_SSL) -> bool:
+    """Check whether the server advertised the IDLE capability (RFC 2177)."""
+    return "IDLE" in getattr(mail, "capabilities", ())
+
+
+def _input_buffered(mail: imaplib.IMAP4_SSL) -> bool:
+    """Check, without blocking, whether server data is already buffered client side."""
+    sock = mail.sock
+    if isinstance(sock, ssl.SSLSocket) and sock.pending():
+        return True
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        return bool(mail.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+
+def _read_line(mail: imaplib.IMAP4_SSL, timeout: float) -> Optional[bytes]:
+    """Read one response line, or return None if nothing arrives within timeout."""
+    if not _input_buffered(mail):
+        readable, _, _ = select.select([mail.sock], [], [], max(0.0, timeout))
+        if not readable:
+            return None
+    line = mail.readline()
+    if not line:
+        raise imaplib.IMAP4.abort("Connection closed by server during IDLE")
+    return line
+
+
+def wait_for_new_mail(mail: imaplib.IMAP4_SSL, timeout: float) -> bool:
+    """Idle on the selected mailbox until an EXISTS notification or timeout.
+
+    Returns True when the server reported new mail, False when the timeout
+    elapsed first. Either way IDLE is terminated with DONE so the connection
+    can be reused for the next fetch or IDLE. Mail announced with the
+    responses to the last cycle's FETCH, STORE or NOOP commands returns True
+    without idling, as the cycle's SEARCH may have run before it arrived.
+    """
+    if take_new_mail_notices(mail):
+        logger.info("New mail arrived during the last cycle")
+        return True
+
+    tag = mail._new_tag()
+    mail.send(tag + b" IDLE\r\n")
+    line = mail.readline()
+    if not line.startswith(b"+"):
+        raise imaplib.IMAP4.error(f"Server rejected IDLE: {line!r}")
+
+    logger.debug(f"Entered IDLE for up to {timeout} seconds")
+    new_mail = False
+    deadline = time.monotonic() + timeout
+    while not new_mail:
+        line = _read_line(mail, deadline - time.monotonic())
+        if line is None:
+            break
+        if line.startswith(b"* BYE"):
+            raise imaplib.IMAP4.abort(f"Server closed IDLE: {line!r}")
+        new_mail = bool(EXISTS_PATTERN.match(line))
+
+    # Leave IDLE and consume everything up to the tagged completion
+    mail.send(b"DONE\r\n")
+    while True:
+        line = mail.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Connection closed by server while leaving IDLE")
+        if line.startswith(tag):
+            break
+        new_mail = new_mail or bool(EXISTS_PATTERN.match(line))
+
+    if new_mail:
+        logger.info("IDLE reported new mail")
+    return new_mail
+
+
+def log_connection_stats():
+    stats = imap_manager.stats()
+    logger.info(f"IMAP session age {stats['connection_age_seconds']}s, "
+                f"{stats['reconnect_count']} reconnects, {stats['connect_failures']} failed connects")
+
+
+async def run_poll_loop():
+    """Process the mailbox every POLL_INTERVAL_SECONDS on the managed IMAP session."""
+    async with create_dispatch_client() as client:
+        while True:
+            try:
+                logger.info("Starting email poll cycle")
+                
+                if EMAIL_PROVIDER == "IMAP":
+                    # Reuses the open session; reconnects with backoff if it died
+                    mail = await run_imap(imap_manager.get)
+                    await process_mailbox_async(mail, client)
+                    log_connection_stats()
+                    
+                logger.info(f"Email poll cycle completed, waiting {POLL_INTERVAL_SECONDS} seconds...")
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+                
+            except (imaplib.IMAP4.abort, OSError) as e:
+                imap_manager.invalidate(f"IMAP connection lost: {e}")
+            except Exception as e:
+                logger.error(f"Unexpected error in main loop: {e}")
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+async def run_idle_loop():
+    """Process the mailbox whenever IDLE wakes up on the managed IMAP session.
+
+    Falls back to polling on the same connection when the server lacks IDLE.
+    """
+    warned_no_idle = False
+    async with create_dispatch_client() as client:
+        while True:
+            try:
+                mail = await run_imap(imap_manager.get)
+                await process_mailbox_async(mail, client)
+                log_connection_stats()
+
+                if supports_idle(mail):
+                    await run_imap(wait_for_new_mail, mail, IMAP_IDLE_TIMEOUT)
+                    imap_manager.mark_used()
+                else:
+                    if not warned_no_idle:
+                        logger.warning("IMAP server does not support IDLE, falling back to polling")
+                        warned_no_idle = True
+                    await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+            except (imaplib.IMAP4.abort, OSError) as e:
+                imap_manager.invalidate(f"IMAP connection lost: {e}")
+            except Exception as e:
+                logger.error(f"Unexpected error in main loop: {e}")
+                await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
 def main():
     logger.info("Starting Email Processing Agent...")
     
@@ -211,67 +926,18 @@ def main():
         return
     
     # Main loop
-    while True:
-        try:
-            logger.info("Starting email poll cycle")
-            
-            if EMAIL_PROVIDER == "IMAP":
-                # Connect to IMAP
-                mail = connect_to_imap()
-                if not mail:
-                    logger.error("Failed to connect to IMAP server, waiting before retry...")
-                    time.sleep(30)
-                    continue
-                
-                # Fetch unseen emails
-                mail.select("INBOX")
-                status, messages = mail.search(None, "UNSEEN")
-                
-                if status == "OK":
-                    email_ids = messages[0].split()
-                    logger.info(f"Found {len(email_ids)} unseen emails")
-                    
-                    for email_id in email_ids:
-                        try:
-                            # Fetch the email
-                            status, msg_data = mail.fetch(email_id, "(RFC822)")
-                            if status != "OK":
-                                continue
-                            
-                            raw_email = msg_data[0][1]
-                            msg = email.message_from_bytes(raw_email)
-                            
-                            # Normalize the email
-                            normalized = normalize_email(msg)
-                            if not normalized:
-                                logger.error("Failed to normalize email, marking as seen anyway")
-                                mark_email_as_seen(mail, email_id)
-                                continue
-                            
-                            # Dispatch to classifier
-                            if dispatch_to_classifier(normalized):
-                                # Mark as seen only after successful processing
-                                mark_email_as_seen(mail, email_id)
-                            else:
-                                logger.warning("Failed to dispatch email, will retry in next cycle")
-                                
-                        except Exception as e:
-                            logger.error(f"Error processing email {email_id}: {e}")
-                            # Mark as seen to avoid getting stuck
-                            mark_email_as_seen(mail, email_id)
-                
-                # Close connection
-                mail.logout()
-                
-            logger.info("Email poll cycle completed, waiting 30 seconds...")
-            time.sleep(30)
-            
-        except KeyboardInterrupt:
-            logger.info("Received interrupt signal, shutting down...")
-            break
-        except Exception as e:
-            logger.error(f"Unexpected error in main loop: {e}")
-            time.sleep(30)
+    try:
+        if EMAIL_PROVIDER == "IMAP" and IMAP_INGEST_MODE == "IDLE":
+            logger.info("Using IMAP IDLE push ingestion")
+            asyncio.run(run_idle_loop())
+        else:
+            asyncio.run(run_poll_loop())
+    except KeyboardInterrupt:
+        logger.info("Received interrupt signal, shutting down...")
+    finally:
+        # Closing the socket also wakes an IDLE still blocked on the IMAP thread
+        imap_manager.invalidate("shutting down")
+        imap_executor.shutdown(wait=False)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+# sync_checkpoint.py for email_processing_agent
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+class SyncCheckpointStore:
+    """Persist the (UIDVALIDITY, highest processed UID) checkpoint of each mailbox in SQLite."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS sync_checkpoints (
+                       mailbox TEXT PRIMARY KEY,
+                       uid_validity INTEGER NOT NULL,
+                       last_uid INTEGER NOT NULL,
+                       updated_at TEXT NOT NULL
+                   )"""
+            )
+
+    def get(self, mailbox: str) -> Optional[Tuple[int, int]]:
+        """Return (uid_validity, last_uid) for a mailbox, or None if it was never synced."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uid_validity, last_uid FROM sync_checkpoints WHERE mailbox = ?",
+                (mailbox,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save(self, mailbox: str, uid_validity: int, last_uid: int):
+        """Record that every UID up to last_uid has been processed."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT INTO sync_checkpoints (mailbox, uid_validity, last_uid, updated_at)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(mailbox) DO UPDATE SET
+                       uid_validity = excluded.uid_validity,
+                       last_uid = excluded.last_uid,
+                       updated_at = excluded.updated_at""",
+                (mailbox, uid_validity, last_uid, datetime.utcnow().isoformat())
+            )
+
+    def clear(self, mailbox: str):
+        """Forget a mailbox checkpoint so the next cycle runs a full resync."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sync_checkpoints WHERE mailbox = ?", (mailbox,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -3,15 +3,25 @@
 import os
 import sys
 import email
+import imaplib
+import asyncio
+import json
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 import logging
+import tempfile
+import threading
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared.models import NormalizedEmail
 
 # Import our main module
 import main
+from fake_imap_server import FakeIMAPServer, build_test_message
+from sync_checkpoint import SyncCheckpointStore
+from imap_connection import IMAPConnectionManager
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -113,6 +123,11 @@ def test_dispatch_to_classifier():
         else:
             print("✗ Failed to dispatch email")
         
+        # Accepted for background routing
+        mock_response.status_code = 202
+        assert main.dispatch_to_classifier(test_email)
+        print("✓ 202 Accepted counted as dispatched")
+        
         # Test failure case
         mock_response.status_code = 500
         mock_response.text = "Internal Server Error"
@@ -152,6 +167,555 @@ def test_imap_connection():
     return True
 
 
+def test_compress_uid_set():
+    """Test compact UID set rendering."""
+    print("\n=== Testing compress_uid_set ===")
+    
+    result = main.compress_uid_set([b'7', b'1', b'2', b'3', b'9', b'10'])
+    assert result == "1:3,7,9:10", result
+    print(f"✓ Compressed UID set: '{result}'")
+    
+    assert main.compress_uid_set([b'5']) == "5"
+    assert main.compress_uid_set([]) == ""
+    print("✓ Single and empty UID sets handled")
+    
+    return True
+
+
+def test_fetch_emails_batched():
+    """Test batched UID FETCH against the fake IMAP server."""
+    print("\n=== Testing fetch_emails_batched (fake IMAP server) ===")
+    
+    server = FakeIMAPServer().start()
+    try:
+        for i in range(25):
+            server.add_message(build_test_message(i), flags={"\\Seen"} if i % 5 == 0 else None)
+        
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        mail.login("test", "test")
+        mail.select("INBOX")
+        uids = main.search_unseen_uids(mail)
+        print(f"✓ Found {len(uids)} unseen UIDs")
+        
+        server.reset_counters()
+        fetched = list(main.fetch_emails_batched(mail, uids, batch_size=10))
+        fetch_round_trips = server.command_count("FETCH")
+        mail.logout()
+        
+        assert [uid for uid, _ in fetched] == uids
+        assert fetch_round_trips == 2, fetch_round_trips
+        print(f"✓ Fetched {len(fetched)} emails in {fetch_round_trips} UID FETCH round trips")
+        
+        normalized = main.normalize_email(fetched[0][1])
+        assert normalized.subject == "Test message 1"
+        print(f"✓ Streamed email normalized: '{normalized.subject}'")
+        
+        # BODY.PEEK[] must not flag the emails before they are dispatched
+        assert all("\\Seen" not in m["flags"] for m in server.mailbox.messages[1:5])
+        print("✓ Fetch left \\Seen flags untouched")
+        
+        # RFC 3501 lets servers send the UID after the body literal
+        server.uid_after_literal = True
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        mail.login("test", "test")
+        mail.select("INBOX")
+        fetched = main.fetch_uid_batch(mail, uids[:5])
+        mail.logout()
+        assert [uid for uid, _ in fetched] == uids[:5], [uid for uid, _ in fetched]
+        assert main.normalize_email(fetched[0][1]).subject == "Test message 1"
+        print("✓ UID sent after the body literal matched to its message")
+    finally:
+        server.stop()
+    
+    return True
+
+
+def test_idle_wait_for_new_mail():
+    """Test IDLE push notifications against the fake IMAP server."""
+    print("\n=== Testing wait_for_new_mail (IMAP IDLE) ===")
+    
+    server = FakeIMAPServer(capabilities=["IMAP4rev1", "IDLE"]).start()
+    try:
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        mail.login("test", "test")
+        main.select_mailbox(mail)
+        assert main.supports_idle(mail)
+        
+        # Inject a message while the client is idling
+        def inject():
+            while server.idle_client_count() == 0:
+                time.sleep(0.01)
+            server.add_message(build_test_message(1))
+        threading.Thread(target=inject, daemon=True).start()
+        
+        started = time.monotonic()
+        woke = main.wait_for_new_mail(mail, timeout=5)
+        elapsed = time.monotonic() - started
+        assert woke and elapsed < 2, (woke, elapsed)
+        print(f"✓ Woke on EXISTS after {elapsed:.3f}s")
+        
+        # Timeout returns False and leaves the connection usable for the next IDLE
+        assert main.wait_for_new_mail(mail, timeout=0.2) is False
+        status, _ = mail.noop()
+        assert status == "OK"
+        print("✓ IDLE timed out cleanly and connection remains usable")
+        
+        assert len(main.search_unseen_uids(mail)) == 1
+        print("✓ Injected email visible to the next fetch")
+        
+        # Mail announced with a command response outside IDLE is not missed
+        server.add_message(build_test_message(2))
+        assert mail.noop()[0] == "OK"
+        idles = server.command_count("IDLE")
+        started = time.monotonic()
+        woke = main.wait_for_new_mail(mail, timeout=5)
+        elapsed = time.monotonic() - started
+        assert woke and elapsed < 1, (woke, elapsed)
+        assert server.command_count("IDLE") == idles
+        assert main.wait_for_new_mail(mail, timeout=0.2) is False
+        print("✓ EXISTS received with a NOOP response wakes without idling")
+        mail.logout()
+    finally:
+        server.stop()
+    
+    # Servers without IDLE fall back to polling
+    server = FakeIMAPServer(capabilities=["IMAP4rev1"]).start()
+    try:
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        assert not main.supports_idle(mail)
+        print("✓ Missing IDLE capability detected (polling fallback)")
+        mail.logout()
+    finally:
+        server.stop()
+    
+    return True
+
+
+def test_incremental_uid_sync():
+    """Test checkpointed UID sync, including UIDVALIDITY resync."""
+    print("\n=== Testing incremental UID sync ===")
+    
+    server = FakeIMAPServer().start()
+    state_dir = tempfile.TemporaryDirectory()
+    store = SyncCheckpointStore(os.path.join(state_dir.name, "sync_state.db"))
+    dispatched = []
+    
+    def fake_dispatch(normalized):
+        dispatched.append(normalized.subject)
+        return True
+    
+    try:
+        server.add_message(build_test_message(1), flags={"\\Seen"})
+        server.add_message(build_test_message(2))
+        server.add_message(build_test_message(3))
+        
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        mail.login("test", "test")
+        
+        with patch('main.dispatch_to_classifier', side_effect=fake_dispatch):
+            # First run resyncs from UNSEEN and checkpoints the whole mailbox
+            main.process_mailbox(mail, store)
+            assert dispatched == ["Test message 2", "Test message 3"], dispatched
+            assert store.get("INBOX") == (1, 3)
+            print(f"✓ Initial resync dispatched {len(dispatched)} emails, checkpoint {store.get('INBOX')}")
+            
+            # A message a person opened first is still picked up by UID
+            server.add_message(build_test_message(4), flags={"\\Seen"})
+            dispatched.clear()
+            server.reset_counters()
+            main.process_mailbox(mail, store)
+            assert dispatched == ["Test message 4"], dispatched
+            assert server.command_count("SEARCH") == 1 and "UID 4:*" in server.commands[1]
+            print("✓ Already-seen new email fetched via UID 4:*")
+            
+            # Nothing new: the n:* range must not re-deliver the highest UID
+            dispatched.clear()
+            main.process_mailbox(mail, store)
+            assert dispatched == [] and store.get("INBOX") == (1, 4)
+            print("✓ Empty cycle dispatched nothing")
+        
+        # A failed UID FETCH stops the cycle without checkpointing the emails it did not return
+        server.add_message(build_test_message(5))
+        server.add_message(build_test_message(6))
+        server.fetch_failures = {5}
+        dispatched.clear()
+        with patch('main.dispatch_to_classifier', side_effect=fake_dispatch):
+            main.process_mailbox(mail, store)
+        server.fetch_failures = set()
+        assert dispatched == [] and store.get("INBOX") == (1, 4), (dispatched, store.get("INBOX"))
+        print("✓ Failed UID FETCH kept checkpoint at UID 4")
+        
+        # Failed dispatch stops the cycle without advancing the checkpoint
+        with patch('main.dispatch_to_classifier', return_value=False):
+            main.process_mailbox(mail, store)
+        assert store.get("INBOX") == (1, 4)
+        print("✓ Failed dispatch kept checkpoint at UID 4")
+        
+        # UIDVALIDITY change triggers a full resync
+        server.mailbox.uid_validity = 2
+        dispatched.clear()
+        with patch('main.dispatch_to_classifier', side_effect=fake_dispatch):
+            main.process_mailbox(mail, store)
+        assert dispatched == ["Test message 5", "Test message 6"], dispatched
+        assert store.get("INBOX") == (2, 6)
+        print(f"✓ UIDVALIDITY change resynced, checkpoint {store.get('INBOX')}")
+        mail.logout()
+    finally:
+        store.close()
+        state_dir.cleanup()
+        server.stop()
+    
+    return True
+
+
+def test_checkpoint_after_failure():
+    """Test that the checkpoint still covers handled UIDs below a failed one."""
+    print("\n=== Testing checkpoint after a failed email ===")
+
+    server = FakeIMAPServer().start()
+    state_dir = tempfile.TemporaryDirectory()
+    store = SyncCheckpointStore(os.path.join(state_dir.name, "sync_state.db"))
+
+    async def run_cycle(mail):
+        async with main.create_dispatch_client(4) as client:
+            await main.process_mailbox_async(mail, client, store, concurrency=4)
+
+    try:
+        for i in range(1, 6):
+            server.add_message(build_test_message(i))
+        store.save("INBOX", 1, 0)
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        mail.login("test", "test")
+        mail.select("INBOX")
+
+        # Concurrent dispatches finishing out of order: UID 3 fails first
+        cycle = main.SyncCycle(mail, store)
+        cycle.record(b"3", False)
+        for uid in (b"1", b"2", b"4", b"5"):
+            cycle.record(uid, True)
+        cycle.finish()
+        assert store.get("INBOX") == (1, 2), store.get("INBOX")
+        assert not cycle.should_dispatch(b"4") and cycle.should_dispatch(b"2")
+        print("✓ UID 3 failing first still checkpointed UIDs 1-2")
+
+        # The pipeline keeps dispatching below a failed FETCH and checkpoints up to it
+        server.fetch_failures = {5}
+        with patch('main.IMAP_SYNC_MODE', "UID"), patch('main.IMAP_FETCH_BATCH_SIZE', 1), \
+             patch('main.dispatch_to_classifier_async', side_effect=lambda client, n: asyncio.sleep(0, True)):
+            asyncio.run(run_cycle(mail))
+        server.fetch_failures = set()
+        assert store.get("INBOX") == (1, 4), store.get("INBOX")
+        assert "\\Seen" in server.mailbox.messages[3]["flags"]
+        assert "\\Seen" not in server.mailbox.messages[4]["flags"]
+        print(f"✓ Failed FETCH of UID 5 checkpointed up to UID 4, UID 5 left for the next cycle")
+        mail.logout()
+    finally:
+        store.close()
+        state_dir.cleanup()
+        server.stop()
+
+    return True
+
+
+def test_imap_connection_manager():
+    """Test session reuse, NOOP keepalive and reconnect backoff."""
+    print("\n=== Testing IMAPConnectionManager ===")
+    
+    server = FakeIMAPServer().start()
+    failures_left = [2]
+    sleeps = []
+    
+    def connect():
+        if failures_left[0]:
+            failures_left[0] -= 1
+            return None
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        mail.login("test", "test")
+        return mail
+    
+    try:
+        manager = IMAPConnectionManager(connect, keepalive_interval=60, backoff_base=1.0,
+                                        backoff_max=10.0, sleep=sleeps.append)
+        
+        # Two failed connects are retried with growing, jittered delays
+        first = manager.get()
+        assert len(sleeps) == 2 and 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0, sleeps
+        print(f"✓ Connected after backoff delays {[round(d, 2) for d in sleeps]}")
+        
+        # Sessions are reused across cycles
+        assert manager.get() is first and server.command_count("LOGIN") == 1
+        print("✓ Session reused without a new LOGIN")
+        
+        # Idle sessions are verified with NOOP before reuse
+        manager.keepalive_interval = 0
+        assert manager.get() is first and server.command_count("NOOP") == 1
+        print("✓ Idle session checked with NOOP")
+        
+        # A dead session is replaced transparently
+        first.shutdown()
+        second = manager.get()
+        assert second is not first
+        stats = manager.stats()
+        assert stats["reconnect_count"] == 1 and stats["connect_failures"] == 2
+        assert stats["connection_age_seconds"] is not None
+        print(f"✓ Reconnected after dead session: {stats}")
+        
+        # The fetch and flag helpers take their session from the manager
+        server.add_message(build_test_message(1))
+        with patch('main.imap_manager', manager):
+            emails = main.fetch_unseen_emails_imap()
+            main.mark_email_as_seen(None, b"1")
+        assert len(emails) == 1 and "\\Seen" in server.mailbox.messages[0]["flags"]
+        print("✓ Fetch and mark-as-seen used the managed session")
+        manager.close()
+    finally:
+        server.stop()
+    
+    return True
+
+
+def test_bulk_seen_flags():
+    """Test bulk UID STORE with per-UID failure isolation."""
+    print("\n=== Testing bulk \\Seen flag updates ===")
+    
+    server = FakeIMAPServer().start()
+    try:
+        for i in range(10):
+            server.add_message(build_test_message(i))
+        server.store_failures.add(4)
+        
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        mail.login("test", "test")
+        
+        with patch('main.dispatch_to_classifier', return_value=True), \
+             patch('main.IMAP_SYNC_MODE', "UNSEEN"):
+            server.reset_counters()
+            main.process_mailbox(mail)
+        
+        stores = [c for c in server.commands if " STORE " in c]
+        # One bulk STORE, rejected because of UID 4, then one retry per UID
+        assert "UID STORE 1:10 +FLAGS.SILENT" in stores[0], stores
+        assert len(stores) == 11, stores
+        flagged = [m["uid"] for m in server.mailbox.messages if "\\Seen" in m["flags"]]
+        assert flagged == [1, 2, 3, 5, 6, 7, 8, 9, 10], flagged
+        print(f"✓ Bulk STORE fell back per UID, only UID 4 left unseen")
+        
+        # Without failures a cycle needs a single STORE
+        server.store_failures.clear()
+        for i in range(10, 20):
+            server.add_message(build_test_message(i))
+        with patch('main.dispatch_to_classifier', return_value=True), \
+             patch('main.IMAP_SYNC_MODE', "UNSEEN"):
+            server.reset_counters()
+            main.process_mailbox(mail)
+        assert server.command_count("STORE") == 1, server.commands
+        print(f"✓ 11 emails flagged with one STORE ({server.command_count()} round trips per cycle)")
+        mail.logout()
+    finally:
+        server.stop()
+    
+    return True
+
+
+class SlowClassifierHandler(BaseHTTPRequestHandler):
+    """Classifier stand-in that takes 100 ms per email and tracks concurrency."""
+    
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    fail_subjects = set()
+    
+    def do_POST(self):
+        cls = SlowClassifierHandler
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(0.1)
+        with cls.lock:
+            cls.in_flight -= 1
+        status = 500 if payload['subject'] in cls.fail_subjects else 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class BatchClassifierHandler(BaseHTTPRequestHandler):
+    """Classifier stand-in for /classify/batch taking 50 ms per request."""
+    
+    batch_sizes = []
+    fail_subjects = set()
+    # Answered as routed; the rest as accepted for background routing
+    sync_subjects = set()
+    
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        BatchClassifierHandler.batch_sizes.append(len(payload['emails']))
+        time.sleep(0.05)
+        results = [
+            {"status": "error", "error": "LLM failure"}
+            if email['subject'] in BatchClassifierHandler.fail_subjects
+            else {"status": "success", "classification": {}, "routed": True}
+            if email['subject'] in BatchClassifierHandler.sync_subjects
+            else {"status": "accepted", "tracking_id": email['subject'], "classification": {}, "routed": False}
+            for email in payload['emails']
+        ]
+        body = json.dumps({"results": results}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def test_async_dispatch_pipeline():
+    """Test the bounded-concurrency fetch/parse/dispatch pipeline."""
+    print("\n=== Testing process_mailbox_async ===")
+    
+    server = FakeIMAPServer().start()
+    classifier = ThreadingHTTPServer(('127.0.0.1', 0), SlowClassifierHandler)
+    threading.Thread(target=classifier.serve_forever, daemon=True).start()
+    main.CLASSIFICATION_AGENT_URL = f"http://127.0.0.1:{classifier.server_address[1]}/classify"
+    SlowClassifierHandler.fail_subjects = {"Test message 7"}
+    
+    async def run_cycle(mail):
+        async with main.create_dispatch_client(5) as client:
+            await main.process_mailbox_async(mail, client, concurrency=5)
+    
+    try:
+        for i in range(20):
+            server.add_message(build_test_message(i))
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        mail.login("test", "test")
+        
+        with patch('main.IMAP_SYNC_MODE', "UNSEEN"):
+            started = time.monotonic()
+            asyncio.run(run_cycle(mail))
+            elapsed = time.monotonic() - started
+        
+        assert 2 <= SlowClassifierHandler.max_in_flight <= 5, SlowClassifierHandler.max_in_flight
+        assert elapsed < 1.5, elapsed
+        print(f"✓ Dispatched with up to {SlowClassifierHandler.max_in_flight} in flight in {elapsed:.2f}s")
+        
+        unseen = [m["uid"] for m in server.mailbox.messages if "\\Seen" not in m["flags"]]
+        assert 8 in unseen and 1 in [m["uid"] for m in server.mailbox.messages if "\\Seen" in m["flags"]]
+        assert server.command_count("STORE") <= 2
+        print(f"✓ Failed dispatch left unflagged: {unseen} ({server.command_count('STORE')} STORE)")
+        
+        # Next cycle retries the remaining emails once the classifier recovers
+        SlowClassifierHandler.fail_subjects = set()
+        with patch('main.IMAP_SYNC_MODE', "UNSEEN"):
+            asyncio.run(run_cycle(mail))
+        assert all("\\Seen" in m["flags"] for m in server.mailbox.messages)
+        print("✓ Remaining emails dispatched and flagged on the next cycle")
+        
+        # A connection lost mid-cycle, with the dispatch queue full, ends the cycle with the error
+        for i in range(40):
+            server.add_message(build_test_message(100 + i))
+        fetch_uid_batch = main.fetch_uid_batch
+        fetches = []
+        
+        def aborting_fetch(mail, batch):
+            fetches.append(batch)
+            if len(fetches) == 3:
+                raise imaplib.IMAP4.abort("connection lost")
+            return fetch_uid_batch(mail, batch)
+        
+        async def aborted_cycle():
+            async with main.create_dispatch_client(2) as client:
+                await main.process_mailbox_async(mail, client, concurrency=2)
+        
+        errors = []
+        
+        def run_aborted_cycle():
+            try:
+                asyncio.run(aborted_cycle())
+            except Exception as e:
+                errors.append(e)
+        
+        with patch('main.IMAP_SYNC_MODE', "UNSEEN"), patch('main.IMAP_FETCH_BATCH_SIZE', 5), \
+             patch('main.fetch_uid_batch', aborting_fetch):
+            started = time.monotonic()
+            # A hung cycle must fail the test rather than hang the suite
+            runner = threading.Thread(target=run_aborted_cycle, daemon=True)
+            runner.start()
+            runner.join(10)
+        assert not runner.is_alive(), "cycle hung after the aborted FETCH"
+        assert len(errors) == 1 and isinstance(errors[0], imaplib.IMAP4.abort), errors
+        print(f"✓ FETCH aborted mid-cycle: cycle ended with the error after {time.monotonic() - started:.2f}s")
+        mail.logout()
+    finally:
+        classifier.shutdown()
+        server.stop()
+    
+    return True
+
+
+def test_batch_dispatch_mode():
+    """Test CLASSIFIER_DISPATCH_MODE=BATCH against a /classify/batch stand-in."""
+    print("\n=== Testing batch dispatch mode ===")
+    
+    server = FakeIMAPServer().start()
+    classifier = ThreadingHTTPServer(('127.0.0.1', 0), BatchClassifierHandler)
+    threading.Thread(target=classifier.serve_forever, daemon=True).start()
+    
+    async def run_cycle(mail):
+        async with main.create_dispatch_client(2) as client:
+            await main.process_mailbox_async(mail, client, concurrency=2)
+    
+    batch_mode = [
+        patch('main.IMAP_SYNC_MODE', "UNSEEN"),
+        patch('main.CLASSIFIER_DISPATCH_MODE', "BATCH"),
+        patch('main.DISPATCH_BATCH_SIZE', 10),
+        patch('main.CLASSIFICATION_BATCH_URL',
+              f"http://127.0.0.1:{classifier.server_address[1]}/classify/batch")
+    ]
+    
+    try:
+        for i in range(30):
+            server.add_message(build_test_message(i))
+        mail = imaplib.IMAP4("127.0.0.1", server.port)
+        mail.login("test", "test")
+        
+        # Half of the emails come back routed, the rest accepted for background routing
+        BatchClassifierHandler.sync_subjects = {f"Test message {i}" for i in range(0, 30, 2)}
+        for p in batch_mode:
+            p.start()
+        try:
+            asyncio.run(run_cycle(mail))
+            sizes = BatchClassifierHandler.batch_sizes
+            assert sum(sizes) == 30 and max(sizes) <= 10 and len(sizes) < 30, sizes
+            assert all("\\Seen" in m["flags"] for m in server.mailbox.messages)
+            print(f"✓ 30 emails sent in {len(sizes)} batch requests {sizes}, routed and accepted both flagged")
+            
+            # A per-item error leaves only that email unflagged
+            for i in range(30, 35):
+                server.add_message(build_test_message(i))
+            BatchClassifierHandler.fail_subjects = {"Test message 33"}
+            asyncio.run(run_cycle(mail))
+        finally:
+            for p in batch_mode:
+                p.stop()
+        
+        unseen = [m["uid"] for m in server.mailbox.messages if "\\Seen" not in m["flags"]]
+        assert 34 in unseen and 31 not in unseen, unseen
+        print(f"✓ Per-item failure left its email unflagged: {unseen}")
+        mail.logout()
+    finally:
+        classifier.shutdown()
+        server.stop()
+    
+    return True
+
+
 def run_all_tests():
     """Run all test functions."""
     print("=== Email Processing Agent Test Suite ===")
@@ -161,7 +725,16 @@ def run_all_tests():
         test_get_email_body,
         test_normalize_email,
         test_dispatch_to_classifier,
-        test_imap_connection
+        test_imap_connection,
+        test_compress_uid_set,
+        test_fetch_emails_batched,
+        test_idle_wait_for_new_mail,
+        test_incremental_uid_sync,
+        test_checkpoint_after_failure,
+        test_imap_connection_manager,
+        test_bulk_seen_flags,
+        test_async_dispatch_pipeline,
+        test_batch_dispatch_mode
     ]
     
     passed = 0
@@ -1,6 +1,7 @@
 # main.py for info_retrieval_agent
 from fastapi import FastAPI
 from pydantic import BaseModel
+from typing import List
 import os
 from dotenv import load_dotenv
 
@@ -18,6 +19,20 @@ async def handle_inquiry(email: EmailData):
     # TODO: Implement info retrieval logic
     return {"status": "inquiry handled"}
 
+class EmailBatch(BaseModel):
+    emails: List[EmailData]
+
+@app.post("/handle_inquiry/batch")
+async def handle_inquiry_batch(batch: EmailBatch):
+    """Handle several emails in one request; one result per email, in order."""
+    print(f"Handling {len(batch.emails)} info retrieval requests...")
+    return {"results": [await handle_inquiry(email) for email in batch.emails]}
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint."""
+    return {"status": "healthy", "agent": "info_retrieval"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8005)
@@ -1,6 +1,7 @@
 # main.py for invoice_handler_agent
 from fastapi import FastAPI
 from pydantic import BaseModel
+from typing import List
 import os
 from dotenv import load_dotenv
 
@@ -18,6 +19,20 @@ async def handle_invoice(email: EmailData):
     # TODO: Implement invoice handling logic
     return {"status": "invoice handled"}
 
+class EmailBatch(BaseModel):
+    emails: List[EmailData]
+
+@app.post("/handle_invoice/batch")
+async def handle_invoice_batch(batch: EmailBatch):
+    """Handle several emails in one request; one result per email, in order."""
+    print(f"Handling {len(batch.emails)} invoice requests...")
+    return {"results": [await handle_invoice(email) for email in batch.emails]}
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint."""
+    return {"status": "healthy", "agent": "invoice_handler"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8003)
@@ -1,6 +1,7 @@
 # main.py for scheduler_agent
 from fastapi import FastAPI
 from pydantic import BaseModel
+from typing import List
 import os
 from dotenv import load_dotenv
 
@@ -18,6 +19,20 @@ async def handle_schedule(email: EmailData):
     # TODO: Implement scheduling logic
     return {"status": "schedule handled"}
 
+class EmailBatch(BaseModel):
+    emails: List[EmailData]
+
+@app.post("/handle_schedule/batch")
+async def handle_schedule_batch(batch: EmailBatch):
+    """Handle several emails in one request; one result per email, in order."""
+    print(f"Handling {len(batch.emails)} scheduling requests...")
+    return {"results": [await handle_schedule(email) for email in batch.emails]}
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint."""
+    return {"status": "healthy", "agent": "scheduler"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8004)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark: accept throughput and drain rate of the durable routing queue.
+
+Accepting is measured the way /route uses the queue: `--clients`
+concurrent producers each put() one classified-email-sized payload at a
+time and wait for its commit, so concurrent puts share commits (group
+commit). A sequential producer, one commit per payload, is measured for
+comparison. Each run is repeated for every SQLite synchronous setting.
+Draining delivers the accepted messages to a no-op handler with the
+configured workers and batch size.
+
+    python benchmark_queue.py --messages 20000 --clients 200 --synchronous FULL,NORMAL
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from durable_queue import DurableQueue
+
+
+def sample_payload(number: int) -> dict:
+    """A classified email of typical size."""
+    return {
+        "original_email": {
+            "sender": f"client{number}@example.com",
+            "subject": f"Invoice {number} for October",
+            "body": "Hello, please find attached the invoice for last month's services. " * 8,
+            "received_time": "2026-10-01T09:00:00Z",
+        },
+        "classification": {"workflow_type": "InvoiceRequest", "confidence_score": 0.97},
+    }
+
+
+async def no_op(payloads):
+    return [None] * len(payloads)
+
+
+async def accept(queue: DurableQueue, messages: int, clients: int) -> float:
+    payloads = [sample_payload(number) for number in range(messages)]
+    next_payload = iter(payloads)
+
+    async def producer():
+        for payload in next_payload:
+            await queue.put(payload)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(producer() for _ in range(clients)))
+    return time.perf_counter() - started
+
+
+async def drain(queue: DurableQueue, messages: int) -> float:
+    started = time.perf_counter()
+    await queue.start()
+    while queue.delivered < messages:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await queue.stop()
+    return elapsed
+
+
+async def run(directory: str, synchronous: str, messages: int, clients: int, workers: int, batch_size: int) -> dict:
+    path = os.path.join(directory, f"queue-{synchronous.lower()}-{clients}.db")
+    queue = DurableQueue(path, no_op, workers=workers, batch_size=batch_size, synchronous=synchronous)
+    await queue.open()
+    accept_seconds = await accept(queue, messages, clients)
+    commits = queue.commits
+    drain_seconds = await drain(queue, messages)
+    return {
+        "synchronous": synchronous,
+        "clients": clients,
+        "messages": messages,
+        "accept_per_second": round(messages / accept_seconds),
+        "messages_per_commit": round(messages / commits, 1),
+        "drain_per_second": round(messages / drain_seconds),
+    }
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=200, help="Concurrent producers")
+    parser.add_argument("--sequential-messages", type=int, default=2000,
+                        help="Messages for the single-producer comparison run")
+    parser.add_argument("--synchronous", default="FULL,NORMAL", help="Comma-separated SQLite synchronous settings")
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dir", help="Where to write the databases (default: a temporary directory)")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="queue-bench-")
+    os.makedirs(directory, exist_ok=True)
+    rows = []
+    try:
+        for synchronous in args.synchronous.split(","):
+            for messages, clients in ((args.messages, args.clients), (args.sequential_messages, 1)):
+                rows.append(asyncio.run(run(directory, synchronous.strip().upper(), messages, clients,
+                                            args.workers, args.batch_size)))
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'synchronous':>11} {'clients':>8} {'messages':>9} {'accept/s':>9} {'per commit':>11} {'drain/s':>8}")
+    for row in rows:
+        print(f"{row['synchronous']:>11} {row['clients']:>8} {row['messages']:>9} {row['accept_per_second']:>9} "
+              f"{row['messages_per_commit']:>11} {row['drain_per_second']:>8}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
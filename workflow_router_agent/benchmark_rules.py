@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Benchmark: routing rule lookup latency as the rules file grows.
+
+For each size a synthetic rules file is compiled: mostly sender domain
+rules, some with confidence bands, plus subject pattern rules that apply
+to every sender (the worst case for the index, since each lookup runs
+their combined regex). Lookups are timed for synthetic emails, half from
+domains with rules, and every decision is checked against a plain
+first-match scan of the rules.
+
+    python benchmark_rules.py --sizes 10,100,1000,5000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.models import ClassifiedEmail
+from routing_rules import RuleSet, domain_suffixes, sender_domain
+
+WORKFLOW_TYPES = ["InvoiceRequest", "AppointmentBooking", "NewClientInquiry", "HumanReview"]
+WORDS = ["invoice", "meeting", "overdue", "contract", "refund", "urgent", "schedule", "quote",
+         "complaint", "renewal", "payment", "question", "booking", "legal", "statement"]
+
+
+def synthetic_rules(rng: random.Random, size: int, subject_share: float) -> dict:
+    rules = []
+    for number in range(size):
+        rule = {"name": f"rule {number}", "route_to": rng.choice(WORKFLOW_TYPES)}
+        if rng.random() < subject_share:
+            rule["subject"] = rf"\b{rng.choice(WORDS)}[- ]?{number}\b"
+        else:
+            rule["sender_domain"] = f"client{number}.example.com"
+            if rng.random() < 0.3:
+                rule["workflow_type"] = rng.choice(WORKFLOW_TYPES)
+            if rng.random() < 0.3:
+                rule["max_confidence"] = round(rng.uniform(0.5, 0.9), 2)
+        rules.append(rule)
+    return {"rules": rules}
+
+
+def synthetic_email(rng: random.Random, size: int) -> ClassifiedEmail:
+    number = rng.randrange(size * 2)
+    subject = f"{rng.choice(WORDS)} {rng.randrange(size * 2)} about {rng.choice(WORDS)} for account {number}"
+    return ClassifiedEmail.model_validate({
+        "original_email": {"sender": f"Someone <someone@mail.client{number}.example.com>", "subject": subject,
+                           "body": "", "received_time": "2026-10-01T09:00:00Z"},
+        "classification": {"workflow_type": rng.choice(WORKFLOW_TYPES),
+                           "confidence_score": round(rng.uniform(0.3, 1.0), 2)},
+    })
+
+
+def linear_match(document: dict, email: ClassifiedEmail):
+    """Name of the first rule that applies, checking each rule in turn."""
+    suffixes = set(domain_suffixes(sender_domain(email.original_email.sender)))
+    classification = email.classification
+    for rule in document["rules"]:
+        if "sender_domain" in rule and rule["sender_domain"] not in suffixes:
+            continue
+        if "workflow_type" in rule and rule["workflow_type"] != classification.workflow_type:
+            continue
+        if "subject" in rule and not re.search(rule["subject"], email.original_email.subject, re.IGNORECASE):
+            continue
+        if classification.confidence_score >= rule.get("max_confidence", float("inf")):
+            continue
+        return rule["name"]
+    return None
+
+
+def percentile(values, quantile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,5000", help="Comma-separated rule counts")
+    parser.add_argument("--subject-share", type=float, default=0.2, help="Share of rules matching on the subject")
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    rows = []
+    for size in map(int, args.sizes.split(",")):
+        rng = random.Random(args.seed)
+        document = synthetic_rules(rng, size, args.subject_share)
+        started = time.perf_counter()
+        rules = RuleSet(document, WORKFLOW_TYPES)
+        compile_seconds = time.perf_counter() - started
+        emails = [synthetic_email(rng, size) for _ in range(args.lookups)]
+
+        latencies, decisions = [], []
+        for email in emails:
+            started = time.perf_counter()
+            rule = rules.match(email)
+            latencies.append(time.perf_counter() - started)
+            decisions.append(rule.name if rule else None)
+        started = time.perf_counter()
+        expected = [linear_match(document, email) for email in emails]
+        linear_seconds = time.perf_counter() - started
+
+        rows.append({
+            "rules": size,
+            "compile_ms": round(compile_seconds * 1000, 1),
+            "p50_us": round(percentile(latencies, 0.50) * 1e6, 1),
+            "p99_us": round(percentile(latencies, 0.99) * 1e6, 1),
+            "linear_mean_us": round(linear_seconds / len(emails) * 1e6, 1),
+            "matched": sum(decision is not None for decision in decisions) / len(decisions),
+            "agreement": sum(a == b for a, b in zip(decisions, expected)) / len(decisions),
+        })
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'rules':>6} {'compile ms':>11} {'p50 us':>8} {'p99 us':>8} {'linear us':>10} {'matched':>8} {'agreement':>10}")
+    for row in rows:
+        print(f"{row['rules']:>6} {row['compile_ms']:>11} {row['p50_us']:>8} {row['p99_us']:>8} "
+              f"{row['linear_mean_us']:>10} {row['matched']:>8.1%} {row['agreement']:>10.1%}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
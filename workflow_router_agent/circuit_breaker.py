@@ -0,0 +1,211 @@
+# circuit_breaker.py for workflow_router_agent
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The destination's circuit is open; the call was not attempted."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit for {name} is open (next trial in {retry_in:.1f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker for one destination.
+
+    Closed: calls go through and the outcomes of the last `window` calls are
+    kept. Once at least `min_calls` are recorded and the share of failures
+    reaches `failure_rate`, or the share of calls slower than `slow_call`
+    seconds reaches `slow_call_rate`, the circuit opens.
+
+    Open: calls are rejected without being attempted. After `open_duration`
+    seconds the circuit becomes half-open, unless health probes keep
+    failing. A circuit opened by failed probes becomes half-open as soon as
+    a probe succeeds again.
+
+    Half-open: up to `half_open_calls` trial calls go through. If they all
+    succeed in time the circuit closes, and any failure opens it again.
+
+    `probe_failures` consecutive failed health probes open a closed circuit
+    before any call has to time out.
+    """
+
+    def __init__(self, name: str, failure_rate: float = 0.5, slow_call: float = 5.0,
+                 slow_call_rate: float = 0.8, window: int = 20, min_calls: int = 5,
+                 open_duration: float = 30.0, half_open_calls: int = 1, probe_failures: int = 2,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self.probe_failures = probe_failures
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._opened_by_probe = False
+        self._trials_started = 0
+        self._trials_succeeded = 0
+        self._probe_failure_streak = 0
+        self.last_probe: Optional[dict] = None
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _transition(self, state: str, reason: str, by_probe: bool = False):
+        if state == self.state:
+            return
+        log = logger.warning if state == OPEN else logger.info
+        log(f"Circuit for {self.name}: {self.state} -> {state} ({reason})")
+        self.state = state
+        if state == OPEN:
+            self._opened_at = self._clock()
+            self._opened_by_probe = by_probe
+            self.times_opened += 1
+        if state == HALF_OPEN:
+            self._trials_started = self._trials_succeeded = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+
+    def _retry_in(self) -> float:
+        return max(0.0, self._opened_at + self.open_duration - self._clock())
+
+    def available(self) -> bool:
+        """Whether a call would be let through now, without taking a half-open trial slot."""
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN:
+            return self._trials_started < self.half_open_calls
+        return self._retry_in() == 0 and self._probe_failure_streak == 0
+
+    def allow_request(self) -> bool:
+        """Whether a call may be attempted now; counts it as a trial when half-open."""
+        if self.state == OPEN and self._retry_in() == 0 and self._probe_failure_streak == 0:
+            self._transition(HALF_OPEN, f"open for {self.open_duration:.0f}s")
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self._trials_started < self.half_open_calls:
+            self._trials_started += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may be attempted now."""
+        if not self.allow_request():
+            raise CircuitOpenError(self.name, self._retry_in())
+
+    def record(self, succeeded: bool, latency: float):
+        """Record the outcome of an attempted call."""
+        slow = latency >= self.slow_call
+        if self.state == HALF_OPEN:
+            if not succeeded or slow:
+                self._transition(OPEN, "trial call failed" if not succeeded else f"trial call took {latency:.1f}s")
+                return
+            self._trials_succeeded += 1
+            if self._trials_succeeded >= self.half_open_calls:
+                self._transition(CLOSED, "trial calls succeeded")
+            return
+        if self.state == OPEN:
+            # A call admitted before the circuit opened
+            return
+
+        self._outcomes.append((not succeeded, slow))
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = sum(failed for failed, _ in self._outcomes) / len(self._outcomes)
+        slow_calls = sum(slow for _, slow in self._outcomes) / len(self._outcomes)
+        if failures >= self.failure_rate:
+            self._transition(OPEN, f"{failures:.0%} of the last {len(self._outcomes)} calls failed")
+        elif slow_calls >= self.slow_call_rate:
+            self._transition(OPEN, f"{slow_calls:.0%} of the last {len(self._outcomes)} calls "
+                                   f"took {self.slow_call:.1f}s or more")
+
+    def record_probe(self, healthy: bool, latency: float, error: Optional[str] = None):
+        """Record a background health probe of the destination."""
+        self.last_probe = {"healthy": healthy, "latency_ms": round(latency * 1000, 1),
+                           "error": error, "at": time.time()}
+        if healthy:
+            self._probe_failure_streak = 0
+            if self.state == OPEN and self._opened_by_probe:
+                self._transition(HALF_OPEN, "health probe succeeded")
+            return
+        self._probe_failure_streak += 1
+        if self.state == OPEN:
+            # Keep the circuit open while the destination is known to be down
+            self._opened_at = self._clock()
+        elif self._probe_failure_streak >= self.probe_failures:
+            self._transition(OPEN, f"{self._probe_failure_streak} health probes failed", by_probe=True)
+
+    def stats(self) -> dict:
+        outcomes = len(self._outcomes)
+        return {
+            "state": self.state,
+            "recent_calls": outcomes,
+            "failure_rate": round(sum(f for f, _ in self._outcomes) / outcomes, 4) if outcomes else None,
+            "slow_call_rate": round(sum(s for _, s in self._outcomes) / outcomes, 4) if outcomes else None,
+            "retry_in": round(self._retry_in(), 3) if self.state == OPEN else None,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "probe_failure_streak": self._probe_failure_streak,
+            "last_probe": self.last_probe,
+        }
+
+
+class HealthProber:
+    """Probe each destination every `interval` seconds in the background and tell its breaker.
+
+    `probe(url)` returns None when the destination is healthy or an error
+    description otherwise.
+    """
+
+    def __init__(self, breakers: Dict[str, CircuitBreaker], probe: Callable[[str], Awaitable[Optional[str]]],
+                 interval: float = 5.0):
+        self.breakers = breakers
+        self.probe = probe
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+
+    async def probe_all(self):
+        async def probe_one(url: str, breaker: CircuitBreaker):
+            started = time.perf_counter()
+            try:
+                error = await self.probe(url)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            breaker.record_probe(error is None, time.perf_counter() - started, error)
+
+        await asyncio.gather(*(probe_one(url, breaker) for url, breaker in self.breakers.items()))
+        self.rounds += 1
+
+    async def _run(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0 and self.breakers:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
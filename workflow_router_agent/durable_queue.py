@@ -0,0 +1,364 @@
+# durable_queue.py for workflow_router_agent
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tracking_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    leased_until REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_due ON messages (next_attempt);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tracking_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    created REAL NOT NULL,
+    failed_at REAL NOT NULL,
+    last_error TEXT
+);
+"""
+
+
+class PoisonMessage(Exception):
+    """A message that can never be delivered; it goes to the dead letters without retries."""
+
+
+class DurableQueue:
+    """Delivery queue persisted in SQLite (WAL mode) before anything is forwarded.
+
+    put() returns once the payload is committed. Payloads put while a commit
+    is in progress are written together by the next one (group commit), so
+    concurrent requests share the cost of a sync to disk.
+
+    A dispatcher claims due messages in batches of up to `batch_size`,
+    leasing them for `lease` seconds, and passes their payloads to
+    `deliver`, at most `workers` batches at a time. `deliver(payloads)`
+    returns None for each delivered payload and the exception for each
+    failed one. Failed messages are retried with full-jitter exponential
+    backoff; after `max_attempts`, or at once when the error is a
+    PoisonMessage, they move to the dead letters, from which replay()
+    puts them back. Messages claimed by a process that died are delivered
+    again when their lease runs out, so delivery is at least once.
+
+    `synchronous` is SQLite's synchronous setting: "FULL" syncs every
+    commit, "NORMAL" keeps commits across process crashes but may lose the
+    last ones on power loss.
+    """
+
+    def __init__(self, path: str, deliver: Callable[[List[Any]], Awaitable[List[Optional[Exception]]]],
+                 workers: int = 10, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 lease: float = 120.0, batch_size: int = 100, poll_interval: float = 0.5,
+                 synchronous: str = "FULL"):
+        if synchronous.upper() not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError(f"Unknown synchronous setting {synchronous!r}")
+        self.path = path
+        self.deliver = deliver
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.synchronous = synchronous.upper()
+        # One thread owns the connection; every statement runs there, in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="durable-queue")
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending: List[tuple] = []
+        self._flushing = False
+        self._wake: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._deliveries: Dict[asyncio.Task, List[int]] = {}
+        self.accepted = 0
+        self.commits = 0
+        self.delivered = 0
+        self.retries = 0
+        self.dead_lettered = 0
+
+    async def _run(self, fn: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open(self):
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(f"PRAGMA synchronous={self.synchronous}")
+        db.execute("PRAGMA busy_timeout=5000")
+        db.executescript(SCHEMA)
+        self._db = db
+
+    def _close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def open(self):
+        """Open (creating if needed) the database without starting delivery."""
+        if self._db is None:
+            await self._run(self._open)
+
+    async def start(self):
+        await self.open()
+        if self._dispatcher is None:
+            self._wake = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.workers)
+            self._dispatcher = asyncio.create_task(self._dispatch())
+            logger.info(f"Durable queue {self.path} started with {self.workers} workers")
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop claiming, wait up to `timeout` seconds for deliveries in progress, then close.
+
+        Deliveries still running are cancelled and their messages released,
+        to be delivered again on the next start.
+        """
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        if self._deliveries:
+            await asyncio.wait(list(self._deliveries), timeout=timeout)
+        unfinished = [ids for task, ids in self._deliveries.items() if not task.done()]
+        for task in list(self._deliveries):
+            task.cancel()
+        await asyncio.gather(*self._deliveries, return_exceptions=True)
+        if unfinished:
+            logger.warning(f"Durable queue stopped with {sum(map(len, unfinished))} messages in delivery")
+            await self._run(self._release, [i for ids in unfinished for i in ids])
+        while self._flushing or self._pending:
+            await asyncio.sleep(0.01)
+        await self._run(self._close)
+
+    # Accepting
+
+    def _insert(self, rows: List[tuple]):
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO messages (tracking_id, payload, next_attempt, created) VALUES (?, ?, ?, ?)", rows
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    async def _flush(self):
+        try:
+            while self._pending:
+                pending, self._pending = self._pending, []
+                try:
+                    await self._run(self._insert, [row for rows, _ in pending for row in rows])
+                except Exception as e:
+                    for _, future in pending:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.commits += 1
+                for rows, future in pending:
+                    self.accepted += len(rows)
+                    if not future.done():
+                        future.set_result(None)
+                if self._wake is not None:
+                    self._wake.set()
+        finally:
+            self._flushing = False
+
+    async def put_many(self, payloads: Sequence[Any]) -> List[str]:
+        """Persist JSON-serializable payloads for delivery and return their tracking ids."""
+        if self._db is None:
+            raise RuntimeError("Durable queue is not open")
+        now = time.time()
+        rows = [(uuid.uuid4().hex, json.dumps(payload), now, now) for payload in payloads]
+        if not rows:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((rows, future))
+        if not self._flushing:
+            self._flushing = True
+            asyncio.create_task(self._flush())
+        await future
+        return [row[0] for row in rows]
+
+    async def put(self, payload: Any) -> str:
+        """Persist one payload for delivery and return its tracking id."""
+        return (await self.put_many([payload]))[0]
+
+    # Delivering
+
+    def retry_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _claim(self) -> List[tuple]:
+        now = time.time()
+        return self._db.execute(
+            "UPDATE messages SET leased_until = ?, attempts = attempts + 1 WHERE id IN ("
+            " SELECT id FROM messages WHERE next_attempt <= ? AND leased_until <= ?"
+            " ORDER BY next_attempt LIMIT ?"
+            ") RETURNING id, tracking_id, payload, attempts",
+            (now + self.lease, now, now, self.batch_size)
+        ).fetchall()
+
+    def _release(self, ids: List[int]):
+        self._db.executemany("UPDATE messages SET leased_until = 0 WHERE id = ?", [(i,) for i in ids])
+
+    def _settle(self, delivered: List[int], retry: List[tuple], dead: List[tuple]):
+        db = self._db
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in delivered])
+            db.executemany(
+                "UPDATE messages SET next_attempt = ?, leased_until = 0, last_error = ? WHERE id = ?",
+                [(now + delay, error, i) for i, delay, error in retry]
+            )
+            db.executemany(
+                "INSERT OR REPLACE INTO dead_letters (tracking_id, payload, attempts, created, failed_at, last_error)"
+                " SELECT tracking_id, payload, attempts, created, ?, ? FROM messages WHERE id = ?",
+                [(now, error, i) for i, error in dead]
+            )
+            db.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i, _ in dead])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    async def _deliver(self, messages: List[tuple]):
+        try:
+            outcomes = await self.deliver([json.loads(payload) for _, _, payload, _ in messages])
+            if len(outcomes) != len(messages):
+                raise ValueError(f"deliver returned {len(outcomes)} outcomes for {len(messages)} messages")
+        except Exception as e:
+            outcomes = [e] * len(messages)
+        delivered, retry, dead = [], [], []
+        for (message_id, tracking_id, _, attempts), error in zip(messages, outcomes):
+            if error is None:
+                delivered.append(message_id)
+                continue
+            description = f"{type(error).__name__}: {error}"
+            if isinstance(error, PoisonMessage) or attempts >= self.max_attempts:
+                logger.error(f"Message {tracking_id} dead-lettered after {attempts} attempts: {description}")
+                dead.append((message_id, description))
+            else:
+                delay = self.retry_delay(attempts)
+                logger.warning(f"Message {tracking_id} failed ({description}), retrying in {delay:.2f}s")
+                retry.append((message_id, delay, description))
+        await self._run(self._settle, delivered, retry, dead)
+        self.delivered += len(delivered)
+        self.retries += len(retry)
+        self.dead_lettered += len(dead)
+
+    def _delivery_done(self, task: asyncio.Task):
+        self._deliveries.pop(task, None)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Durable queue delivery failed: {task.exception()}")
+
+    async def _dispatch(self):
+        while True:
+            await self._slots.acquire()
+            self._wake.clear()
+            try:
+                messages = await self._run(self._claim)
+            except Exception as e:
+                self._slots.release()
+                logger.error(f"Durable queue could not claim messages: {e}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if not messages:
+                self._slots.release()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._deliver(messages))
+            self._deliveries[task] = [message[0] for message in messages]
+            task.add_done_callback(self._delivery_done)
+
+    # Dead letters
+
+    def _dead_letters(self, limit: int, offset: int) -> List[dict]:
+        rows = self._db.execute(
+            "SELECT tracking_id, payload, attempts, created, failed_at, last_error FROM dead_letters"
+            " ORDER BY id LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        return [{"tracking_id": tracking_id, "payload": json.loads(payload), "attempts": attempts,
+                 "created": created, "failed_at": failed_at, "last_error": last_error}
+                for tracking_id, payload, attempts, created, failed_at, last_error in rows]
+
+    async def dead_letters(self, limit: int = 100, offset: int = 0) -> List[dict]:
+        """Dead-lettered messages, oldest first."""
+        return await self._run(self._dead_letters, limit, offset)
+
+    def _replay(self, tracking_ids: Optional[List[str]]) -> int:
+        db = self._db
+        where, args = ("", ()) if tracking_ids is None else (
+            " WHERE tracking_id IN (SELECT value FROM json_each(?))", (json.dumps(tracking_ids),)
+        )
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            replayed = db.execute(
+                "INSERT INTO messages (tracking_id, payload, next_attempt, created, last_error)"
+                " SELECT tracking_id, payload, ?, created, last_error FROM dead_letters" + where,
+                (time.time(),) + args
+            ).rowcount
+            db.execute("DELETE FROM dead_letters" + where, args)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return replayed
+
+    async def replay(self, tracking_ids: Optional[List[str]] = None) -> int:
+        """Move dead letters (all, or those with the given tracking ids) back to the queue.
+
+        Replayed messages start again with no attempts made. Returns how many
+        were moved.
+        """
+        replayed = await self._run(self._replay, tracking_ids)
+        if replayed:
+            logger.info(f"Replaying {replayed} dead-lettered messages")
+            if self._wake is not None:
+                self._wake.set()
+        return replayed
+
+    def _counts(self) -> dict:
+        now = time.time()
+        queued, due, leased = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(next_attempt <= ? AND leased_until <= ?), 0),"
+            " COALESCE(SUM(leased_until > ?), 0) FROM messages", (now, now, now)
+        ).fetchone()
+        dead = self._db.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+        return {"queued": queued, "due": due, "leased": leased, "dead_letters": dead}
+
+    async def stats(self) -> dict:
+        counts = await self._run(self._counts) if self._db is not None else {}
+        return dict(
+            counts,
+            path=self.path,
+            synchronous=self.synchronous,
+            workers=self.workers,
+            deliveries_in_progress=len(self._deliveries),
+            accepted=self.accepted,
+            commits=self.commits,
+            delivered=self.delivered,
+            retries=self.retries,
+            dead_lettered=self.dead_lettered,
+        )
@@ -0,0 +1,124 @@
+# load_balancer.py for workflow_router_agent
+import random
+from collections import deque
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+STRATEGIES = ("p2c", "least_outstanding")
+
+
+def parse_endpoints(value: Optional[str]) -> List[Tuple[str, float]]:
+    """Parse "url[;weight=N],url[;weight=N],..." into (url, weight) pairs."""
+    endpoints = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, options = item.partition(";")
+        weight = 1.0
+        for option in filter(None, (o.strip() for o in options.split(";"))):
+            name, _, setting = option.partition("=")
+            if name.strip() != "weight":
+                raise ValueError(f"Unknown endpoint option {name!r} in {item!r}")
+            weight = float(setting)
+            if weight <= 0:
+                raise ValueError(f"Endpoint weight must be positive in {item!r}")
+        endpoints.append((url.strip(), weight))
+    return endpoints
+
+
+class Replica:
+    """One handler endpoint with its weight, circuit breaker and load gauges."""
+
+    def __init__(self, url: str, breaker: CircuitBreaker, weight: float = 1.0, latency_window: int = 200):
+        self.url = url
+        self.breaker = breaker
+        self.weight = weight
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self._latencies = deque(maxlen=latency_window)
+
+    def load(self) -> float:
+        """Outstanding requests, including the one about to be sent, per unit of weight."""
+        return (self.in_flight + 1) / self.weight
+
+    def started(self):
+        self.in_flight += 1
+        self.requests += 1
+
+    def finished(self, succeeded: bool, latency: float):
+        self.in_flight -= 1
+        self.failures += int(not succeeded)
+        self._latencies.append(latency)
+        self.breaker.record(succeeded, latency)
+
+    def _latency_ms(self, quantile: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return round(ordered[min(len(ordered) - 1, int(quantile * len(ordered)))] * 1000, 3)
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "available": self.breaker.available(),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ms": {"p50": self._latency_ms(0.50), "p95": self._latency_ms(0.95)},
+            "circuit": self.breaker.stats(),
+        }
+
+
+class ReplicaPool:
+    """The replicas serving one workflow type.
+
+    choose() skips replicas whose circuit is open (ejected) and picks by
+    outstanding requests per unit of weight: either the least loaded of all
+    replicas ("least_outstanding") or the less loaded of two drawn at random
+    in proportion to their weights ("p2c", power of two choices).
+    """
+
+    def __init__(self, name: str, replicas: Sequence[Replica], strategy: str = "p2c",
+                 rng: Optional[random.Random] = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown load balancing strategy {strategy!r}, expected one of {STRATEGIES}")
+        self.name = name
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self._rng = rng or random.Random()
+
+    def _least_loaded(self, candidates: List[Replica]) -> Replica:
+        lowest = min(replica.load() for replica in candidates)
+        return self._rng.choice([replica for replica in candidates if replica.load() == lowest])
+
+    def _pick(self, candidates: List[Replica]) -> Replica:
+        if len(candidates) == 1 or self.strategy == "least_outstanding":
+            return self._least_loaded(candidates)
+        first = self._rng.choices(candidates, weights=[r.weight for r in candidates])[0]
+        others = [replica for replica in candidates if replica is not first]
+        second = self._rng.choices(others, weights=[r.weight for r in others])[0]
+        return self._least_loaded([first, second])
+
+    def choose(self, exclude: Iterable[Replica] = ()) -> Replica:
+        """A replica to send the next request to; raises CircuitOpenError if all are ejected."""
+        excluded = set(map(id, exclude))
+        candidates = [r for r in self.replicas if id(r) not in excluded and r.breaker.available()]
+        while candidates:
+            replica = self._pick(candidates)
+            # Takes the half-open trial slot; another request may have taken it first
+            if replica.breaker.allow_request():
+                return replica
+            candidates.remove(replica)
+        retry_in = min((r.breaker.stats()["retry_in"] or 0.0 for r in self.replicas), default=0.0)
+        raise CircuitOpenError(f"all {self.name} replicas", retry_in)
+
+    def stats(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "available": sum(replica.breaker.available() for replica in self.replicas),
+            "replicas": [replica.stats() for replica in self.replicas],
+        }
@@ -1,15 +1,26 @@
 # main.py for workflow_router_agent
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
 import os
 from dotenv import load_dotenv
 import sys
 import logging
 import httpx
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlsplit
 
 # Add parent directory to path to import shared models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared.models import ClassifiedEmail, NormalizedEmail, ClassificationResult
+from shared.http_pool import HTTPPool
+from circuit_breaker import CircuitBreaker, CircuitOpenError, HealthProber
+from load_balancer import Replica, ReplicaPool, parse_endpoints
+from durable_queue import DurableQueue, PoisonMessage
+from routing_rules import RuleReloader
 
 load_dotenv()
 
@@ -20,9 +31,71 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Connection pool of the HTTP client shared by all handler requests
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+HTTP_POOL_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "30"))
+# HTTP/2 needs the h2 package (pip install "httpx[http2]")
+HTTP_POOL_HTTP2 = os.getenv("HTTP_POOL_HTTP2", "false").lower() == "true"
+HANDLER_TIMEOUT = float(os.getenv("HANDLER_TIMEOUT", "30"))
+# Per-handler circuit breakers: open when this share of the recent calls failed...
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+# ...or this share took CIRCUIT_SLOW_CALL_SECONDS or longer
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "5"))
+CIRCUIT_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "0.8"))
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+# Seconds an open circuit rejects calls before letting a trial call through
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_CALLS", "1"))
+# Background GET of each handler's health path (0 disables probing)
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+HEALTH_PROBE_PATH = os.getenv("HEALTH_PROBE_PATH", "/health")
+# Consecutive failed probes that open a circuit
+HEALTH_PROBE_FAILURES = int(os.getenv("HEALTH_PROBE_FAILURES", "2"))
+# How a request picks among a handler's replicas: "p2c" (less loaded of two random
+# replicas) or "least_outstanding" (least loaded of all)
+LOAD_BALANCING_STRATEGY = os.getenv("LOAD_BALANCING_STRATEGY", "p2c")
+# /route/batch: largest accepted batch, emails per request to a handler's batch endpoint
+# (its URL plus HANDLER_BATCH_SUFFIX; empty disables), and concurrent handler requests
+ROUTE_BATCH_MAX_SIZE = int(os.getenv("ROUTE_BATCH_MAX_SIZE", "1000"))
+HANDLER_BATCH_SUFFIX = os.getenv("HANDLER_BATCH_SUFFIX", "/batch")
+HANDLER_BATCH_SIZE = int(os.getenv("HANDLER_BATCH_SIZE", "100"))
+ROUTE_BATCH_CONCURRENCY = int(os.getenv("ROUTE_BATCH_CONCURRENCY", "10"))
+# Durable routing queue: when a path is set, /route and /route/batch persist emails in
+# this SQLite database and answer 202, and workers forward them to the handlers
+ROUTING_QUEUE_PATH = os.getenv("ROUTING_QUEUE_PATH", "")
+# Concurrent deliveries and emails claimed per delivery
+ROUTING_QUEUE_WORKERS = int(os.getenv("ROUTING_QUEUE_WORKERS", "10"))
+ROUTING_QUEUE_BATCH_SIZE = int(os.getenv("ROUTING_QUEUE_BATCH_SIZE", "100"))
+# Attempts before an email moves to the dead letters, and backoff between them in seconds
+ROUTING_QUEUE_MAX_ATTEMPTS = int(os.getenv("ROUTING_QUEUE_MAX_ATTEMPTS", "5"))
+ROUTING_QUEUE_RETRY_BASE_DELAY = float(os.getenv("ROUTING_QUEUE_RETRY_BASE_DELAY", "1"))
+ROUTING_QUEUE_RETRY_MAX_DELAY = float(os.getenv("ROUTING_QUEUE_RETRY_MAX_DELAY", "60"))
+# Seconds a claimed email is reserved; a router that dies mid-delivery releases it after this
+ROUTING_QUEUE_LEASE = float(os.getenv("ROUTING_QUEUE_LEASE", "120"))
+# SQLite synchronous setting: FULL syncs every commit, NORMAL may lose the last commits on power loss
+ROUTING_QUEUE_SYNCHRONOUS = os.getenv("ROUTING_QUEUE_SYNCHRONOUS", "FULL")
+# JSON file of routing overrides by sender domain, subject, workflow type and confidence
+# (see routing_rules.py), checked for changes every ROUTING_RULES_RELOAD_INTERVAL seconds
+ROUTING_RULES_PATH = os.getenv("ROUTING_RULES_PATH", "")
+ROUTING_RULES_RELOAD_INTERVAL = float(os.getenv("ROUTING_RULES_RELOAD_INTERVAL", "2"))
 
-# Handler URL mapping
+T = TypeVar("T")
+
+# Keep-alive client for the handlers, opened and closed with the application
+http_pool = HTTPPool(
+    max_connections=HTTP_POOL_MAX_CONNECTIONS,
+    max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+    keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY,
+    timeout=HANDLER_TIMEOUT,
+    http2=HTTP_POOL_HTTP2
+)
+
+
+# Handler endpoints per workflow type: one URL, or a comma-separated list of
+# replicas, each optionally weighted as "url;weight=N"
 HANDLER_MAP = {
     "InvoiceRequest": os.getenv("INVOICE_HANDLER_URL"),
     "AppointmentBooking": os.getenv("SCHEDULER_URL"),
@@ -30,60 +103,463 @@ HANDLER_MAP = {
     "HumanReview": os.getenv("HUMAN_REVIEW_URL")
 }
 
+
+def create_breaker(url: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        url,
+        failure_rate=CIRCUIT_FAILURE_RATE,
+        slow_call=CIRCUIT_SLOW_CALL_SECONDS,
+        slow_call_rate=CIRCUIT_SLOW_CALL_RATE,
+        window=CIRCUIT_WINDOW,
+        min_calls=CIRCUIT_MIN_CALLS,
+        open_duration=CIRCUIT_OPEN_SECONDS,
+        half_open_calls=CIRCUIT_HALF_OPEN_CALLS,
+        probe_failures=HEALTH_PROBE_FAILURES
+    )
+
+
+def build_handler_pools(handler_map: Dict[str, Optional[str]]) -> Tuple[Dict[str, Replica], Dict[str, ReplicaPool]]:
+    """Replicas by URL and the replica pool of every configured workflow type.
+
+    A URL listed for several workflow types is one replica, with one circuit
+    breaker and one set of gauges.
+    """
+    replicas: Dict[str, Replica] = {}
+    pools: Dict[str, ReplicaPool] = {}
+    for workflow_type, endpoints in handler_map.items():
+        members = []
+        for url, weight in parse_endpoints(endpoints):
+            if url not in replicas:
+                replicas[url] = Replica(url, create_breaker(url), weight)
+            members.append(replicas[url])
+        if members:
+            pools[workflow_type] = ReplicaPool(workflow_type, members, LOAD_BALANCING_STRATEGY)
+    return replicas, pools
+
+
+replicas, handler_pools = build_handler_pools(HANDLER_MAP)
+circuit_breakers: Dict[str, CircuitBreaker] = {url: replica.breaker for url, replica in replicas.items()}
+
+
+def health_url(url: str) -> str:
+    """The health endpoint on the same host as a handler URL."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{HEALTH_PROBE_PATH}"
+
+
+async def probe_handler(url: str) -> Optional[str]:
+    """None if the handler's host answers its health check, else what went wrong."""
+    try:
+        response = await http_pool.get(health_url(url), timeout=HEALTH_PROBE_TIMEOUT)
+    except httpx.HTTPError as e:
+        return f"{type(e).__name__}: {e}"
+    # A handler without a health endpoint still shows that it is up with a 404
+    if response.status_code >= 500:
+        return f"HTTP {response.status_code}"
+    return None
+
+
+health_prober = HealthProber(circuit_breakers, probe_handler, interval=HEALTH_PROBE_INTERVAL)
+
+# Routing overrides, reloaded without a restart when the file changes
+routing_rules = RuleReloader(
+    ROUTING_RULES_PATH, HANDLER_MAP, interval=ROUTING_RULES_RELOAD_INTERVAL
+) if ROUTING_RULES_PATH else None
+
+
+def choose_destination(email: ClassifiedEmail) -> Tuple[str, Optional[str]]:
+    """The workflow type whose handler gets the email, and the name of the routing rule that chose it, if any."""
+    rule = routing_rules.match(email) if routing_rules is not None else None
+    if rule is None:
+        return email.classification.workflow_type, None
+    return rule.route_to, rule.name
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_pool.start()
+    health_prober.start()
+    if routing_rules is not None:
+        routing_rules.start()
+    if routing_queue is not None:
+        await routing_queue.start()
+    yield
+    if routing_queue is not None:
+        await routing_queue.stop()
+    if routing_rules is not None:
+        await routing_rules.stop()
+    await health_prober.stop()
+    await http_pool.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
 async def forward_payload(url: str, payload: ClassifiedEmail) -> dict:
     """Forward the classified email payload to the appropriate handler."""
-    async with httpx.AsyncClient() as client:
+    try:
+        response = await http_pool.post(url, json=payload.model_dump())
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logging.error(f"HTTP error occurred while forwarding to {url}: {e}")
+        raise
+    except httpx.RequestError as e:
+        logging.error(f"Request error occurred while forwarding to {url}: {e}")
+        raise
+    except Exception as e:
+        logging.error(f"Unexpected error occurred while forwarding to {url}: {e}")
+        raise
+
+
+class BatchRouteRequest(BaseModel):
+    emails: List[ClassifiedEmail]
+
+
+# Whether each handler replica has a batch endpoint, learned from the first batch sent to it
+handler_batch_support: Dict[str, bool] = {}
+
+async def forward_batch(url: str, payloads: List[ClassifiedEmail]) -> List[dict]:
+    """POST several payloads to a handler's batch endpoint; returns one result per payload."""
+    response = await http_pool.post(url, json={"emails": [payload.model_dump() for payload in payloads]})
+    response.raise_for_status()
+    results = response.json().get("results")
+    if not isinstance(results, list) or len(results) != len(payloads):
+        count = len(results) if isinstance(results, list) else "no"
+        raise ValueError(f"Batch endpoint {url} returned {count} results for {len(payloads)} emails")
+    return results
+
+
+async def with_replica(workflow_type: str, send: Callable[[Replica], Awaitable[T]]) -> Tuple[Replica, T]:
+    """Call `send` with a replica of the workflow type's handler.
+
+    Raises CircuitOpenError at once, without a request, when every replica is
+    ejected. A replica that refuses the connection has not received anything,
+    so the next available replica is tried. Connection errors, timeouts and
+    5xx responses count as failures for a replica's circuit; 4xx responses are
+    the caller's fault and do not.
+    """
+    pool = handler_pools[workflow_type]
+    tried = []
+    while True:
+        replica = pool.choose(exclude=tried)
+        replica.started()
+        started = time.perf_counter()
+        handler_failed = True
         try:
-            response = await client.post(url, json=payload.model_dump(), timeout=30.0)
-            response.raise_for_status()
-            return response.json()
+            result = await send(replica)
+            handler_failed = False
+            return replica, result
         except httpx.HTTPStatusError as e:
-            logging.error(f"HTTP error occurred while forwarding to {url}: {e}")
-            raise
-        except httpx.RequestError as e:
-            logging.error(f"Request error occurred while forwarding to {url}: {e}")
-            raise
-        except Exception as e:
-            logging.error(f"Unexpected error occurred while forwarding to {url}: {e}")
+            handler_failed = e.response.status_code >= 500
             raise
+        except httpx.ConnectError:
+            tried.append(replica)
+            if not any(r.breaker.available() for r in pool.replicas if r not in tried):
+                raise
+            logger.warning(f"Could not connect to {replica.url}, trying another {workflow_type} replica")
+        finally:
+            replica.finished(not handler_failed, time.perf_counter() - started)
 
-@app.post("/route")
-async def route_workflow(email: ClassifiedEmail):
+
+async def dispatch(workflow_type: str, payload: ClassifiedEmail) -> Tuple[Replica, dict]:
+    """Forward the payload to a replica of the workflow type's handler."""
+    return await with_replica(workflow_type, lambda replica: forward_payload(replica.url, payload))
+
+
+async def dispatch_group(workflow_type: str, payloads: List[ClassifiedEmail],
+                         limit: asyncio.Semaphore) -> List[Union[Tuple[Replica, dict], Exception]]:
+    """Forward payloads bound for one handler; returns (replica, result) or the error per payload.
+
+    Payloads go in requests of HANDLER_BATCH_SIZE to the batch endpoint of a
+    replica. Only a replica answering 404 or 405 there has none; that chunk,
+    and later ones, are then sent one by one. Any other failure is the
+    outcome of every payload in the chunk, which may have been delivered, so
+    it is not sent again. `limit` bounds the concurrent requests.
+    """
+    replicas = handler_pools[workflow_type].replicas
+
+    async def one(payload: ClassifiedEmail):
+        async with limit:
+            try:
+                return await dispatch(workflow_type, payload)
+            except Exception as e:
+                return e
+
+    async def send_batch(replica: Replica, chunk: List[ClassifiedEmail]) -> Optional[List[dict]]:
+        """The replica's results for the chunk, or None if it has no batch endpoint."""
+        if handler_batch_support.get(replica.url) is False:
+            return None
+        try:
+            results = await forward_batch(replica.url + HANDLER_BATCH_SUFFIX, chunk)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in (404, 405):
+                raise
+            logger.info(f"{workflow_type} handler at {replica.url} has no batch endpoint, "
+                        f"forwarding its emails one by one")
+            handler_batch_support[replica.url] = False
+            return None
+        handler_batch_support[replica.url] = True
+        return results
+
+    def lacks_batch() -> bool:
+        return all(handler_batch_support.get(replica.url) is False for replica in replicas)
+
+    async def batch(chunk: List[ClassifiedEmail]) -> list:
+        if not lacks_batch():
+            async with limit:
+                try:
+                    replica, results = await with_replica(workflow_type, lambda replica: send_batch(replica, chunk))
+                except Exception as e:
+                    return [e] * len(chunk)
+            if results is not None:
+                return [RuntimeError(f"Handler error: {entry['error']}") if isinstance(entry, dict) and "error" in entry
+                        else (replica, entry) for entry in results]
+        # Nothing was sent: the chosen replica, or every replica, has no batch endpoint
+        return list(await asyncio.gather(*(one(payload) for payload in chunk)))
+
+    if not HANDLER_BATCH_SUFFIX or lacks_batch():
+        return list(await asyncio.gather(*(one(payload) for payload in payloads)))
+    chunks = [payloads[start:start + HANDLER_BATCH_SIZE] for start in range(0, len(payloads), HANDLER_BATCH_SIZE)]
+    outcomes: list = []
+    if len(chunks) > 1 and any(replica.url not in handler_batch_support for replica in replicas):
+        # Find out from the first request whether the handler has a batch endpoint
+        outcomes, chunks = await batch(chunks[0]), chunks[1:]
+    for results in await asyncio.gather(*(batch(chunk) for chunk in chunks)):
+        outcomes.extend(results)
+    return outcomes
+
+async def route_one(email: ClassifiedEmail) -> dict:
+    """Forward one classified email to its handler, falling back to HumanReview on failure."""
     logger.info(f"Received classified email for routing with workflow_type: {email.classification.workflow_type}")
     
-    # Get the destination URL from the handler map
-    workflow_type = email.classification.workflow_type
-    destination_url = HANDLER_MAP.get(workflow_type)
+    # Get the destination handler from the routing rules and the handler map
+    destination, rule = choose_destination(email)
+    if rule is not None:
+        logger.info(f"Routing rule {rule!r} sends the email to {destination}")
     
-    if not destination_url:
-        logger.error(f"Unknown workflow_type: {workflow_type}. Routing to human review.")
-        destination_url = HANDLER_MAP.get("HumanReview")
-        if not destination_url:
+    if destination not in handler_pools:
+        logger.error(f"Unknown workflow_type: {destination}. Routing to human review.")
+        destination = "HumanReview"
+        if destination not in handler_pools:
             logger.critical("Human review URL not configured!")
             return {"status": "error", "message": "No handler available for this workflow type"}
     
-    logger.info(f"Forwarding payload to handler at: {destination_url}")
-    
     try:
-        # Forward the payload to the appropriate handler
-        result = await forward_payload(destination_url, email)
-        logger.info(f"Successfully routed email to {workflow_type} handler")
-        return {"status": "routed", "handler": workflow_type, "result": result}
+        # Forward the payload to a replica of the appropriate handler
+        replica, result = await dispatch(destination, email)
+        logger.info(f"Successfully routed email to {destination} handler at {replica.url}")
+        return {"status": "routed", "handler": destination, "replica": replica.url, "rule": rule, "result": result}
     except Exception as e:
         logger.error(f"Failed to route email: {str(e)}")
         # Fallback to human review on error
-        if workflow_type != "HumanReview":
+        if destination != "HumanReview":
             logger.info("Attempting fallback to human review")
             try:
-                human_review_url = HANDLER_MAP.get("HumanReview")
-                if human_review_url:
-                    result = await forward_payload(human_review_url, email)
-                    return {"status": "routed", "handler": "HumanReview", "fallback": True, "result": result}
+                if "HumanReview" in handler_pools:
+                    replica, result = await dispatch("HumanReview", email)
+                    return {"status": "routed", "handler": "HumanReview", "replica": replica.url,
+                            "rule": rule, "fallback": True, "result": result}
             except Exception as fallback_error:
                 logger.error(f"Fallback to human review also failed: {str(fallback_error)}")
         
         return {"status": "error", "message": f"Failed to route email: {str(e)}"}
 
+async def route_many(emails: List[ClassifiedEmail]) -> dict:
+    """Forward classified emails grouped by destination handler.
+
+    Returns one result per email, in order, shaped like the route_one()
+    result. Emails that fail at their handler fall back to HumanReview
+    individually, again as one group.
+    """
+    results: List[Optional[dict]] = [None] * len(emails)
+    choices = [choose_destination(email) for email in emails]
+    groups: Dict[str, List[int]] = {}
+    for index, (chosen, _) in enumerate(choices):
+        destination = chosen if chosen in handler_pools else "HumanReview"
+        if destination not in handler_pools:
+            results[index] = {"status": "error", "message": "No handler available for this workflow type"}
+        else:
+            groups.setdefault(destination, []).append(index)
+    
+    limit = asyncio.Semaphore(ROUTE_BATCH_CONCURRENCY)
+    
+    async def route_group(destination: str, indexes: List[int], fallback: bool = False) -> List[Tuple[int, Exception]]:
+        outcomes = await dispatch_group(destination, [emails[i] for i in indexes], limit)
+        failed = []
+        for index, outcome in zip(indexes, outcomes):
+            if isinstance(outcome, Exception):
+                failed.append((index, outcome))
+                continue
+            replica, result = outcome
+            results[index] = {"status": "routed", "handler": destination, "replica": replica.url,
+                              "rule": choices[index][1], "result": result}
+            if fallback:
+                results[index]["fallback"] = True
+        return failed
+    
+    group_failures = await asyncio.gather(*(route_group(d, indexes) for d, indexes in groups.items()))
+    failures = {index: error for failed in group_failures for index, error in failed}
+    # Fallback to human review for the emails that failed at another handler
+    retry = [index for index in failures if choices[index][0] in handler_pools and choices[index][0] != "HumanReview"]
+    if retry and "HumanReview" in handler_pools:
+        logger.info(f"Attempting fallback to human review for {len(retry)} emails")
+        for index, error in await route_group("HumanReview", retry, fallback=True):
+            logger.error(f"Fallback to human review also failed: {error}")
+    for index, error in failures.items():
+        if results[index] is None:
+            results[index] = {"status": "error", "message": f"Failed to route email: {error}"}
+    
+    routed = sum(1 for result in results if result["status"] == "routed")
+    fallbacks = sum(1 for result in results if result.get("fallback"))
+    logger.info(f"Batch routing complete: {routed}/{len(results)} routed, {fallbacks} via fallback")
+    return {"results": results, "routed": routed, "fallback": fallbacks, "failed": len(results) - routed}
+
+async def deliver_queued(payloads: List[dict]) -> List[Optional[Exception]]:
+    """Route emails claimed from the durable queue; None for each one routed, else the error."""
+    outcomes: List[Optional[Exception]] = [None] * len(payloads)
+    emails: List[Tuple[int, ClassifiedEmail]] = []
+    for index, payload in enumerate(payloads):
+        try:
+            emails.append((index, ClassifiedEmail.model_validate(payload)))
+        except ValidationError as e:
+            outcomes[index] = PoisonMessage(f"Invalid classified email: {e}")
+    if len(emails) == 1:
+        results = [await route_one(emails[0][1])]
+    elif emails:
+        results = (await route_many([email for _, email in emails]))["results"]
+    else:
+        results = []
+    for (index, _), result in zip(emails, results):
+        if result["status"] != "routed":
+            outcomes[index] = RuntimeError(result["message"])
+    return outcomes
+
+
+routing_queue = DurableQueue(
+    ROUTING_QUEUE_PATH,
+    deliver_queued,
+    workers=ROUTING_QUEUE_WORKERS,
+    max_attempts=ROUTING_QUEUE_MAX_ATTEMPTS,
+    base_delay=ROUTING_QUEUE_RETRY_BASE_DELAY,
+    max_delay=ROUTING_QUEUE_RETRY_MAX_DELAY,
+    lease=ROUTING_QUEUE_LEASE,
+    batch_size=ROUTING_QUEUE_BATCH_SIZE,
+    synchronous=ROUTING_QUEUE_SYNCHRONOUS
+) if ROUTING_QUEUE_PATH else None
+
+
+@app.post("/route")
+async def route_workflow(email: ClassifiedEmail):
+    """Route a classified email to its handler.
+
+    With the durable queue enabled the email is persisted and 202 returned
+    with its tracking id; it is forwarded in the background.
+    """
+    if routing_queue is not None:
+        tracking_id = await routing_queue.put(email.model_dump())
+        return JSONResponse(status_code=202, content={"status": "queued", "tracking_id": tracking_id})
+    return await route_one(email)
+
+@app.post("/route/batch")
+async def route_batch(request: BatchRouteRequest):
+    """Route many classified emails, grouped by destination handler.
+
+    Returns one result per email, in request order, shaped like the /route
+    response. With the durable queue enabled the emails are persisted and
+    202 returned with their tracking ids, in request order.
+    """
+    emails = request.emails
+    if len(emails) > ROUTE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(emails)} emails exceeds ROUTE_BATCH_MAX_SIZE ({ROUTE_BATCH_MAX_SIZE})"
+        )
+    logger.info(f"Received batch of {len(emails)} classified emails for routing")
+    if routing_queue is not None:
+        tracking_ids = await routing_queue.put_many([email.model_dump() for email in emails])
+        return JSONResponse(status_code=202, content={"status": "queued", "tracking_ids": tracking_ids})
+    return await route_many(emails)
+
+
+class ReplayRequest(BaseModel):
+    # None replays every dead letter
+    tracking_ids: Optional[List[str]] = None
+
+
+def require_routing_queue() -> DurableQueue:
+    if routing_queue is None:
+        raise HTTPException(status_code=404, detail="Durable routing queue is disabled (set ROUTING_QUEUE_PATH)")
+    return routing_queue
+
+@app.get("/queue")
+async def queue_status():
+    """Counts of queued, due and dead-lettered emails and delivery counters of the durable queue."""
+    return await require_routing_queue().stats()
+
+@app.get("/queue/dead-letters")
+async def list_dead_letters(limit: int = 100, offset: int = 0):
+    """Emails that could not be delivered, oldest first, with their last error."""
+    return {"dead_letters": await require_routing_queue().dead_letters(limit, offset)}
+
+@app.post("/queue/dead-letters/replay")
+async def replay_dead_letters(request: ReplayRequest):
+    """Put dead-lettered emails back in the queue for another round of attempts."""
+    return {"replayed": await require_routing_queue().replay(request.tracking_ids)}
+
+@app.get("/rules")
+async def rules_status():
+    """Size, version and last load error of the routing rules."""
+    if routing_rules is None:
+        raise HTTPException(status_code=404, detail="Routing rules are disabled (set ROUTING_RULES_PATH)")
+    return routing_rules.stats()
+
+@app.post("/rules/reload")
+async def reload_rules():
+    """Load the routing rules file now instead of at the next change check."""
+    if routing_rules is None:
+        raise HTTPException(status_code=404, detail="Routing rules are disabled (set ROUTING_RULES_PATH)")
+    if not await asyncio.get_running_loop().run_in_executor(None, routing_rules.reload, True):
+        raise HTTPException(status_code=422, detail=routing_rules.last_error)
+    return routing_rules.stats()
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint."""
+    return {"status": "healthy", "agent": "workflow_router"}
+
+@app.get("/status")
+async def router_status():
+    """Replicas of every handler with their load, latency, circuit state and last health probe, and the routing rules."""
+    return {
+        "handlers": {
+            workflow_type: handler_pools[workflow_type].stats() if workflow_type in handler_pools else None
+            for workflow_type in HANDLER_MAP
+        },
+        "health_probe": {
+            "interval": HEALTH_PROBE_INTERVAL,
+            "rounds": health_prober.rounds
+        },
+        "routing_rules": routing_rules.stats() if routing_rules is not None else None
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Connection pool metrics of the handler client, load gauges of every replica and the durable queue."""
+    return {
+        "http_pool": http_pool.stats(),
+        "queue": await routing_queue.stats() if routing_queue is not None else None,
+        "replicas": {
+            url: {
+                "in_flight": replica.in_flight,
+                "requests": replica.requests,
+                "failures": replica.failures,
+                "latency_ms": replica.stats()["latency_ms"],
+                "available": replica.breaker.available()
+            }
+            for url, replica in replicas.items()
+        }
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
@@ -0,0 +1,297 @@
+# routing_rules.py for workflow_router_agent
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from shared.models import ClassifiedEmail
+
+logger = logging.getLogger(__name__)
+
+CONDITIONS = ("sender_domain", "subject", "workflow_type", "min_confidence", "max_confidence")
+RULE_KEYS = frozenset(CONDITIONS + ("name", "route_to", "ignore_case"))
+
+# A pattern starting with global inline flags, e.g. "(?i)invoice"
+GLOBAL_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+
+class Rule(NamedTuple):
+    priority: int
+    name: str
+    route_to: str
+    min_confidence: Optional[float]
+    max_confidence: Optional[float]
+
+    def in_band(self, confidence: float) -> bool:
+        return ((self.min_confidence is None or confidence >= self.min_confidence)
+                and (self.max_confidence is None or confidence < self.max_confidence))
+
+
+class _Bucket:
+    """Rules sharing a sender domain and workflow type condition (None meaning any).
+
+    The subject patterns are combined, in priority order, into one regex of
+    alternative lookaheads anchored at the start of the subject, so a single
+    match() finds the first rule whose pattern occurs in it. Only when that
+    rule's confidence band excludes the email is a second regex, of optional
+    lookaheads, used to find every rule whose pattern occurs.
+    """
+
+    def __init__(self):
+        self.plain: List[Rule] = []
+        self.patterned: List[Tuple[Rule, str]] = []
+        self._first: Optional[re.Pattern] = None
+        self._every: Optional[re.Pattern] = None
+        # Number of the empty group following each pattern (patterns may have groups of their own)
+        self._markers: List[int] = []
+        self._rule_by_marker: Dict[int, Rule] = {}
+
+    def compile(self):
+        if not self.patterned:
+            return
+        group = 0
+        for rule, pattern in self.patterned:
+            group += re.compile(pattern).groups + 1
+            self._markers.append(group)
+            self._rule_by_marker[group] = rule
+        self._first = re.compile("|".join(f"(?=[\\s\\S]*?(?:{pattern}))()" for _, pattern in self.patterned))
+
+    def _patterned_match(self, subject: str, confidence: float) -> Optional[Rule]:
+        match = self._first.match(subject)
+        if match is None:
+            return None
+        rule = self._rule_by_marker[match.lastindex]
+        if rule.in_band(confidence):
+            return rule
+        if self._every is None:
+            self._every = re.compile("".join(f"(?=[\\s\\S]*?(?:{pattern})())?" for _, pattern in self.patterned))
+        spans = self._every.match(subject).regs
+        return next((self._rule_by_marker[marker] for marker in self._markers
+                     if spans[marker][0] >= 0 and self._rule_by_marker[marker].in_band(confidence)), None)
+
+    def match(self, subject: str, confidence: float) -> Optional[Rule]:
+        """The bucket's first rule, by priority, that applies."""
+        best = next((rule for rule in self.plain if rule.in_band(confidence)), None)
+        if self._first is not None and (best is None or self.patterned[0][0].priority < best.priority):
+            rule = self._patterned_match(subject, confidence)
+            if rule is not None and (best is None or rule.priority < best.priority):
+                best = rule
+        return best
+
+
+def sender_domain(sender: str) -> str:
+    """Lower-cased domain of an address like "Name <user@example.com>"."""
+    address = sender.strip()
+    if address.endswith(">") and "<" in address:
+        address = address[address.rindex("<") + 1:-1]
+    return address.rpartition("@")[2].strip().lower()
+
+
+def domain_suffixes(domain: str) -> List[str]:
+    """"mail.example.com" -> ["mail.example.com", "example.com", "com"]."""
+    labels = domain.split(".")
+    return [".".join(labels[start:]) for start in range(len(labels)) if labels[start]]
+
+
+def _as_list(value, field: str, name: str) -> List[str]:
+    values = [value] if isinstance(value, str) else value
+    if not isinstance(values, list) or not values or not all(isinstance(v, str) and v for v in values):
+        raise ValueError(f"Rule {name!r}: {field} must be a string or a list of strings")
+    return values
+
+
+def _subject_pattern(pattern: str, ignore_case: bool, name: str) -> str:
+    if not isinstance(pattern, str) or not pattern:
+        raise ValueError(f"Rule {name!r}: subject must be a regular expression")
+    flags = GLOBAL_FLAGS.match(pattern)
+    if flags:
+        # Global flags are only allowed at the start of the combined regex; scope them to this pattern
+        pattern = f"(?{flags.group(1)}:{pattern[flags.end():]})"
+    try:
+        compiled = re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Rule {name!r}: invalid subject pattern: {e}") from e
+    # Patterns are combined into one regex, where group names could clash and group numbers shift
+    if compiled.groupindex or re.search(r"\\[1-9]|\(\?P=", pattern):
+        raise ValueError(f"Rule {name!r}: subject patterns may not use named groups or backreferences")
+    return f"(?i:{pattern})" if ignore_case else pattern
+
+
+class RuleSet:
+    """Routing overrides compiled from a rules document, first matching rule wins.
+
+    The document is {"rules": [...]}, each rule an object with a `route_to`
+    workflow type, an optional `name`, and any of these conditions, all of
+    which must hold:
+
+      sender_domain   a domain or list of domains; also matches subdomains
+      subject         a regular expression searched in the subject,
+                      case-insensitive unless "ignore_case": false
+      workflow_type   a classified workflow type or list of them
+      min_confidence  classification confidence at least this
+      max_confidence  classification confidence below this
+
+    Rules are indexed by sender domain and workflow type, so a lookup
+    touches a handful of hash buckets however many rules there are, plus
+    one combined regex per bucket that has subject patterns.
+    """
+
+    def __init__(self, document: dict, destinations: Iterable[str], source: Optional[str] = None):
+        if not isinstance(document, dict) or not isinstance(document.get("rules"), list):
+            raise ValueError("Routing rules must be an object with a \"rules\" list")
+        destinations = set(destinations)
+        self.source = source
+        self.rules: List[Rule] = []
+        self._buckets: Dict[Tuple[Optional[str], Optional[str]], _Bucket] = {}
+        for priority, spec in enumerate(document["rules"]):
+            self._add(priority, spec, destinations)
+        for bucket in self._buckets.values():
+            bucket.compile()
+
+    def _add(self, priority: int, spec: dict, destinations: set):
+        if not isinstance(spec, dict):
+            raise ValueError(f"Rule {priority} must be an object")
+        name = str(spec.get("name", f"rule {priority}"))
+        unknown = set(spec) - RULE_KEYS
+        if unknown:
+            raise ValueError(f"Rule {name!r}: unknown fields {sorted(unknown)}")
+        if spec.get("route_to") not in destinations:
+            raise ValueError(f"Rule {name!r}: route_to must be one of {sorted(destinations)}")
+        if not any(condition in spec for condition in CONDITIONS):
+            raise ValueError(f"Rule {name!r} has no conditions")
+        bands = [spec.get("min_confidence"), spec.get("max_confidence")]
+        if any(band is not None and not isinstance(band, (int, float)) for band in bands):
+            raise ValueError(f"Rule {name!r}: confidence bounds must be numbers")
+
+        domains: List[Optional[str]] = [None]
+        if "sender_domain" in spec:
+            domains = [d.strip().lower().lstrip("@") for d in _as_list(spec["sender_domain"], "sender_domain", name)]
+        workflow_types: List[Optional[str]] = [None]
+        if "workflow_type" in spec:
+            workflow_types = _as_list(spec["workflow_type"], "workflow_type", name)
+        pattern = None
+        if "subject" in spec:
+            pattern = _subject_pattern(spec["subject"], spec.get("ignore_case", True), name)
+
+        rule = Rule(priority, name, spec["route_to"], bands[0], bands[1])
+        self.rules.append(rule)
+        for domain in domains:
+            for workflow_type in workflow_types:
+                bucket = self._buckets.setdefault((domain, workflow_type), _Bucket())
+                if pattern is None:
+                    bucket.plain.append(rule)
+                else:
+                    bucket.patterned.append((rule, pattern))
+
+    @classmethod
+    def load(cls, path: str, destinations: Iterable[str]) -> "RuleSet":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), destinations, source=path)
+
+    def match(self, email: ClassifiedEmail) -> Optional[Rule]:
+        """The first rule, in file order, that applies to the email, or None."""
+        workflow_type = email.classification.workflow_type
+        confidence = email.classification.confidence_score
+        subject = email.original_email.subject
+        best: Optional[Rule] = None
+        for domain in domain_suffixes(sender_domain(email.original_email.sender)) + [None]:
+            for key in ((domain, workflow_type), (domain, None)):
+                bucket = self._buckets.get(key)
+                rule = bucket.match(subject, confidence) if bucket is not None else None
+                if rule is not None and (best is None or rule.priority < best.priority):
+                    best = rule
+        return best
+
+    def stats(self) -> dict:
+        return {
+            "rules": len(self.rules),
+            "buckets": len(self._buckets),
+            "subject_patterns": sum(len(bucket.patterned) for bucket in self._buckets.values()),
+        }
+
+
+class RuleReloader:
+    """Holds the current RuleSet and reloads it when the rules file changes.
+
+    The file's modification time and size are checked every `interval`
+    seconds. A changed file is compiled in full before `current` is swapped
+    to it, so lookups see either the old or the new rules, never a mix. A
+    file that fails to load leaves the previous rules in place.
+    """
+
+    def __init__(self, path: str, destinations: Iterable[str], interval: float = 2.0):
+        self.path = path
+        self.destinations: FrozenSet[str] = frozenset(destinations)
+        self.interval = interval
+        self.current: Optional[RuleSet] = None
+        self._signature: Optional[Tuple[float, int]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def _file_signature(self) -> Optional[Tuple[float, int]]:
+        try:
+            status = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return status.st_mtime_ns, status.st_size
+
+    def reload(self, force: bool = False) -> bool:
+        """Load the rules file if it changed (or `force`); returns whether new rules are in use."""
+        signature = self._file_signature()
+        if signature == self._signature and not force:
+            return False
+        self._signature = signature
+        if signature is None:
+            self.last_error = f"Rules file {self.path} not found"
+            logger.error(f"{self.last_error}, keeping the current rules")
+            return False
+        try:
+            rules = RuleSet.load(self.path, self.destinations)
+        except (OSError, ValueError) as e:
+            self.last_error = str(e)
+            logger.error(f"Could not load routing rules from {self.path}: {e}; keeping the current rules")
+            return False
+        self.current = rules
+        self.version += 1
+        self.loaded_at = time.time()
+        self.last_error = None
+        logger.info(f"Loaded {len(rules.rules)} routing rules from {self.path} (version {self.version})")
+        return True
+
+    def match(self, email: ClassifiedEmail) -> Optional[Rule]:
+        rules = self.current
+        return rules.match(email) if rules is not None else None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.get_running_loop().run_in_executor(None, self.reload)
+
+    def start(self):
+        self.reload()
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return dict(
+            self.current.stats() if self.current is not None else {"rules": 0},
+            path=self.path,
+            version=self.version,
+            loaded_at=self.loaded_at,
+            reload_interval=self.interval,
+            last_error=self.last_error,
+        )
@@ -1,16 +1,551 @@
 #!/usr/bin/env python3
-"""Test script for the workflow router agent."""
+"""Test script for the workflow router agent.
+
+Runs the router's behaviour tests against mocked handlers; with --live,
+sends sample payloads to a router running on localhost:8002 instead.
+"""
 
 import asyncio
 import httpx
 import json
+import random
 import sys
 import os
+import tempfile
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
 
 # Add parent directory to path to import shared models
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from shared.models import ClassifiedEmail, NormalizedEmail, ClassificationResult
 
+import main
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from load_balancer import Replica, ReplicaPool, parse_endpoints
+from durable_queue import DurableQueue, PoisonMessage
+from routing_rules import RuleReloader, RuleSet
+
+
+def classified_email(workflow_type: str = "InvoiceRequest", sender: str = "vendor@example.com",
+                     subject: str = "Invoice #12345", confidence: float = 0.95) -> ClassifiedEmail:
+    return ClassifiedEmail(
+        original_email=NormalizedEmail(
+            sender=sender,
+            subject=subject,
+            body="Please find attached invoice #12345 for services rendered.",
+            received_time="2024-01-15T10:30:00Z"
+        ),
+        classification=ClassificationResult(workflow_type=workflow_type, confidence_score=confidence)
+    )
+
+
+@contextmanager
+def mock_handlers(respond):
+    """Answer the router's handler requests with respond(request) -> httpx.Response."""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+    with patch.object(main.http_pool, "_client", client), \
+         patch.object(main.http_pool, "_loop", asyncio.get_running_loop()):
+        yield
+
+
+def test_circuit_breaker():
+    """Test the closed/open/half-open transitions of a circuit breaker."""
+    print("\n=== Testing circuit breaker ===")
+    
+    now = [0.0]
+    breaker = CircuitBreaker("handler", failure_rate=0.5, window=10, min_calls=4,
+                             open_duration=30, clock=lambda: now[0])
+    for succeeded in (True, False, True):
+        breaker.record(succeeded, 0.1)
+    assert breaker.state == CLOSED
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN and not breaker.available()
+    try:
+        breaker.check()
+        print("✗ Open circuit should reject calls")
+        return False
+    except CircuitOpenError as e:
+        assert e.retry_in == 30
+    assert breaker.rejected == 1
+    print("✓ Opened once half of the last 4 calls failed, and rejects calls")
+    
+    now[0] = 30
+    assert breaker.allow_request() and breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN and breaker.times_opened == 2
+    now[0] = 60
+    assert breaker.allow_request()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED and breaker.stats()["recent_calls"] == 0
+    print("✓ One trial call when half-open: failure reopens, success closes")
+    
+    slow = CircuitBreaker("slow handler", slow_call=1.0, slow_call_rate=0.5, min_calls=2, clock=lambda: now[0])
+    slow.record(True, 0.2)
+    slow.record(True, 1.5)
+    assert slow.state == OPEN
+    print("✓ Opened by slow calls that succeeded")
+    
+    probed = CircuitBreaker("probed handler", probe_failures=2, open_duration=30, clock=lambda: now[0])
+    probed.record_probe(False, 0.01, "ConnectError")
+    assert probed.state == CLOSED
+    probed.record_probe(False, 0.01, "ConnectError")
+    assert probed.state == OPEN
+    now[0] += 100
+    probed.record_probe(False, 0.01, "ConnectError")
+    assert not probed.available()
+    probed.record_probe(True, 0.01)
+    assert probed.state == HALF_OPEN and probed.available()
+    print("✓ Failed health probes open the circuit and keep it open until one succeeds")
+    
+    return True
+
+
+async def test_router_circuit_breaker():
+    """Test that failing handlers are skipped and their emails go to human review."""
+    print("\n=== Testing handler circuit breakers in the router ===")
+    
+    requests = []
+    
+    def respond(request):
+        requests.append(request.url.host)
+        if request.url.host == "invoice":
+            return httpx.Response(503, json={"detail": "unavailable"})
+        if request.url.host == "scheduler":
+            return httpx.Response(400, json={"detail": "bad request"})
+        return httpx.Response(200, json={"status": "queued for review"})
+    
+    _, pools = main.build_handler_pools({
+        "InvoiceRequest": "http://invoice/handle_invoice",
+        "AppointmentBooking": "http://scheduler/handle_schedule",
+        "HumanReview": "http://review/human_review",
+    })
+    email = classified_email()
+    with patch.object(main, "handler_pools", pools), mock_handlers(respond):
+        for _ in range(main.CIRCUIT_MIN_CALLS):
+            try:
+                await main.dispatch("InvoiceRequest", email)
+                print("✗ Handler 503 should raise")
+                return False
+            except httpx.HTTPStatusError:
+                pass
+        breaker = pools["InvoiceRequest"].replicas[0].breaker
+        assert breaker.state == OPEN
+        
+        requests.clear()
+        result = await main.route_one(email)
+        assert result["status"] == "routed" and result["handler"] == "HumanReview" and result["fallback"]
+        assert requests == ["review"], requests
+        print(f"✓ Circuit opened after {main.CIRCUIT_MIN_CALLS} handler 503s; "
+              f"next email went to human review without a request")
+        
+        for _ in range(main.CIRCUIT_MIN_CALLS):
+            try:
+                await main.dispatch("AppointmentBooking", classified_email("AppointmentBooking"))
+            except httpx.HTTPStatusError:
+                pass
+        assert pools["AppointmentBooking"].replicas[0].breaker.state == CLOSED
+        print("✓ Handler 4xx responses do not count against the circuit")
+    
+    def health(request):
+        return httpx.Response({"down": 500, "legacy": 404}.get(request.url.host, 200))
+    
+    with mock_handlers(health):
+        assert await main.probe_handler("http://ok/handle_invoice") is None
+        assert await main.probe_handler("http://legacy/handle_invoice") is None
+        assert await main.probe_handler("http://down/handle_invoice") == "HTTP 500"
+    print("✓ Health probe treats 5xx as down and a missing health endpoint as up")
+    
+    return True
+
+
+def test_load_balancer():
+    """Test replica choice by outstanding requests and ejection of open circuits."""
+    print("\n=== Testing replica load balancing ===")
+    
+    assert parse_endpoints("http://a/handle;weight=3, http://b/handle") == [("http://a/handle", 3.0),
+                                                                            ("http://b/handle", 1.0)]
+    for invalid in ("http://a/handle;weight=0", "http://a/handle;priority=1"):
+        try:
+            parse_endpoints(invalid)
+            print(f"✗ {invalid!r} should be rejected")
+            return False
+        except ValueError:
+            pass
+    print("✓ Parsed weighted endpoint lists")
+    
+    replicas = [Replica(f"http://{name}/handle", CircuitBreaker(name)) for name in "abc"]
+    replicas[0].in_flight = 5
+    replicas[1].in_flight = 1
+    p2c = ReplicaPool("InvoiceRequest", replicas, "p2c", rng=random.Random(1))
+    chosen = {p2c.choose().url for _ in range(200)}
+    assert chosen == {"http://b/handle", "http://c/handle"}, chosen
+    least = ReplicaPool("InvoiceRequest", replicas, "least_outstanding", rng=random.Random(1))
+    assert {least.choose().url for _ in range(20)} == {"http://c/handle"}
+    print("✓ p2c never picks the most loaded replica; least_outstanding picks the least loaded")
+    
+    weighted = [Replica("http://big/handle", CircuitBreaker("big"), weight=4),
+                Replica("http://small/handle", CircuitBreaker("small"))]
+    weighted[0].in_flight = 2
+    assert ReplicaPool("InvoiceRequest", weighted, "least_outstanding").choose() is weighted[0]
+    print("✓ Load is measured per unit of weight")
+    
+    for _ in range(5):
+        replicas[2].breaker.record(False, 0.1)
+    # c, the least loaded, is no longer chosen
+    assert {p2c.choose().url for _ in range(50)} == {"http://b/handle"}
+    assert least.choose().url == "http://b/handle" and p2c.stats()["available"] == 2
+    for replica in replicas[:2]:
+        for _ in range(5):
+            replica.breaker.record(False, 0.1)
+    try:
+        p2c.choose()
+        print("✗ A pool with every replica ejected should raise")
+        return False
+    except CircuitOpenError:
+        pass
+    print("✓ Replicas with an open circuit are ejected until every one is")
+    
+    return True
+
+
+async def test_replica_failover():
+    """Test that a refused connection moves the request to another replica."""
+    print("\n=== Testing replica failover ===")
+    
+    def respond(request):
+        if request.url.host == "down":
+            raise httpx.ConnectError("Connection refused", request=request)
+        return httpx.Response(200, json={"replica": request.url.host})
+    
+    replicas, pools = main.build_handler_pools({
+        "InvoiceRequest": "http://down/handle,http://up/handle",
+        "HumanReview": "http://up/handle",
+    })
+    assert pools["HumanReview"].replicas[0] is replicas["http://up/handle"]
+    with patch.object(main, "handler_pools", pools), mock_handlers(respond):
+        for _ in range(20):
+            replica, result = await main.dispatch("InvoiceRequest", classified_email())
+            assert replica.url == "http://up/handle" and result == {"replica": "up"}
+    down = replicas["http://down/handle"]
+    assert down.in_flight == 0 and replicas["http://up/handle"].in_flight == 0
+    assert down.failures == down.requests > 0
+    print(f"✓ All emails delivered by the healthy replica, {down.requests} refused connections retried")
+    
+    return True
+
+
+async def test_batch_routing():
+    """Test /route/batch grouping per handler, batch endpoint detection and fallback."""
+    print("\n=== Testing batch routing ===")
+    
+    requests = []
+    failing = {}
+    
+    def respond(request):
+        host, path = request.url.host, request.url.path
+        requests.append((host, path))
+        if host in failing:
+            raise failing[host](request)
+        if path.endswith("/batch"):
+            if host == "scheduler":
+                return httpx.Response(404, json={"detail": "Not Found"})
+            emails = json.loads(request.content)["emails"]
+            return httpx.Response(200, json={"results": [
+                {"error": "cannot parse"} if host == "invoice" and email["original_email"]["subject"] == "garbled"
+                else {"host": host}
+                for email in emails
+            ]})
+        return httpx.Response(200, json={"host": host})
+    
+    _, pools = main.build_handler_pools({
+        "InvoiceRequest": "http://invoice/handle_invoice",
+        "AppointmentBooking": "http://scheduler/handle_schedule",
+        "HumanReview": "http://review/human_review",
+    })
+    types = ["InvoiceRequest"] * 5 + ["AppointmentBooking"] * 3 + ["NewClientInquiry"]
+    emails = [classified_email(workflow_type) for workflow_type in types]
+    with patch.object(main, "handler_pools", pools), patch.object(main, "HANDLER_BATCH_SIZE", 2), \
+         patch.dict(main.handler_batch_support, clear=True), mock_handlers(respond):
+        response = await main.route_many(emails)
+        assert response["routed"] == 9 and response["fallback"] == 0, response
+        handlers = [result["handler"] for result in response["results"]]
+        assert handlers == types[:8] + ["HumanReview"]
+        assert requests.count(("invoice", "/handle_invoice/batch")) == 3
+        assert ("invoice", "/handle_invoice") not in requests
+        assert requests.count(("scheduler", "/handle_schedule/batch")) == 1
+        assert requests.count(("scheduler", "/handle_schedule")) == 3
+        assert main.handler_batch_support == {"http://invoice/handle_invoice": True,
+                                              "http://scheduler/handle_schedule": False,
+                                              "http://review/human_review": True}
+        print("✓ Emails grouped per handler; a handler answering 404 on /batch got them one by one")
+        
+        requests.clear()
+        await main.route_many(emails[5:8])
+        assert requests == [("scheduler", "/handle_schedule")] * 3
+        print("✓ Missing batch endpoint remembered for the replica")
+        
+        requests.clear()
+        emails[1] = classified_email(subject="garbled")
+        response = await main.route_many(emails[:5])
+        fallbacks = [index for index, result in enumerate(response["results"]) if result.get("fallback")]
+        assert fallbacks == [1] and response["results"][1]["handler"] == "HumanReview"
+        print("✓ An email the handler's batch endpoint reported failed fell back to human review")
+    
+    return True
+
+
+async def test_batch_failure_not_resent():
+    """Test that emails in a failed batch request are not sent to the handler again."""
+    print("\n=== Testing failed batch requests ===")
+    
+    for error in (httpx.ReadTimeout, lambda request: httpx.HTTPStatusError(
+            "503 Service Unavailable", request=request, response=httpx.Response(503, request=request))):
+        requests = []
+        
+        def respond(request):
+            requests.append((request.url.host, request.url.path))
+            if request.url.host == "invoice":
+                if isinstance(error, type):
+                    raise error("timed out", request=request)
+                return error(request).response
+            emails = json.loads(request.content)["emails"]
+            return httpx.Response(200, json={"results": [{"host": "review"}] * len(emails)})
+        
+        _, pools = main.build_handler_pools({
+            "InvoiceRequest": "http://invoice/handle_invoice",
+            "HumanReview": "http://review/human_review",
+        })
+        with patch.object(main, "handler_pools", pools), patch.object(main, "HANDLER_BATCH_SIZE", 2), \
+             patch.dict(main.handler_batch_support, clear=True), mock_handlers(respond):
+            response = await main.route_many([classified_email() for _ in range(5)])
+        assert response["routed"] == 5 and response["fallback"] == 5, response
+        invoice_requests = [path for host, path in requests if host == "invoice"]
+        assert invoice_requests == ["/handle_invoice/batch"] * 3, invoice_requests
+        assert "http://invoice/handle_invoice" not in main.handler_batch_support
+    print("✓ Timed out and 503 batch requests went to human review, never re-sent one by one")
+    
+    return True
+
+
+async def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+async def test_durable_queue():
+    """Test delivery, retries, dead letters and replay of the durable routing queue."""
+    print("\n=== Testing durable routing queue ===")
+    
+    attempts = {}
+    broken = {"always"}
+    
+    async def deliver(payloads):
+        outcomes = []
+        for payload in payloads:
+            kind = payload["kind"]
+            attempts[kind] = attempts.get(kind, 0) + 1
+            if kind == "poison":
+                outcomes.append(PoisonMessage("invalid payload"))
+            elif kind in broken or (kind == "flaky" and attempts[kind] == 1):
+                outcomes.append(RuntimeError(f"{kind} handler down"))
+            else:
+                outcomes.append(None)
+        return outcomes
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "queue.db")
+        queue = DurableQueue(path, deliver, workers=2, max_attempts=3, base_delay=0.01, max_delay=0.05,
+                             poll_interval=0.02)
+        await queue.open()
+        tracking_ids = await queue.put_many([{"kind": kind} for kind in ("ok", "flaky", "poison", "always")])
+        await asyncio.gather(*(queue.put({"kind": "ok"}) for _ in range(20)))
+        assert len(set(tracking_ids)) == 4 and queue.accepted == 24
+        assert queue.commits < 21, queue.commits
+        print(f"✓ 24 emails persisted before delivery in {queue.commits} commits")
+        
+        await queue.start()
+        await wait_until(lambda: queue.delivered + queue.dead_lettered == 24)
+        assert queue.delivered == 22 and queue.dead_lettered == 2
+        assert attempts["flaky"] == 2 and attempts["poison"] == 1 and attempts["always"] == 3
+        dead = {letter["tracking_id"]: letter for letter in await queue.dead_letters()}
+        assert set(dead) == {tracking_ids[2], tracking_ids[3]}
+        assert dead[tracking_ids[2]]["attempts"] == 1 and "PoisonMessage" in dead[tracking_ids[2]]["last_error"]
+        assert dead[tracking_ids[3]]["attempts"] == 3 and dead[tracking_ids[3]]["payload"] == {"kind": "always"}
+        print("✓ Failed email retried; poison email dead-lettered at once, others after 3 attempts")
+        
+        broken.clear()
+        assert await queue.replay([tracking_ids[3]]) == 1
+        await wait_until(lambda: queue.delivered == 23)
+        stats = await queue.stats()
+        assert stats["queued"] == 0 and stats["dead_letters"] == 1, stats
+        assert [letter["tracking_id"] for letter in await queue.dead_letters()] == [tracking_ids[2]]
+        print("✓ Replayed dead letter delivered; the other stays dead-lettered")
+        await queue.stop()
+        
+        # A router that claimed an email and died: another delivers it once the lease runs out
+        crashed = DurableQueue(path, deliver, lease=0.3)
+        await crashed.open()
+        tracking_id = await crashed.put({"kind": "leased"})
+        claimed = await crashed._run(crashed._claim)
+        assert [message[1] for message in claimed] == [tracking_id]
+        await crashed._run(crashed._close)
+        claimed_at = time.monotonic()
+        
+        queue = DurableQueue(path, deliver, poll_interval=0.02)
+        await queue.start()
+        await wait_until(lambda: queue.delivered == 1)
+        assert time.monotonic() - claimed_at >= 0.25 and attempts["leased"] == 1
+        await queue.stop()
+        print("✓ Email claimed by a router that died delivered by another after the lease expired")
+    
+    return True
+
+
+async def test_queued_delivery():
+    """Test how the router's queue delivery reports routing outcomes."""
+    print("\n=== Testing delivery of queued emails ===")
+    
+    def respond(request):
+        if request.url.host == "invoice":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"host": request.url.host})
+    
+    _, pools = main.build_handler_pools({
+        "InvoiceRequest": "http://invoice/handle_invoice",
+        "AppointmentBooking": "http://scheduler/handle_schedule",
+    })
+    payloads = [classified_email("AppointmentBooking").model_dump(), {"original_email": {}},
+                classified_email().model_dump()]
+    with patch.object(main, "handler_pools", pools), patch.object(main, "HANDLER_BATCH_SUFFIX", ""), \
+         mock_handlers(respond):
+        outcomes = await main.deliver_queued(payloads)
+    assert outcomes[0] is None
+    assert isinstance(outcomes[1], PoisonMessage)
+    assert isinstance(outcomes[2], RuntimeError) and not isinstance(outcomes[2], PoisonMessage)
+    print("✓ Routed email settled, invalid payload poison, failed routing retried")
+    
+    return True
+
+
+def test_routing_rules():
+    """Test first-match routing rules on sender domain, subject, workflow type and confidence."""
+    print("\n=== Testing routing rules ===")
+    
+    destinations = list(main.HANDLER_MAP)
+    rules = RuleSet({"rules": [
+        {"name": "legal", "subject": r"\b(subpoena|lawsuit)\b", "route_to": "HumanReview"},
+        {"name": "unsure billing", "sender_domain": "billing.example.com", "max_confidence": 0.6,
+         "route_to": "HumanReview"},
+        {"name": "billing", "sender_domain": ["billing.example.com", "@invoices.example.net"],
+         "route_to": "InvoiceRequest"},
+        {"name": "case sensitive", "subject": "URGENT", "ignore_case": False, "route_to": "HumanReview"},
+        {"name": "bookings", "workflow_type": "NewClientInquiry", "subject": "(?i)appointment",
+         "min_confidence": 0.5, "route_to": "AppointmentBooking"},
+    ]}, destinations)
+    
+    def routed(**fields):
+        rule = rules.match(classified_email(**dict({"workflow_type": "NewClientInquiry"}, **fields)))
+        return rule.name if rule else None
+    
+    assert routed(sender="Billing <ap@mail.billing.example.com>") == "billing"
+    assert routed(sender="ap@invoices.example.net") == "billing"
+    assert routed(sender="ap@notbilling.example.com") is None
+    print("✓ Sender domain rules match subdomains, not lookalike domains")
+    
+    assert routed(sender="ap@billing.example.com", confidence=0.5) == "unsure billing"
+    assert routed(sender="ap@billing.example.com", subject="Re: Lawsuit") == "legal"
+    assert routed(subject="Appointment request") == "bookings"
+    assert routed(subject="Appointment request", confidence=0.4) is None
+    assert routed(subject="Appointment request", workflow_type="InvoiceRequest") is None
+    print("✓ The first rule in file order whose conditions all hold wins, confidence bands included")
+    
+    assert routed(subject="URGENT: call back") == "case sensitive"
+    assert routed(subject="urgent: call back") is None
+    assert routed(subject="Lawsuits and more") is None
+    print("✓ Subject patterns searched case-insensitively unless ignore_case is false")
+    
+    for invalid in ({"rules": [{"route_to": "HumanReview"}]},
+                    {"rules": [{"subject": "x", "route_to": "Nowhere"}]},
+                    {"rules": [{"subject": "(", "route_to": "HumanReview"}]},
+                    {"rules": [{"subject": r"(a)\1", "route_to": "HumanReview"}]},
+                    {"rules": [{"sender_domain": "a.com", "route_to": "HumanReview", "priority": 1}]},
+                    {"rules": {}}):
+        try:
+            RuleSet(invalid, destinations)
+            print(f"✗ {invalid} should be rejected")
+            return False
+        except ValueError:
+            pass
+    print("✓ Invalid rules rejected")
+    
+    return True
+
+
+async def test_rule_reload():
+    """Test hot reload of the rules file and routing by the rules."""
+    print("\n=== Testing routing rule reload ===")
+    
+    def write_rules(path: str, document):
+        with open(path + ".tmp", "w") as f:
+            f.write(document if isinstance(document, str) else json.dumps(document))
+        os.replace(path + ".tmp", path)
+    
+    def respond(request):
+        if request.url.path.endswith("/batch"):
+            emails = json.loads(request.content)["emails"]
+            return httpx.Response(200, json={"results": [{"host": request.url.host}] * len(emails)})
+        return httpx.Response(200, json={"host": request.url.host})
+    
+    _, pools = main.build_handler_pools({
+        "InvoiceRequest": "http://invoice/handle_invoice",
+        "NewClientInquiry": "http://info/handle_inquiry",
+        "HumanReview": "http://review/human_review",
+    })
+    email = classified_email("NewClientInquiry", subject="Re: lawsuit")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.json")
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_rules.example.json")) as f:
+            write_rules(path, f.read())
+        reloader = RuleReloader(path, main.HANDLER_MAP, interval=0.05)
+        with patch.object(main, "routing_rules", reloader), patch.object(main, "handler_pools", pools), \
+             patch.dict(main.handler_batch_support, clear=True), mock_handlers(respond):
+            reloader.start()
+            try:
+                assert reloader.version == 1 and reloader.stats()["rules"] == 3
+                result = await main.route_one(email)
+                assert result["handler"] == "HumanReview" and result["rule"] == "legal matters to a person"
+                response = await main.route_many([email, classified_email("NewClientInquiry")])
+                assert [(r["handler"], r["rule"]) for r in response["results"]] == [
+                    ("HumanReview", "legal matters to a person"), ("NewClientInquiry", None)]
+                print("✓ Example rules loaded and applied by /route and /route/batch")
+                
+                write_rules(path, {"rules": [{"name": "everything", "subject": ".", "route_to": "InvoiceRequest"}]})
+                await wait_until(lambda: reloader.version == 2)
+                result = await main.route_one(email)
+                assert result["handler"] == "InvoiceRequest" and result["rule"] == "everything"
+                print("✓ Changed rules file picked up without a restart")
+                
+                write_rules(path, "{broken")
+                await wait_until(lambda: reloader.last_error is not None)
+                assert reloader.version == 2 and (await main.route_one(email))["rule"] == "everything"
+                try:
+                    await main.reload_rules()
+                    print("✗ Forced reload of a broken file should fail")
+                    return False
+                except main.HTTPException as e:
+                    assert e.status_code == 422
+                print("✓ Broken rules file rejected; previous rules kept")
+            finally:
+                await reloader.stop()
+    
+    return True
+
+
 async def test_router():
     """Test the workflow router with sample payloads."""
     
@@ -110,5 +645,50 @@ async def test_router():
             
             print("-" * 30)
 
+async def run_all_tests():
+    """Run all test functions."""
+    print("=== Workflow Router Agent Test Suite ===")
+    
+    tests = [
+        test_circuit_breaker,
+        test_router_circuit_breaker,
+        test_load_balancer,
+        test_replica_failover,
+        test_batch_routing,
+        test_batch_failure_not_resent,
+        test_durable_queue,
+        test_queued_delivery,
+        test_routing_rules,
+        test_rule_reload
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test in tests:
+        try:
+            result = test()
+            if asyncio.iscoroutine(result):
+                result = await result
+            if result:
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"✗ Test {test.__name__} failed with exception: {type(e).__name__}: {e}")
+            failed += 1
+    
+    print(f"\n=== Test Summary ===")
+    print(f"Passed: {passed}")
+    print(f"Failed: {failed}")
+    print(f"Total: {len(tests)}")
+    
+    return failed == 0
+
+
 if __name__ == "__main__":
-    asyncio.run(test_router())
\ No newline at end of file
+    if "--live" in sys.argv:
+        asyncio.run(test_router())
+    else:
+        success = asyncio.run(run_all_tests())
+        sys.exit(0 if success else 1)